@@ -0,0 +1,188 @@
+"""In-process admission control: per-route concurrency limits and per-user token buckets"""
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+import asyncio
+import math
+import time
+
+
+class Rejected(Exception):
+    """A request turned away before doing any work; retry after `retry_after` seconds"""
+
+    reason = "rejected"
+
+    def __init__(self, retry_after: float):
+        super().__init__(self.reason)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimited(Rejected):
+    reason = "rate_limited"
+
+
+class Overloaded(Rejected):
+    def __init__(self, reason: str, retry_after: float):
+        self.reason = reason
+        super().__init__(retry_after)
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests in flight; up to `max_queue` more wait up to `timeout` seconds
+
+    Waiters are served first come, first served: a finishing request hands
+    its slot straight to the oldest waiter.
+    """
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """Take a slot; returns True if the request had to wait, raises Overloaded if it is shed"""
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return False
+        if len(self._waiters) >= self.max_queue:
+            raise Overloaded("queue_full", self.timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up: pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded("queue_timeout", self.timeout)
+            raise
+        return True
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets refilled at `rate` per second up to `burst`
+
+    Only the `max_keys` most recently seen keys are tracked; a forgotten key
+    starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def take(self, key: tuple) -> float:
+        """Spend a token; returns 0 if there was one, else the seconds until there will be"""
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionControl:
+    """Admission for write routes: a per-user rate limit, then a per-route concurrency limit
+
+    `limits` maps route names to their concurrency limit; other routes get
+    `default_limit`. A `rate` of 0 turns per-user rate limiting off.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        default_limit: int = 64,
+        max_queue: int = 256,
+        queue_timeout: float = 0.5,
+        rate: float = 0,
+        burst: float = 10
+    ):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.buckets = TokenBucketLimiter(rate, burst) if rate > 0 else None
+        self._limiters: Dict[str, ConcurrencyLimiter] = {}
+        # route -> {"admitted": n, "queued": n, "shed": {reason: n}}
+        self.counts: Dict[str, dict] = {}
+
+    def _limiter(self, route: str) -> ConcurrencyLimiter:
+        limiter = self._limiters.get(route)
+        if limiter is None:
+            limit = self.limits.get(route, self.default_limit)
+            limiter = self._limiters[route] = ConcurrencyLimiter(limit, self.max_queue, self.queue_timeout)
+        return limiter
+
+    def _count(self, route: str) -> dict:
+        counts = self.counts.get(route)
+        if counts is None:
+            counts = self.counts[route] = {"admitted": 0, "queued": 0, "shed": {}}
+        return counts
+
+    def _shed(self, route: str, error: Rejected) -> None:
+        shed = self._count(route)["shed"]
+        shed[error.reason] = shed.get(error.reason, 0) + 1
+
+    async def enter(self, route: str, user_id: Optional[str] = None) -> None:
+        """Admit a request or raise RateLimited / Overloaded; admitted requests must call leave()"""
+        if self.buckets is not None and user_id:
+            wait = self.buckets.take((route, user_id))
+            if wait:
+                error = RateLimited(wait)
+                self._shed(route, error)
+                raise error
+        try:
+            queued = await self._limiter(route).acquire()
+        except Rejected as e:
+            self._shed(route, e)
+            raise
+        counts = self._count(route)
+        counts["admitted"] += 1
+        counts["queued"] += queued
+
+    def leave(self, route: str) -> None:
+        self._limiters[route].release()
+
+    def reset(self) -> None:
+        """Forget every user's bucket, the per-route limiters and the counts"""
+        if self.buckets is not None:
+            self.buckets = TokenBucketLimiter(self.buckets.rate, self.buckets.burst, self.buckets.max_keys)
+        self._limiters = {}
+        self.counts = {}
+
+    def stats(self) -> dict:
+        return {
+            route: {
+                **counts,
+                "in_flight": self._limiters[route].in_flight if route in self._limiters else 0,
+                "waiting": self._limiters[route].waiting if route in self._limiters else 0
+            }
+            for route, counts in self.counts.items()
+        }
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark: per-request score writes vs the write-behind ingestion queue
+
+Drives POST /api/submit-score in-process (httpx ASGI transport) with many
+concurrent clients, once with the direct path and once with the queue enabled.
+By default the app talks to mongomock-motor with a simulated network round
+trip added to every database call; pass --storage memory for the in-process
+engine (no round trips) or --mongo-url to use a real server.
+
+    python benchmarks/bench_ingest.py --clients 200 --submits 20 --rtt-ms 2
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from standin import STORAGE_KINDS, install, make_storage  # noqa: E402
+
+
+async def run_mode(mode, args):
+    install(server, make_storage(args.storage, args.mongo_url, args.rtt_ms), admission=args.admission)
+    await server.startup_event()
+    if mode == "queue":
+        server.score_queue.start()
+
+    today = server.get_today_string()
+    latencies = []
+    shed = 0
+
+    async def client(ac, n):
+        nonlocal shed
+        user_id = f"bench-{n}"
+        await ac.post("/api/users", json={"uid": user_id, "display_name": f"Bench {n}"})
+        for i in range(args.submits):
+            started = time.perf_counter()
+            response = await ac.post("/api/submit-score", json={
+                "userId": user_id, "score": i, "timeTaken": 30, "date": today
+            })
+            latencies.append(time.perf_counter() - started)
+            if response.status_code == 503:
+                shed += 1
+                continue
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as ac:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(ac, n) for n in range(args.clients)))
+        await server.score_queue.drain()
+        elapsed = time.perf_counter() - started
+
+    total = args.clients * args.submits
+    latencies.sort()
+    print(
+        f"{mode:<7} {total:>7} submits  {total / elapsed:>9.0f}/s  "
+        f"p50 {statistics.median(latencies) * 1000:>7.2f}ms  "
+        f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:>7.2f}ms"
+        + (f"  shed {shed}" if shed else "")
+    )
+    if mode == "queue":
+        print(f"        queue stats: {server.score_queue.stats()}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--submits", type=int, default=20)
+    parser.add_argument("--storage", choices=STORAGE_KINDS, default="mock", help="mongomock with a round trip, or the in-memory engine")
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated round trip for the mock database")
+    parser.add_argument("--mongo-url", default=None, help="benchmark against a real MongoDB instead")
+    parser.add_argument("--admission", action="store_true", help="keep the server's write concurrency limits; shed submits are counted")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for mode in ("direct", "queue"):
+        await run_mode(mode, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
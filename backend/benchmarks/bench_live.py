@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Live leaderboard benchmark: idle subscribers per worker and fan-out latency
+
+Starts one uvicorn worker on the in-memory storage engine (or drives
+--base-url), opens --subscribers idle Server-Sent Events streams on
+/api/leaderboard/stream and reports the worker's resident memory per
+subscriber. Each round then submits a score that changes the top N and
+measures how long the diff takes to reach every subscriber.
+
+    python benchmarks/bench_live.py --subscribers 5000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_worker(args):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(
+        os.environ,
+        STORAGE_BACKEND="memory",
+        DAILY_CONTENT_SOURCES="static",
+        LIVE_LEADERBOARD_TICK=str(args.tick)
+    )
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+    return worker, f"http://127.0.0.1:{port}/api"
+
+
+async def wait_healthy(api, timeout=30):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=api) as client:
+        while True:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            if time.perf_counter() > deadline:
+                raise SystemExit("worker did not become healthy")
+            await asyncio.sleep(0.1)
+
+
+class Stream:
+    """One raw SSE connection; counts the events it has seen"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.events = asyncio.Queue()
+
+    @classmethod
+    async def open(cls, api, period):
+        url = urlsplit(api)
+        reader, writer = await asyncio.open_connection(url.hostname, url.port)
+        writer.write((
+            f"GET {url.path}/leaderboard/stream?period={period} HTTP/1.1\r\n"
+            f"Host: {url.hostname}\r\nAccept: text/event-stream\r\n\r\n"
+        ).encode())
+        await writer.drain()
+        stream = cls(reader, writer)
+        while not (await reader.readline()).startswith(b"event: snapshot"):
+            pass
+        return stream
+
+    async def read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            if line.startswith(b"event: diff"):
+                self.events.put_nowait(time.perf_counter())
+
+
+async def run(args):
+    worker = None
+    api = args.base_url
+    if api is None:
+        worker, api = start_worker(args)
+    try:
+        await wait_healthy(api)
+        if worker is not None:
+            rss_before = rss_mb(worker.pid)
+
+        streams = []
+        started = time.perf_counter()
+        while len(streams) < args.subscribers:
+            batch = min(args.connect_batch, args.subscribers - len(streams))
+            streams.extend(await asyncio.gather(*(Stream.open(api, args.period) for _ in range(batch))))
+        connect_s = time.perf_counter() - started
+        readers = [asyncio.ensure_future(stream.read()) for stream in streams]
+        print(f"{len(streams)} subscribers connected in {connect_s:.2f}s")
+        if worker is not None:
+            await asyncio.sleep(1)
+            rss_after = rss_mb(worker.pid)
+            print(
+                f"worker RSS {rss_before:.1f}MB -> {rss_after:.1f}MB, "
+                f"{(rss_after - rss_before) * 1024 / len(streams):.1f}KB per idle subscriber"
+            )
+
+        today = datetime.utcnow().strftime("%Y-%m-%d")
+        async with httpx.AsyncClient(base_url=api) as client:
+            for round_number in range(args.rounds):
+                user_id = f"live-{uuid.uuid4().hex[:10]}"
+                await client.post("/users", json={"uid": user_id, "display_name": f"Live {round_number}"})
+                submitted = time.perf_counter()
+                # A new best score always moves the top of the board
+                await client.post("/submit-score", json={
+                    "userId": user_id, "score": 10_000 + round_number, "timeTaken": 1, "date": today
+                })
+                arrivals = await asyncio.wait_for(
+                    asyncio.gather(*(stream.events.get() for stream in streams)),
+                    timeout=args.tick * 4 + 30
+                )
+                latencies = sorted(arrival - submitted for arrival in arrivals)
+                print(
+                    f"round {round_number + 1}: diff reached {len(latencies)} subscribers, "
+                    f"p50 {percentile(latencies, 50) * 1000:.1f}ms, p99 {percentile(latencies, 99) * 1000:.1f}ms, "
+                    f"last {latencies[-1] * 1000:.1f}ms (tick {args.tick * 1000:.0f}ms)"
+                )
+
+        for reader in readers:
+            reader.cancel()
+        for stream in streams:
+            stream.writer.close()
+        await asyncio.gather(*(stream.writer.wait_closed() for stream in streams), return_exceptions=True)
+    finally:
+        if worker is not None:
+            worker.terminate()
+            try:
+                await asyncio.to_thread(worker.wait, 10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily Bite live leaderboard benchmark")
+    parser.add_argument("--subscribers", type=int, default=2000, help="idle SSE streams to open")
+    parser.add_argument("--rounds", type=int, default=3, help="score submissions to measure fan-out with")
+    parser.add_argument("--period", choices=("today", "alltime"), default="today")
+    parser.add_argument("--tick", type=float, default=0.5, help="LIVE_LEADERBOARD_TICK for the spawned worker")
+    parser.add_argument("--connect-batch", type=int, default=250, help="streams opened concurrently")
+    parser.add_argument("--base-url", default=None, help="drive a running server, e.g. http://localhost:8001/api")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the in-memory ranked leaderboard (backend/ranking.py)
+
+Builds a board with N players and times rank lookups, "around me" slices
+and score updates. Run from the backend directory:
+
+    python benchmarks/bench_ranking.py --players 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ranking import RankedBoard  # noqa: E402
+
+
+def timed(label, fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {iterations:>8} ops  {elapsed * 1e6 / iterations:>9.2f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--players", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    user_ids = [f"user-{i}" for i in range(args.players)]
+
+    board = RankedBoard()
+    start = time.perf_counter()
+    board.load((uid, rng.randint(0, 1000), rng.randint(1, 300)) for uid in user_ids)
+    print(f"Loaded {len(board)} players in {time.perf_counter() - start:.2f}s")
+
+    sample = [rng.choice(user_ids) for _ in range(args.lookups)]
+    timed("rank(user_id)", lambda i: board.rank(sample[i]), args.lookups)
+    timed("around(user_id, radius=5)", lambda i: board.around(sample[i], 5), args.lookups)
+    timed("top(50)", lambda i: board.top(50), args.lookups // 10)
+    timed("submit_best(user_id, ...)", lambda i: board.submit_best(sample[i], rng.randint(0, 1000), 60), args.lookups)
+    timed("add(user_id, delta)", lambda i: board.add(sample[i], 10), args.lookups)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark: time from startup to the first served request
+
+Runs the app's startup hook in-process, then serves the first leaderboard
+request and readiness probe, once per INDEX_BUILD_MODE. With the stand-in
+every create_index costs one simulated round trip; against a real server
+(--mongo-url) foreground mode also waits for the index builds themselves.
+
+    python benchmarks/bench_startup.py --rtt-ms 20
+    python benchmarks/bench_startup.py --mongo-url mongodb://localhost:27017 --warmup 8
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DAILY_CONTENT_SOURCES", "static")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from standin import STORAGE_KINDS, install, make_storage  # noqa: E402
+
+MODES = ("foreground", "background", "skip")
+
+
+async def cold_start(mode, args):
+    install(server, make_storage(args.storage, args.mongo_url, args.rtt_ms))
+    server.INDEX_BUILD_MODE = mode
+    server.MONGO_WARMUP_CONNECTIONS = args.warmup
+
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as ac:
+        started = time.perf_counter()
+        await server.startup_event()
+        startup = time.perf_counter() - started
+        response = await ac.get("/api/leaderboard", params={"period": "today", "limit": 50})
+        response.raise_for_status()
+        first_request = time.perf_counter() - started
+        ready = await ac.get("/api/ready")
+        await asyncio.gather(*server.background_tasks)
+        indexes_done = time.perf_counter() - started
+    await server.shutdown_event()
+
+    print(
+        f"{mode:<12}{startup * 1000:>12.1f}{first_request * 1000:>16.1f}"
+        f"{indexes_done * 1000:>14.1f}{ready.status_code:>8}  {server.startup_state['indexes']}"
+    )
+
+
+async def main_async(args):
+    print(f"{'mode':<12}{'startup ms':>12}{'first req ms':>16}{'indexes ms':>14}{'ready':>8}  indexes")
+    for mode in args.modes.split(","):
+        await cold_start(mode, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily Bite cold-start benchmark")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"INDEX_BUILD_MODE values to compare (default {','.join(MODES)})")
+    parser.add_argument("--storage", choices=STORAGE_KINDS, default="mock", help="mongomock with a round trip, or the in-memory engine")
+    parser.add_argument("--mongo-url", default=None, help="use a real MongoDB instead of the stand-in")
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="simulated database round trip")
+    parser.add_argument("--warmup", type=int, default=4, help="connections opened at startup")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Daily Bite API load generator
+
+Runs realistic scenario mixes against the API and reports throughput and
+p50/p95/p99 latency per endpoint. The scenarios follow the functional checks
+in backend_test.py, but run concurrently from many virtual users.
+
+By default the FastAPI app runs in-process (httpx ASGI transport) against the
+local Mongo stand-in from standin.py, so nothing needs to be deployed;
+--storage memory swaps in the in-process storage engine to measure the
+request path alone, and --base-url drives a server over localhost instead.
+
+    python benchmarks/loadtest.py --users 200 --duration 20 --output run.json
+    python benchmarks/loadtest.py --compare run.json --threshold 0.2
+    python benchmarks/loadtest.py --mix launch=1,bootstrap=1 --client-rtt-ms 80
+
+Scenarios (weights set with --mix):
+    launch       app start: create user, daily content, stats, leaderboard
+    bootstrap    app start on the composite endpoint: create user, daily content, bootstrap
+    storm        day-rollover score burst: every user submits at once, then checks rank
+    leaderboard  leaderboard screen polling (today and all-time)
+    reward       the same ad reward callback posted three times concurrently
+
+launch and bootstrap also record the whole app start as "home screen ...",
+so the two can be compared end to end; --client-rtt-ms adds a mobile
+network round trip to every request to make the difference realistic.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DAILY_CONTENT_SOURCES", "static")
+
+import httpx  # noqa: E402
+
+from standin import STORAGE_KINDS  # noqa: E402
+
+DEFAULT_MIX = "launch=4,storm=2,leaderboard=10,reward=1"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Recorder:
+    """Collects latencies per endpoint label plus scenario-level checks"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.checks = {}
+
+    def record(self, label, seconds, ok):
+        self.latencies.setdefault(label, []).append(seconds)
+        if not ok:
+            self.errors[label] = self.errors.get(label, 0) + 1
+
+    def check(self, name, ok):
+        passed, failed = self.checks.get(name, (0, 0))
+        self.checks[name] = (passed + ok, failed + (not ok))
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for label, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[label] = {
+                "count": len(values),
+                "errors": self.errors.get(label, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "mean_ms": round(sum(values) / len(values) * 1000, 3),
+                "p50_ms": round(percentile(values, 50) * 1000, 3),
+                "p95_ms": round(percentile(values, 95) * 1000, 3),
+                "p99_ms": round(percentile(values, 99) * 1000, 3)
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total,
+            "rps": round(total / elapsed, 2),
+            "errors": sum(self.errors.values()),
+            "endpoints": endpoints,
+            "checks": {name: {"passed": p, "failed": f} for name, (p, f) in self.checks.items()}
+        }
+
+
+class LoadClient:
+    def __init__(self, client, recorder, rtt_ms=0):
+        self.client = client
+        self.recorder = recorder
+        self.rtt = rtt_ms / 1000
+
+    async def request(self, label, method, path, expect=(200,), **kwargs):
+        started = time.perf_counter()
+        if self.rtt:
+            await asyncio.sleep(self.rtt)
+        try:
+            response = await self.client.request(method, path, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(label, time.perf_counter() - started, False)
+            return None
+        self.recorder.record(label, time.perf_counter() - started, response.status_code in expect)
+        return response
+
+
+class VirtualUser:
+    def __init__(self, n, api, today):
+        self.user_id = f"load-{uuid.uuid4().hex[:12]}"
+        self.name = f"Load User {n}"
+        self.api = api
+        self.today = today
+        self.best = -1
+
+    async def ensure_user(self):
+        await self.api.request("POST /users", "POST", "/users", json={
+            "uid": self.user_id, "display_name": self.name, "is_anonymous": False
+        })
+
+    async def launch(self):
+        started = time.perf_counter()
+        await self.ensure_user()
+        await self.api.request("GET /daily-content", "GET", "/daily-content", expect=(200, 304))
+        stats = await self.api.request("GET /user/{id}/stats", "GET", f"/user/{self.user_id}/stats")
+        board = await self.api.request("GET /leaderboard", "GET", "/leaderboard", params={"period": "today", "limit": 50})
+        ok = all(r is not None and r.status_code == 200 for r in (stats, board))
+        self.api.recorder.record("home screen (separate calls)", time.perf_counter() - started, ok)
+
+    async def bootstrap(self):
+        started = time.perf_counter()
+        await self.ensure_user()
+        await self.api.request("GET /daily-content", "GET", "/daily-content", expect=(200, 304))
+        response = await self.api.request(
+            "GET /bootstrap/{id}", "GET", f"/bootstrap/{self.user_id}", params={"period": "today", "limit": 50}
+        )
+        ok = response is not None and response.status_code == 200
+        self.api.recorder.record("home screen (bootstrap)", time.perf_counter() - started, ok)
+
+    async def storm(self):
+        score = random.randint(0, 1000)
+        await self.api.request("POST /submit-score", "POST", "/submit-score", json={
+            "userId": self.user_id, "score": score, "timeTaken": random.randint(5, 300), "date": self.today
+        })
+        self.best = max(self.best, score)
+        await self.api.request("GET /leaderboard/rank/{id}", "GET", f"/leaderboard/rank/{self.user_id}", expect=(200, 404))
+
+    async def leaderboard(self):
+        period = random.choice(["today", "today", "alltime"])
+        await self.api.request("GET /leaderboard", "GET", "/leaderboard", params={"period": period, "limit": 50})
+
+    async def reward(self):
+        payload = {
+            "userId": self.user_id,
+            "rewardType": "points",
+            "rewardAmount": 10,
+            "timestamp": datetime.utcnow().isoformat() + uuid.uuid4().hex[:6]
+        }
+        responses = await asyncio.gather(*(
+            self.api.request("POST /process-reward", "POST", "/process-reward", json=payload)
+            for _ in range(3)
+        ))
+        granted = sum(1 for r in responses if r is not None and r.status_code == 200 and r.json().get("success"))
+        self.api.recorder.check("reward granted exactly once", granted == 1)
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if not hasattr(VirtualUser, name.strip()):
+            raise SystemExit(f"Unknown scenario: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def drive(api, args, today):
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    users = [VirtualUser(n, api, today) for n in range(args.users)]
+
+    # Everyone registers, then the rollover burst: all users submit at the same instant
+    await asyncio.gather(*(user.ensure_user() for user in users))
+    if "storm" in mix:
+        await asyncio.gather(*(user.storm() for user in users))
+
+    deadline = time.perf_counter() + args.duration
+
+    async def run(user):
+        while time.perf_counter() < deadline:
+            await getattr(user, random.choices(names, weights)[0])()
+            if args.think_ms:
+                await asyncio.sleep(random.uniform(0, args.think_ms / 1000))
+
+    await asyncio.gather(*(run(user) for user in users))
+
+
+async def run_load(args):
+    recorder = Recorder()
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url.rstrip("/"), timeout=30)
+        server = None
+    else:
+        import server
+        from standin import install, make_storage
+        install(server, make_storage(args.storage, args.mongo_url, args.rtt_ms), admission=args.admission)
+        await server.startup_event()
+        if args.ingest_queue:
+            server.score_queue.start()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://loadtest/api")
+
+    api = LoadClient(client, recorder, args.client_rtt_ms)
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    started = time.perf_counter()
+    try:
+        await drive(api, args, today)
+    finally:
+        await client.aclose()
+        if server is not None:
+            await server.shutdown_event()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def print_summary(result):
+    print(f"{'endpoint':<30}{'count':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for label, row in result["endpoints"].items():
+        print(
+            f"{label:<30}{row['count']:>8}{row['errors']:>6}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+        )
+    print(f"total: {result['requests']} requests in {result['elapsed_s']}s ({result['rps']} rps), {result['errors']} errors")
+    for name, check in result["checks"].items():
+        print(f"check '{name}': {check['passed']} passed, {check['failed']} failed")
+
+
+def compare(result, baseline, threshold):
+    """Return human-readable regressions of `result` against `baseline`"""
+    regressions = []
+    for label, base in baseline["endpoints"].items():
+        row = result["endpoints"].get(label)
+        if row is None:
+            continue
+        if base["p95_ms"] and row["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {base['p95_ms']:.2f}ms -> {row['p95_ms']:.2f}ms")
+        if base["rps"] and row["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{label}: throughput {base['rps']:.1f} -> {row['rps']:.1f} rps")
+        if row["errors"] > base["errors"]:
+            regressions.append(f"{label}: errors {base['errors']} -> {row['errors']}")
+    for name, check in result["checks"].items():
+        if check["failed"]:
+            regressions.append(f"check '{name}' failed {check['failed']} times")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Daily Bite API load generator")
+    parser.add_argument("--users", type=int, default=100, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of mixed traffic after the rollover burst")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-ms", type=float, default=0, help="max random pause between scenarios")
+    parser.add_argument("--base-url", default=None, help="drive a running server, e.g. http://localhost:8001/api")
+    parser.add_argument("--mongo-url", default=None, help="in-process mode: use a real MongoDB instead of the stand-in")
+    parser.add_argument("--storage", choices=STORAGE_KINDS, default="mock", help="in-process mode: mongomock with a round trip, or the in-memory engine")
+    parser.add_argument("--rtt-ms", type=float, default=1.0, help="in-process mode: simulated database round trip")
+    parser.add_argument("--client-rtt-ms", type=float, default=0, help="simulated client network round trip per request")
+    parser.add_argument("--ingest-queue", action="store_true", help="in-process mode: enable the write-behind score queue")
+    parser.add_argument("--admission", action="store_true", help="in-process mode: keep the server's write concurrency limits")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true", help="keep the server's error logging")
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.getLogger().setLevel(logging.WARNING if args.verbose else logging.CRITICAL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    summary = asyncio.run(run_load(args))
+    result = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "target": args.base_url or "in-process",
+            "users": args.users,
+            "duration": args.duration,
+            "mix": args.mix,
+            "storage": None if args.base_url else "mongo" if args.mongo_url else args.storage,
+            "rtt_ms": args.rtt_ms if not args.base_url and not args.mongo_url and args.storage == "mock" else None,
+            "client_rtt_ms": args.client_rtt_ms,
+            "ingest_queue": args.ingest_queue,
+            "python": platform.python_version()
+        },
+        **summary
+    }
+    print_summary(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print(f"\nno regressions against {args.compare} (threshold {args.threshold:.0%})")
+
+
+if __name__ == "__main__":
+    main()
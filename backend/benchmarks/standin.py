@@ -0,0 +1,109 @@
+"""
+Local storage for benchmarks
+
+`mock` is mongomock-motor plus a simulated round trip: every collection call
+(and the first fetch of every cursor) sleeps for `rtt` seconds before running
+against the in-memory mongomock database, so batching and round-trip savings
+show up the way they would against a real server. `memory` is the server's
+own in-process engine, which takes storage cost out of the picture so the
+request path itself can be measured and profiled.
+"""
+
+import asyncio
+import uuid
+
+
+class _LatentCursor:
+    def __init__(self, cursor, rtt):
+        self._cursor = cursor
+        self._rtt = rtt
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(self._rtt)
+        return await self._cursor.to_list(length=length)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        await asyncio.sleep(self._rtt)
+        async for row in self._cursor:
+            yield row
+
+
+class _LatentCollection:
+    """Adds one simulated round trip to every call on a collection"""
+
+    def __init__(self, collection, rtt):
+        self._collection = collection
+        self._rtt = rtt
+
+    def find(self, *args, **kwargs):
+        return _LatentCursor(self._collection.find(*args, **kwargs), self._rtt)
+
+    def aggregate(self, *args, **kwargs):
+        return _LatentCursor(self._collection.aggregate(*args, **kwargs), self._rtt)
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(self._rtt)
+            return await attr(*args, **kwargs)
+        return call
+
+
+class LatentDatabase:
+    def __init__(self, database, rtt):
+        self._database = database
+        self._rtt = rtt
+
+    def __getitem__(self, name):
+        return _LatentCollection(self._database[name], self._rtt)
+
+    def __getattr__(self, name):
+        return self[name]
+
+    async def command(self, *args, **kwargs):
+        await asyncio.sleep(self._rtt)
+        return await self._database.command(*args, **kwargs)
+
+
+STORAGE_KINDS = ("mock", "memory")
+
+
+def make_database(mongo_url=None, rtt_ms=2.0):
+    """A fresh database: a throwaway one on `mongo_url`, or the latent mongomock stand-in"""
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        return AsyncIOMotorClient(mongo_url)[f"bench_{uuid.uuid4().hex[:8]}"]
+    from mongomock_motor import AsyncMongoMockClient
+    return LatentDatabase(AsyncMongoMockClient()["bench"], rtt_ms / 1000)
+
+
+def make_storage(kind="mock", mongo_url=None, rtt_ms=2.0):
+    """Fresh, empty storage; `mongo_url` (a real server) takes precedence over `kind`"""
+    from storage import MemoryStorage, MongoStorage
+    if kind == "memory" and not mongo_url:
+        return MemoryStorage()
+    return MongoStorage(make_database(mongo_url, rtt_ms))
+
+
+def install(server, storage, admission=False):
+    """Point the server module (and the state derived from it) at `storage`
+
+    Write admission is lifted unless `admission` is set: virtual users submit
+    far faster than people do, and without it a benchmark measures the write
+    path rather than load shedding. With it, the server's concurrency limits
+    (WRITE_CONCURRENCY and friends) apply but the per-user rate limit doesn't.
+    """
+    server.reset_state(storage)
+    from admission import AdmissionControl
+    if admission:
+        server.admission.buckets = None
+    else:
+        server.admission = AdmissionControl({}, default_limit=float("inf"))
+    # Stand-in storage starts empty: build its unique indexes before serving
+    server.INDEX_BUILD_MODE = "foreground"
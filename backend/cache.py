@@ -0,0 +1,182 @@
+"""In-process caching helpers for the Daily Bite API"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set, Union
+import time
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[0]
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+
+class CacheBackend(ABC):
+    """Storage interface for ResponseCache
+
+    Implement this for a shared store (e.g. Redis) so several workers see the
+    same entries and invalidations. Tags group keys that a write can evict
+    together; the epoch changes whenever anything is invalidated.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float, tags: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        ...
+
+    @abstractmethod
+    async def epoch(self) -> int:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """Per-process backend built on TTLCache with a tag -> keys index"""
+
+    def __init__(self, maxsize: int = 1000):
+        self._entries = TTLCache(maxsize=maxsize)
+        self._tags: Dict[str, Set[str]] = {}
+        self._epoch = 0
+
+    async def get(self, key: str) -> Any:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float, tags: Iterable[str]) -> None:
+        self._entries.set(key, value, ttl=ttl)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        if len(self._tags) > self._entries.maxsize * 64:
+            self._prune_tags()
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        self._epoch += 1
+        removed = 0
+        for tag in tags:
+            for key in self._tags.pop(tag, ()):
+                if self._entries.pop(key, _MISSING) is not _MISSING:
+                    removed += 1
+        return removed
+
+    async def epoch(self) -> int:
+        return self._epoch
+
+    async def clear(self) -> None:
+        self._epoch += 1
+        self._entries.clear()
+        self._tags.clear()
+
+    def _prune_tags(self) -> None:
+        """Drop index entries for keys that expired or were evicted"""
+        for tag, keys in list(self._tags.items()):
+            keys.intersection_update([key for key in keys if key in self._entries])
+            if not keys:
+                del self._tags[tag]
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "tags": len(self._tags), "evictions": self._entries.evictions}
+
+
+class ResponseCache:
+    """Read-through cache for endpoint responses with tag-based invalidation"""
+
+    def __init__(self, backend: CacheBackend, ttl: float = 30.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        tags: Union[Iterable[str], Callable[[Any], Iterable[str]]] = (),
+        ttl: Optional[float] = None
+    ) -> Any:
+        """Return the cached value for `key`, or compute and store it
+
+        `tags` may be a callable that derives the tags from the computed value.
+        A result is not stored if an invalidation ran while it was computed,
+        so a slow read can never resurrect data a concurrent write evicted.
+        """
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        epoch = await self.backend.epoch()
+        value = await compute()
+        if value is not None and await self.backend.epoch() == epoch:
+            if callable(tags):
+                tags = tags(value)
+            await self.backend.set(key, value, self.ttl if ttl is None else ttl, tags)
+        return value
+
+    async def invalidate(self, *tags: str) -> int:
+        self.invalidations += 1
+        return await self.backend.invalidate_tags(tags)
+
+    async def clear(self) -> None:
+        self.invalidations += 1
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            **self.backend.stats()
+        }
@@ -0,0 +1,256 @@
+"""Daily content (history events, fun fact, puzzle) built once per day on the server
+
+Each piece comes from a source adapter with an async `fetch(day)` method. The
+HTTP adapters wrap the public APIs the app used to call from every device;
+`StaticSource` returns a fixed value so tests and offline runs never touch
+the network.
+"""
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import unquote
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+HTTP_TIMEOUT = 10
+
+DEFAULT_FACT = {
+    "text": "Did you know? Octopuses have three hearts and blue blood!",
+    "source": "Default",
+    "source_url": ""
+}
+
+DEFAULT_PUZZLE = {
+    "question": "What is the largest planet in our solar system?",
+    "correctAnswer": "Jupiter",
+    "answers": ["Jupiter", "Saturn", "Earth", "Mars"],
+    "category": "Science",
+    "difficulty": "medium"
+}
+
+
+async def _get_json(url: str) -> Any:
+    def fetch():
+        response = requests.get(url, timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    return await asyncio.to_thread(fetch)
+
+
+class StaticSource:
+    """Source that always returns the same value (fixtures, tests, offline mode)"""
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    async def fetch(self, day: date) -> Any:
+        return self.value
+
+
+class FallbackSource:
+    """Try each source in order; use `default` if all of them fail"""
+
+    def __init__(self, *sources, default: Any = None):
+        self.sources = sources
+        self.default = default
+
+    async def fetch(self, day: date) -> Any:
+        for source in self.sources:
+            try:
+                value = await source.fetch(day)
+                if value:
+                    return value
+            except Exception as e:
+                logger.warning(f"{type(source).__name__} failed: {str(e)}")
+        if self.default is None:
+            raise LookupError("No daily content source succeeded")
+        return self.default
+
+
+class MuffinLabsHistorySource:
+    """This-day-in-history events from history.muffinlabs.com"""
+
+    def __init__(self, limit: int = 3):
+        self.limit = limit
+
+    async def fetch(self, day: date) -> List[dict]:
+        data = await _get_json(f"https://history.muffinlabs.com/date/{day.month}/{day.day}")
+        events = (data.get("data") or {}).get("Events") or []
+        return [
+            {"year": event.get("year"), "text": event.get("text"), "html": event.get("html")}
+            for event in events[:self.limit]
+        ]
+
+
+class UselessFactsSource:
+    async def fetch(self, day: date) -> dict:
+        data = await _get_json("https://uselessfacts.jsph.pl/api/v2/facts/random?language=en")
+        return {"text": data["text"], "source": data.get("source"), "source_url": data.get("source_url")}
+
+
+class NumbersApiSource:
+    async def fetch(self, day: date) -> dict:
+        data = await _get_json(f"http://numbersapi.com/{day.month}/{day.day}/date?json")
+        return {"text": data["text"], "source": "Numbers API", "source_url": "http://numbersapi.com"}
+
+
+class OpenTDBPuzzleSource:
+    """One multiple-choice trivia question from OpenTDB, answers shuffled once for everyone"""
+
+    async def fetch(self, day: date) -> Optional[dict]:
+        data = await _get_json("https://opentdb.com/api.php?amount=1&difficulty=medium&type=multiple&encode=url3986")
+        results = data.get("results") or []
+        if not results:
+            return None
+        question = results[0]
+        answers = [unquote(a) for a in [question["correct_answer"], *question["incorrect_answers"]]]
+        random.Random(day.isoformat()).shuffle(answers)
+        return {
+            "question": unquote(question["question"]),
+            "correctAnswer": unquote(question["correct_answer"]),
+            "answers": answers,
+            "category": unquote(question["category"]),
+            "difficulty": question.get("difficulty")
+        }
+
+
+def default_sources() -> Dict[str, Any]:
+    return {
+        "history": FallbackSource(MuffinLabsHistorySource(), default=[]),
+        "fact": FallbackSource(UselessFactsSource(), NumbersApiSource(), default=DEFAULT_FACT),
+        "puzzle": FallbackSource(OpenTDBPuzzleSource(), default=DEFAULT_PUZZLE)
+    }
+
+
+def fixture_sources() -> Dict[str, Any]:
+    """Offline stand-ins with fixed content, for tests and local benchmarks"""
+    return {
+        "history": StaticSource([
+            {"year": "1969", "text": "Apollo 11 lands on the Moon.", "html": ""},
+            {"year": "1903", "text": "The Wright brothers make the first powered flight.", "html": ""},
+            {"year": "1989", "text": "The Berlin Wall falls.", "html": ""}
+        ]),
+        "fact": StaticSource({"text": "Honey never spoils.", "source": "Fixture", "source_url": ""}),
+        "puzzle": StaticSource({
+            "question": "How many continents are there?",
+            "correctAnswer": "7",
+            "answers": ["5", "6", "7", "8"],
+            "category": "Geography",
+            "difficulty": "easy"
+        })
+    }
+
+
+def content_etag(content: dict) -> str:
+    body = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+# One entity tag in a list: an optional weakness prefix and the quoted opaque tag
+_ENTITY_TAG = re.compile(r'(?:W/)?("[^"]*")')
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (RFC 9110, section 13.1.2)
+
+    The header is "*" or a comma-separated list of entity tags; any of them
+    matches under weak comparison, which ignores the W/ prefix on either side.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return opaque in _ENTITY_TAG.findall(if_none_match)
+
+
+class DailyContentService:
+    """Builds each day's content once, persists it, and serves it from memory
+
+    Lookups go memory -> `daily_content` repository -> sources. A day built
+    from defaults because a source failed is served but not persisted, so
+    the next request after `retry_after` seconds tries the sources again.
+    """
+
+    def __init__(
+        self,
+        repository,
+        sources: Dict[str, Any],
+        coalesce: Callable[[tuple, Callable[[], Awaitable[Any]]], Awaitable[Any]],
+        keep_days: int = 3,
+        retry_after: float = 300
+    ):
+        self.repository = repository
+        self.sources = sources
+        self.coalesce = coalesce
+        self.keep_days = keep_days
+        self.retry_after = retry_after
+        self._days: Dict[str, dict] = {}
+
+    async def get(self, day: date, build: bool = True) -> Optional[dict]:
+        """Return {"content", "etag", "complete"} for the day
+
+        With `build=False` a day that was never stored returns None instead
+        of calling the sources.
+        """
+        key = day.isoformat()
+        entry = self._days.get(key)
+        if entry is not None and (entry["complete"] or entry["expires_at"] > time.monotonic()):
+            return entry
+        return await self.coalesce(("daily_content", key, build), lambda: self._load(day, build))
+
+    def forget(self, day: Optional[date] = None) -> None:
+        if day is None:
+            self._days.clear()
+        else:
+            self._days.pop(day.isoformat(), None)
+
+    async def _load(self, day: date, build: bool) -> Optional[dict]:
+        key = day.isoformat()
+        stored = await self.repository.get(key)
+        if stored is None:
+            if not build:
+                return None
+            content, complete = await self._build(day)
+            if not complete:
+                entry = {
+                    "content": content,
+                    "etag": content_etag(content),
+                    "complete": False,
+                    "expires_at": time.monotonic() + self.retry_after
+                }
+                self._days[key] = entry
+                return entry
+            # First worker to finish wins; everyone serves the same document
+            stored = await self.repository.put_if_absent(key, content)
+
+        entry = {"content": stored, "etag": content_etag(stored), "complete": True}
+        self._days[key] = entry
+        for stale in sorted(self._days)[:-self.keep_days]:
+            del self._days[stale]
+        return entry
+
+    async def _build(self, day: date):
+        names = list(self.sources)
+        results = await asyncio.gather(
+            *(self.sources[name].fetch(day) for name in names),
+            return_exceptions=True
+        )
+        content = {"date": day.isoformat()}
+        complete = True
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error building daily {name}: {str(result)}")
+                result = None
+            if not result or result in (DEFAULT_FACT, DEFAULT_PUZZLE):
+                complete = False
+            content[name] = result
+        return content, complete
@@ -0,0 +1,297 @@
+"""Per-request MongoDB command accounting through PyMongo command monitoring
+
+`CommandMonitor` is registered as an event listener on the Motor client.
+PyMongo calls it from Motor's executor threads, which run with a copy of the
+calling task's context, so each command is charged to whatever
+`RequestQueries` the request put in `current_queries`. `DBTimingMiddleware`
+sets that up per request, reports the totals in a Server-Timing header and
+the metrics, and checks them against per-route query budgets.
+`PoolMonitor` does the same for the connection pool: how long requests wait
+to check out a connection and how many are open and in use.
+"""
+from contextvars import ContextVar
+from typing import Dict, Optional
+import json
+import logging
+import threading
+import time
+
+from pymongo import monitoring
+
+from metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Where commands hold their filter, per command name
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes"
+}
+
+QUERY_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 50, 100)
+
+# Connection checkout wait buckets in seconds
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+class RequestQueries:
+    """Database commands run on behalf of one request"""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+
+def filter_shape(value):
+    """Replace literal values with "?" so a filter can be logged without user data"""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [filter_shape(item) for item in value if isinstance(item, (dict, list, tuple))]
+        return shapes[:1] if shapes else "?"
+    return "?"
+
+
+def command_shape(command_name: str, command: dict):
+    field = FILTER_FIELDS.get(command_name)
+    if field is None:
+        return None
+    value = command.get(field)
+    if command_name in ("update", "delete"):
+        value = [op.get("q") for op in value or ()]
+    return filter_shape(value)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """Counts and times every command, per request and per (command, collection)"""
+
+    def __init__(self, slow_ms: float = 100):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._started: Dict[tuple, tuple] = {}
+        # (command, collection) -> [count, seconds, failures]
+        self.commands: Dict[tuple, list] = {}
+        self.slow = 0
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        self._started[(event.connection_id, event.request_id)] = (current_queries.get(), collection, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        queries, collection, command = started
+        seconds = event.duration_micros / 1e6
+        with self._lock:
+            if queries is not None:
+                queries.count += 1
+                queries.seconds += seconds
+            totals = self.commands.get((event.command_name, collection))
+            if totals is None:
+                totals = self.commands[(event.command_name, collection)] = [0, 0.0, 0]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += failed
+        if seconds * 1000 >= self.slow_ms:
+            self.slow += 1
+            logger.warning(
+                f"Slow MongoDB {event.command_name} on {collection or event.database_name}: "
+                f"{seconds * 1000:.1f}ms, filter {json.dumps(command_shape(event.command_name, command))}"
+            )
+
+    def collect(self):
+        """Metric families for MetricsRegistry.add_collector"""
+        with self._lock:
+            rows = [(key, list(totals)) for key, totals in self.commands.items()]
+        yield ("daily_bite_mongo_commands_total", "counter", "MongoDB commands by command and collection", [
+            ({"command": name, "collection": collection}, totals[0]) for (name, collection), totals in rows
+        ])
+        yield ("daily_bite_mongo_command_seconds_total", "counter", "Time spent in MongoDB commands", [
+            ({"command": name, "collection": collection}, round(totals[1], 6)) for (name, collection), totals in rows
+        ])
+        yield ("daily_bite_mongo_command_failures_total", "counter", "MongoDB commands that failed", [
+            ({"command": name, "collection": collection}, totals[2]) for (name, collection), totals in rows
+        ])
+        yield ("daily_bite_mongo_slow_commands_total", "counter", "MongoDB commands over the slow query threshold", [
+            ({}, self.slow)
+        ])
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool metrics: checkout waits, failed checkouts, open and in-use connections
+
+    A checkout starts and finishes on the same executor thread, so the start
+    time is kept in a thread-local. The metrics are updated from those
+    threads, so unlike the registry's own metrics they sit behind a lock and
+    render under it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.wait = Histogram(
+            "daily_bite_mongo_pool_wait_seconds",
+            "Time spent waiting to check out a pooled MongoDB connection",
+            buckets=POOL_WAIT_BUCKETS
+        )
+        self.failures = Counter(
+            "daily_bite_mongo_pool_checkout_failures_total",
+            "Connection checkouts that failed, by reason (timeout means the pool was exhausted)",
+            ("reason",)
+        )
+        self.connections = Gauge(
+            "daily_bite_mongo_pool_connections",
+            "Pooled MongoDB connections, open and checked out",
+            ("state",)
+        )
+        self.cleared = Counter("daily_bite_mongo_pool_cleared_total", "Times a connection pool was cleared")
+
+    def connection_check_out_started(self, event) -> None:
+        self._local.started = time.perf_counter()
+
+    def _waited(self) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_checked_out(self, event) -> None:
+        waited = self._waited()
+        with self._lock:
+            self.wait.observe((), waited)
+            self.connections.inc(("in_use",))
+
+    def connection_check_out_failed(self, event) -> None:
+        waited = self._waited()
+        with self._lock:
+            self.wait.observe((), waited)
+            self.failures.inc((event.reason,))
+
+    def connection_checked_in(self, event) -> None:
+        with self._lock:
+            self.connections.dec(("in_use",))
+
+    def connection_created(self, event) -> None:
+        with self._lock:
+            self.connections.inc(("open",))
+
+    def connection_closed(self, event) -> None:
+        with self._lock:
+            self.connections.dec(("open",))
+
+    def pool_cleared(self, event) -> None:
+        with self._lock:
+            self.cleared.inc()
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def render(self):
+        """Exposition lines for MetricsRegistry.register"""
+        with self._lock:
+            return self.wait.render() + self.failures.render() + self.connections.render() + self.cleared.render()
+
+
+class DBMetrics:
+    """The per-request database metrics recorded by DBTimingMiddleware"""
+
+    def __init__(self, registry):
+        self.queries = registry.histogram(
+            "http_request_db_queries",
+            "Database commands run per request",
+            ("route",),
+            buckets=QUERY_BUCKETS
+        )
+        self.seconds = registry.histogram(
+            "http_request_db_seconds",
+            "Time spent in database commands per request",
+            ("route",)
+        )
+        self.over_budget = registry.counter(
+            "http_request_db_budget_exceeded_total",
+            "Requests that ran more database commands than their route's budget",
+            ("route",)
+        )
+
+
+class DBTimingMiddleware:
+    """Per-request database accounting: Server-Timing header, metrics and query budgets
+
+    `budgets` maps route templates to the most database commands a request
+    may run. Going over is logged; with `enforce` the response is replaced
+    by a 500 so functional tests fail on query-count regressions.
+    """
+
+    def __init__(self, app, metrics: DBMetrics, budgets: Dict[str, int], enforce: bool = False):
+        self.app = app
+        self.metrics = metrics
+        self.budgets = budgets
+        self.enforce = enforce
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+        replaced = False
+
+        async def timed_send(message):
+            nonlocal replaced
+            if replaced:
+                return
+            if message["type"] == "http.response.start":
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                self.metrics.queries.observe((route,), queries.count)
+                self.metrics.seconds.observe((route,), queries.seconds)
+                budget = self.budgets.get(route)
+                if budget is not None and queries.count > budget:
+                    self.metrics.over_budget.inc((route,))
+                    detail = f"Query budget exceeded: {route} ran {queries.count} database commands (budget {budget})"
+                    logger.warning(detail)
+                    if self.enforce:
+                        replaced = True
+                        body = json.dumps({"detail": detail}).encode()
+                        await send({
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                        })
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                timing = f'db;dur={queries.seconds * 1000:.3f};desc="{queries.count} queries"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            current_queries.reset(token)
@@ -0,0 +1,152 @@
+"""Write-behind ingestion: buffer submissions and flush them to storage in batches"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue stays full for longer than the put timeout"""
+
+
+class IngestQueue:
+    """Bounded asyncio queue drained by one background flusher
+
+    Items are grouped into batches of up to `max_batch` entries or whatever
+    arrived within `flush_interval` seconds of the first one, then handed to
+    `flush` together. Each item is tracked per user so readers can wait for
+    their own pending writes (read-your-writes) with `sync(user_id)`.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[List[Any]], Awaitable[None]],
+        user_key: Callable[[Any], str],
+        max_batch: int = 500,
+        flush_interval: float = 0.05,
+        maxsize: int = 10000,
+        put_timeout: float = 0.5
+    ):
+        self.flush = flush
+        self.user_key = user_key
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._pending: Dict[str, Set[asyncio.Future]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+        self.flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def submit(self, item: Any) -> asyncio.Future:
+        """Enqueue an item, waiting up to `put_timeout` for space (backpressure)"""
+        done = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._queue.put((item, done)), timeout=self.put_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueFullError("Ingestion queue is full")
+        self.enqueued += 1
+        user = self.user_key(item)
+        self._pending.setdefault(user, set()).add(done)
+        done.add_done_callback(lambda fut: self._forget(user, fut))
+        return done
+
+    async def sync(self, user_id: str) -> None:
+        """Wait until every item submitted so far for `user_id` has been flushed"""
+        pending = list(self._pending.get(user_id, ()))
+        if pending:
+            await asyncio.wait(pending)
+
+    async def drain(self) -> None:
+        """Flush everything still queued and stop the flusher"""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def _forget(self, user: str, fut: asyncio.Future) -> None:
+        futures = self._pending.get(user)
+        if futures is not None:
+            futures.discard(fut)
+            if not futures:
+                del self._pending[user]
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._flush_batch(batch)
+
+        # Drain whatever was enqueued after the stop marker was seen
+        leftovers = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not None:
+                leftovers.append(entry)
+        for start in range(0, len(leftovers), self.max_batch):
+            await self._flush_batch(leftovers[start:start + self.max_batch])
+
+    async def _flush_batch(self, batch: List[tuple]) -> None:
+        started = time.perf_counter()
+        try:
+            await self.flush([item for item, _ in batch])
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Error flushing {len(batch)} queued items: {str(e)}")
+            for _, done in batch:
+                if not done.done():
+                    done.set_exception(e)
+                    # Readers only wait on these; nobody else retrieves the error
+                    done.exception()
+        else:
+            self.flushed += len(batch)
+            for _, done in batch:
+                if not done.done():
+                    done.set_result(None)
+        finally:
+            self.batches += 1
+            self.flush_seconds += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "batches": self.batches,
+            "flush_seconds": round(self.flush_seconds, 6)
+        }
@@ -0,0 +1,378 @@
+"""Cross-worker invalidation: every worker applies the cache effects of every write"""
+from datetime import timezone
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, Optional, Set, Tuple
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Invalidation lag buckets in seconds
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Invalidation(NamedTuple):
+    """What a write made stale, in a form any worker can apply
+
+    `scores` rows are (user_id, date, score, time_taken, delta); delta is the
+    change in the user's total, or None when only the new best is known.
+    `totals` rows are (user_id, total_score). `histograms` are the dates
+    whose score histogram changed. `everything` asks for a full flush, for
+    when events may have been missed.
+    """
+
+    tags: Tuple[str, ...] = ()
+    users: Tuple[str, ...] = ()
+    scores: Tuple[tuple, ...] = ()
+    totals: Tuple[tuple, ...] = ()
+    histograms: Tuple[str, ...] = ()
+    everything: bool = False
+    origin: Optional[str] = None
+    sent_at: Optional[float] = None
+
+    def encode(self) -> bytes:
+        return json.dumps(self._asdict(), separators=(",", ":")).encode()
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Invalidation":
+        fields = json.loads(data)
+        for name in ("tags", "users", "histograms"):
+            fields[name] = tuple(fields.get(name, ()))
+        for name in ("scores", "totals"):
+            fields[name] = tuple(tuple(row) for row in fields[name])
+        return cls(**fields)
+
+    def halves(self) -> Tuple["Invalidation", "Invalidation"]:
+        """Split into two events that together invalidate the same things"""
+        first, second = {}, {}
+        for name in ("tags", "users", "scores", "totals", "histograms"):
+            values = getattr(self, name)
+            middle = (len(values) + 1) // 2
+            first[name], second[name] = values[:middle], values[middle:]
+        return self._replace(**first), self._replace(**second)
+
+
+class Transport:
+    """How invalidations travel between workers
+
+    `publish` sends this worker's event to the others and returns how many
+    deliveries were dropped. `listen` yields
+    events from the other workers; it may also yield this worker's own
+    events, which the bus skips by origin.
+    """
+
+    name = "none"
+    # False for transports fed by the database rather than by the workers
+    publishes = True
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, event: Invalidation) -> int:
+        raise NotImplementedError
+
+    def listen(self) -> AsyncIterator[Invalidation]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalHub:
+    """In-process pub/sub shared by the LocalTransports of one process"""
+
+    def __init__(self):
+        self.queues: Set[asyncio.Queue] = set()
+
+
+class LocalTransport(Transport):
+    """In-process stand-in: for tests and for several apps in one process"""
+
+    name = "local"
+
+    def __init__(self, hub: LocalHub):
+        self.hub = hub
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def start(self) -> None:
+        self.hub.queues.add(self._queue)
+
+    async def publish(self, event: Invalidation) -> int:
+        for queue in self.hub.queues:
+            queue.put_nowait(event)
+        return 0
+
+    async def listen(self) -> AsyncIterator[Invalidation]:
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        self.hub.queues.discard(self._queue)
+
+
+class UnixSocketTransport(Transport):
+    """Workers on one host: each binds a datagram socket in `directory` and sends to all the others
+
+    No broker is involved; a worker that died without cleaning up leaves a
+    socket nobody listens on, which the first send to it removes. A peer
+    whose receive buffer is full misses the event, so its caches stay stale
+    until their TTL runs out.
+    """
+
+    name = "unix"
+    max_datagram = 60000
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path: Optional[str] = None
+        self._sock: Optional[socket.socket] = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    async def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.sock")
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        self._sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._sock.fileno(), self._readable)
+
+    def _readable(self) -> None:
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            try:
+                self._queue.put_nowait(Invalidation.decode(data))
+            except (ValueError, TypeError) as e:
+                logger.error(f"Discarding malformed invalidation datagram: {str(e)}")
+
+    def _datagrams(self, event: Invalidation):
+        data = event.encode()
+        if len(data) <= self.max_datagram:
+            yield data
+            return
+        for half in event.halves():
+            yield from self._datagrams(half)
+
+    async def publish(self, event: Invalidation) -> int:
+        datagrams = list(self._datagrams(event))
+        dropped = 0
+        for name in os.listdir(self.directory):
+            peer = os.path.join(self.directory, name)
+            if peer == self.path or not name.endswith(".sock"):
+                continue
+            for data in datagrams:
+                try:
+                    self._sock.sendto(data, peer)
+                except BlockingIOError:
+                    dropped += 1
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Left behind by a worker that is gone
+                    try:
+                        os.unlink(peer)
+                    except OSError:
+                        pass
+                    break
+        return dropped
+
+    async def listen(self) -> AsyncIterator[Invalidation]:
+        while True:
+            yield await self._queue.get()
+
+    async def close(self) -> None:
+        if self._sock is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+def change_time(change: dict) -> Optional[float]:
+    """When the change was committed, as a Unix timestamp"""
+    wall_time = change.get("wallTime")
+    if wall_time is not None:
+        # The driver returns naive UTC datetimes unless the client is tz_aware
+        if wall_time.tzinfo is None:
+            wall_time = wall_time.replace(tzinfo=timezone.utc)
+        return wall_time.timestamp()
+    cluster_time = change.get("clusterTime")
+    return float(cluster_time.time) if cluster_time is not None else None
+
+
+class ChangeStreamTransport(Transport):
+    """Tail one MongoDB change stream over `collections` and translate each change
+
+    Every worker sees every committed write, including writes from other
+    services and from workers that crashed before telling anyone, so there
+    is nothing to publish. Needs a replica set (a single-node one will do).
+    After a dropped connection the stream resumes from the last event seen;
+    if it cannot, the bus is asked to flush everything once, since some
+    events were missed.
+    """
+
+    name = "changestream"
+    publishes = False
+
+    def __init__(
+        self,
+        database,
+        collections: Tuple[str, ...],
+        translate: Callable[[dict], Optional[Invalidation]],
+        max_backoff: float = 30.0
+    ):
+        self.database = database
+        self.collections = collections
+        self.translate = translate
+        self.max_backoff = max_backoff
+        self.resumes = 0
+
+    def _pipeline(self) -> list:
+        return [
+            {"$match": {
+                "ns.coll": {"$in": list(self.collections)},
+                "operationType": {"$in": ["insert", "update", "replace"]}
+            }},
+            # Only what translate() reads; _id is the resume token and stays
+            {"$project": {
+                "operationType": 1, "ns.coll": 1, "clusterTime": 1, "wallTime": 1,
+                "fullDocument.uid": 1, "fullDocument.user_id": 1, "fullDocument.date": 1,
+                "fullDocument.score": 1, "fullDocument.time_taken": 1, "fullDocument.total_score": 1,
+                "fullDocument.bucket": 1
+            }}
+        ]
+
+    async def publish(self, event: Invalidation) -> int:
+        return 0
+
+    async def listen(self) -> AsyncIterator[Invalidation]:
+        from pymongo.errors import OperationFailure, PyMongoError
+
+        resume_after = None
+        opened = False
+        backoff = 0.5
+        while True:
+            try:
+                async with self.database.watch(
+                    self._pipeline(),
+                    full_document="updateLookup",
+                    resume_after=resume_after
+                ) as stream:
+                    if opened and resume_after is None:
+                        yield Invalidation(everything=True, sent_at=time.time())
+                    opened = True
+                    backoff = 0.5
+                    async for change in stream:
+                        resume_after = change["_id"]
+                        event = self.translate(change)
+                        if event is not None:
+                            yield event._replace(sent_at=change_time(change))
+            except OperationFailure as e:
+                if resume_after is not None and e.code in (260, 280, 286):
+                    # The resume point fell off the oplog: start afresh and flush
+                    logger.error(f"Change stream cannot resume, flushing caches: {str(e)}")
+                    resume_after = None
+                else:
+                    logger.error(f"Change stream failed: {str(e)}")
+            except PyMongoError as e:
+                logger.error(f"Change stream interrupted: {str(e)}")
+            self.resumes += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+class InvalidationBus:
+    """Publish this worker's invalidations and apply everyone else's
+
+    Writers apply their own invalidation locally first and then publish it;
+    the bus skips events carrying its own origin. Delivery is best effort:
+    a lost event leaves a worker's caches stale only until their TTL.
+    """
+
+    def __init__(self, transport: Optional[Transport], apply: Callable[[Invalidation], Awaitable[None]]):
+        self.transport = transport
+        self.apply = apply
+        self.origin: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        source = transport.name if transport is not None else "none"
+        self._source = (source,)
+        self.lag = Histogram(
+            "daily_bite_invalidation_lag_seconds",
+            "Time from a write being committed or published to this worker applying it",
+            ("source",),
+            buckets=LAG_BUCKETS
+        )
+        self.events = Counter(
+            "daily_bite_invalidation_events_total",
+            "Invalidations received from other workers or the database, by outcome",
+            ("source", "outcome")
+        )
+        self.published = Counter(
+            "daily_bite_invalidation_published_total",
+            "Invalidations this worker sent to the others; dropped counts deliveries a peer missed",
+            ("source", "outcome")
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        if self.transport is None or self._task is not None:
+            return
+        # Decided here, not at import, so forked workers get distinct origins
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        await self.transport.start()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def publish(self, event: Invalidation) -> None:
+        if self._task is None or not self.transport.publishes:
+            return
+        try:
+            dropped = await self.transport.publish(event._replace(origin=self.origin, sent_at=time.time()))
+            self.published.inc(self._source + ("sent",))
+            if dropped:
+                self.published.inc(self._source + ("dropped",), dropped)
+        except Exception as e:
+            self.published.inc(self._source + ("failed",))
+            logger.error(f"Error publishing invalidation: {str(e)}")
+
+    async def _run(self) -> None:
+        source = self._source[0]
+        async for event in self.transport.listen():
+            if event.origin is not None and event.origin == self.origin:
+                self.events.inc((source, "own"))
+                continue
+            try:
+                await self.apply(event)
+            except Exception as e:
+                self.events.inc((source, "failed"))
+                logger.error(f"Error applying invalidation: {str(e)}")
+                continue
+            self.events.inc((source, "flushed" if event.everything else "applied"))
+            if event.sent_at is not None:
+                self.lag.observe(self._source, max(0.0, time.time() - event.sent_at))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.transport.close()
+
+    def render(self) -> list:
+        return self.lag.render() + self.events.render() + self.published.render()
@@ -0,0 +1,159 @@
+"""Live leaderboard push over Server-Sent Events with coalesced fan-out"""
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    """One open stream: a small queue of encoded events waiting to be sent"""
+
+    __slots__ = ("queue",)
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+
+class LiveLeaderboard:
+    """Push top-N changes of each board to everyone watching it
+
+    Writers call `touch(board)`, which only marks the board dirty. At most
+    once per `tick` seconds the hub recomputes each dirty board's top N once
+    with `snapshot(board, size)`, diffs it against what subscribers last
+    saw, and enqueues the same encoded event for all of them, however many
+    scores changed in between.
+
+    A subscriber whose queue is full is a slow consumer: its queued events
+    are dropped and replaced by one full snapshot, so memory per subscriber
+    stays bounded and it resumes from the current state rather than
+    replaying history.
+    """
+
+    def __init__(
+        self,
+        snapshot: Callable[[str, int], Awaitable[List[dict]]],
+        size: int = 10,
+        tick: float = 0.5,
+        queue_size: int = 8
+    ):
+        self.snapshot = snapshot
+        self.size = size
+        self.tick = tick
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._boards: Dict[str, List[dict]] = {}
+        self._versions: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.diffs = 0
+        self.deliveries = 0
+        self.resyncs = 0
+
+    def touch(self, board: str) -> None:
+        """Note that `board` may have changed; cheap enough to call on every write"""
+        if board in self._subscribers:
+            self._dirty.add(board)
+
+    def _encode(self, event: str, board: str, data: dict) -> bytes:
+        version = self._versions.get(board, 0)
+        payload = json.dumps({"board": board, "version": version, **data}, separators=(",", ":"), default=str)
+        return f"id: {version}\nevent: {event}\ndata: {payload}\n\n".encode()
+
+    def _snapshot_event(self, board: str) -> bytes:
+        return self._encode("snapshot", board, {"entries": self._boards[board]})
+
+    async def subscribe(self, board: str) -> Subscriber:
+        if board not in self._subscribers:
+            self._boards[board] = await self.snapshot(board, self.size)
+        subscriber = Subscriber(self.queue_size)
+        subscriber.queue.put_nowait(self._snapshot_event(board))
+        self._subscribers.setdefault(board, set()).add(subscriber)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+        return subscriber
+
+    def unsubscribe(self, board: str, subscriber: Subscriber) -> None:
+        subscribers = self._subscribers.get(board)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            # Nobody is watching: stop tracking it until the next subscriber
+            del self._subscribers[board]
+            self._boards.pop(board, None)
+            self._dirty.discard(board)
+
+    async def _run(self) -> None:
+        try:
+            while self._subscribers:
+                await asyncio.sleep(self.tick)
+                dirty, self._dirty = self._dirty, set()
+                for board in dirty:
+                    if board in self._subscribers:
+                        try:
+                            await self._publish(board)
+                        except Exception as e:
+                            logger.error(f"Error publishing live leaderboard {board}: {str(e)}")
+        finally:
+            self._task = None
+
+    async def _publish(self, board: str) -> None:
+        entries = await self.snapshot(board, self.size)
+        subscribers = self._subscribers.get(board)
+        if not subscribers:
+            return
+        previous = self._boards.get(board, [])
+        changed = [entry for i, entry in enumerate(entries) if i >= len(previous) or previous[i] != entry]
+        if not changed and len(entries) == len(previous):
+            return
+
+        # Clients overwrite the changed positions and truncate to `size`
+        self._boards[board] = entries
+        self._versions[board] = self._versions.get(board, 0) + 1
+        message = self._encode("diff", board, {"changed": changed, "size": len(entries)})
+        resync = None
+        self.diffs += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                if resync is None:
+                    resync = self._snapshot_event(board)
+                subscriber.queue.put_nowait(resync)
+                self.resyncs += 1
+        self.deliveries += len(subscribers)
+
+    async def stream(self, board: str, keepalive: float = 15.0, max_seconds: float = 300.0) -> AsyncIterator[bytes]:
+        """SSE body for one subscriber
+
+        The stream ends after `max_seconds` and the client reconnects (the
+        `retry` field sets its delay); that keeps a worker's connections
+        from pinning it through a graceful shutdown or a rebalance.
+        """
+        subscriber = await self.subscribe(board)
+        deadline = time.monotonic() + max_seconds
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), min(keepalive, remaining))
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(board, subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": {board: len(subscribers) for board, subscribers in self._subscribers.items()},
+            "diffs": self.diffs,
+            "deliveries": self.deliveries,
+            "resyncs": self.resyncs
+        }
@@ -0,0 +1,93 @@
+"""Maintenance commands for the Daily Bite backend
+
+Run from the backend directory, e.g. `python manage.py rebuild-totals`.
+`expire-streaks` is meant to run from cron shortly after midnight UTC, and
+`freeze-leaderboards` once the snapshot grace period (an hour by default) is over:
+
+    5 0 * * * cd /app/backend && python manage.py expire-streaks
+    15 1 * * * cd /app/backend && python manage.py freeze-leaderboards
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+import asyncio
+import time
+
+import typer
+
+import server
+
+cli = typer.Typer(help="Daily Bite maintenance commands")
+
+
+@cli.callback()
+def main():
+    """Daily Bite maintenance commands"""
+
+
+@cli.command("rebuild-totals")
+def rebuild_totals():
+    """Recompute the user_totals stats rollup (all-time totals, recent scores) from scores"""
+    count = asyncio.run(server.rebuild_user_totals())
+    typer.echo(f"Rebuilt stats rollup for {count} users")
+
+
+@cli.command("rebuild-buckets")
+def rebuild_buckets():
+    """Recompute the weekly and monthly leaderboard buckets from scores"""
+    started = time.perf_counter()
+    count = asyncio.run(server.rebuild_leaderboard_buckets())
+    typer.echo(f"Rebuilt {count} weekly and monthly leaderboard rows in {time.perf_counter() - started:.3f}s")
+
+
+@cli.command("rebuild-histograms")
+def rebuild_histograms(
+    date: Optional[str] = typer.Option(None, help="Day to rebuild (YYYY-MM-DD, default today)"),
+    days: int = typer.Option(1, help="Rebuild this many days ending at --date")
+):
+    """Recompute the per-day score histograms behind percentiles from scores"""
+    async def run():
+        last = datetime.strptime(date or server.get_today_string(), '%Y-%m-%d').date()
+        counts = {}
+        for offset in range(days - 1, -1, -1):
+            day = (last - timedelta(days=offset)).isoformat()
+            counts[day] = await server.storage.histograms.rebuild(day)
+        return counts
+
+    started = time.perf_counter()
+    counts = asyncio.run(run())
+    for day, count in counts.items():
+        typer.echo(f"{day}: {count} scores")
+    typer.echo(f"Rebuilt {len(counts)} score histograms in {time.perf_counter() - started:.3f}s")
+
+
+@cli.command("expire-streaks")
+def expire_streaks(
+    dry_run: bool = typer.Option(False, "--dry-run", help="Only count the streaks that would be reset"),
+    today: Optional[str] = typer.Option(None, help="Run as if today were this date (YYYY-MM-DD)")
+):
+    """Reset the streak of every user whose last streak day is before yesterday"""
+    report = asyncio.run(server.expire_streaks(today=today, dry_run=dry_run))
+    verb = "Would reset" if dry_run else "Reset"
+    count = report["matched"] if dry_run else report["modified"]
+    rate = report["matched"] / report["seconds"] if report["seconds"] else 0
+    typer.echo(
+        f"{verb} {count} streaks last played before {report['cutoff']} "
+        f"({report['matched']} matched) in {report['seconds']:.3f}s, {rate:,.0f} users/s"
+    )
+
+
+@cli.command("freeze-leaderboards")
+def freeze_leaderboards(
+    days: int = typer.Option(7, help="How many past days to check for missing snapshots")
+):
+    """Freeze the top entries and score histogram of each finished day into leaderboard_snapshots"""
+    report = asyncio.run(server.freeze_leaderboards(days=days))
+    typer.echo(
+        f"Froze {len(report['frozen'])} days ({', '.join(report['frozen']) or 'none'}), "
+        f"{len(report['empty'])} without scores, {len(report['already_frozen'])} already frozen, "
+        f"in {report['seconds']:.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    cli()
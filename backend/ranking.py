@@ -0,0 +1,137 @@
+"""In-memory ranked leaderboards for O(log n) rank and neighbourhood queries"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+class RankedBoard:
+    """Order-statistic index of one leaderboard keyed on (-score, time_taken, user_id)"""
+
+    def __init__(self):
+        self._keys = SortedList()
+        self._by_user: Dict[str, Tuple[int, int, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_user)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._by_user
+
+    def load(self, entries: Iterable[Tuple[str, int, int]]) -> None:
+        """Replace the board with (user_id, score, time_taken) rows, sorting once"""
+        self._by_user = {
+            user_id: (-score, time_taken, user_id)
+            for user_id, score, time_taken in entries
+        }
+        self._keys = SortedList(self._by_user.values())
+
+    def upsert(self, user_id: str, score: int, time_taken: int = 0) -> None:
+        """Set the user's score unconditionally"""
+        old = self._by_user.get(user_id)
+        if old is not None:
+            self._keys.remove(old)
+        key = (-score, time_taken, user_id)
+        self._by_user[user_id] = key
+        self._keys.add(key)
+
+    def submit_best(self, user_id: str, score: int, time_taken: int = 0) -> bool:
+        """Keep the user's best score, mirroring submit_score semantics"""
+        old = self._by_user.get(user_id)
+        if old is not None and score <= -old[0]:
+            return False
+        self.upsert(user_id, score, time_taken)
+        return True
+
+    def add(self, user_id: str, delta: int) -> None:
+        """Increment the user's score by `delta`"""
+        old = self._by_user.get(user_id)
+        current = -old[0] if old is not None else 0
+        self.upsert(user_id, current + delta, old[1] if old is not None else 0)
+
+    def remove(self, user_id: str) -> None:
+        key = self._by_user.pop(user_id, None)
+        if key is not None:
+            self._keys.remove(key)
+
+    def score(self, user_id: str) -> Optional[Tuple[int, int]]:
+        """Return (score, time_taken) for the user, or None if unranked"""
+        key = self._by_user.get(user_id)
+        return None if key is None else (-key[0], key[1])
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based position of the user, or None if unranked"""
+        key = self._by_user.get(user_id)
+        if key is None:
+            return None
+        return self._keys.index(key) + 1
+
+    def slice(self, start: int, stop: int) -> List[dict]:
+        """Entries for 0-based positions [start, stop)"""
+        start = max(start, 0)
+        return [
+            {"user_id": key[2], "score": -key[0], "time_taken": key[1], "rank": start + offset + 1}
+            for offset, key in enumerate(self._keys.islice(start, stop))
+        ]
+
+    def top(self, n: int) -> List[dict]:
+        return self.slice(0, n)
+
+    def around(self, user_id: str, radius: int) -> List[dict]:
+        """Entries within `radius` positions above and below the user"""
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        return self.slice(rank - 1 - radius, rank + radius)
+
+
+class LeaderboardIndex:
+    """Ranked boards for the most recent days plus the all-time totals"""
+
+    def __init__(self, max_days: int = 2):
+        self.max_days = max_days
+        self.days: Dict[str, RankedBoard] = {}
+        self.all_time = RankedBoard()
+
+    def day(self, date: str, create: bool = False) -> Optional[RankedBoard]:
+        board = self.days.get(date)
+        if board is None and create:
+            board = self.days[date] = RankedBoard()
+            # Only the newest `max_days` days stay resident
+            for stale in sorted(self.days)[:-self.max_days]:
+                del self.days[stale]
+        return board
+
+    def record_score(self, user_id: str, date: str, score: int, time_taken: int, score_delta: int) -> None:
+        """Feed one accepted submission into the day board and the all-time board"""
+        if score_delta or user_id not in self.all_time:
+            self.all_time.add(user_id, score_delta)
+        self.submit_best(user_id, date, score, time_taken)
+
+    def submit_best(self, user_id: str, date: str, score: int, time_taken: int) -> None:
+        """Feed a day's best score into its board; a new day gets a board, days already dropped don't"""
+        newest = max(self.days) if self.days else date
+        if date >= newest or date in self.days:
+            self.day(date, create=True).submit_best(user_id, score, time_taken)
+
+
+def histogram_percentile(cells: Dict[Tuple[int, int], int], cell: Tuple[int, int]) -> dict:
+    """How many of the other players a (score band, time band) cell beats, from histogram counts
+
+    Lower score bands, and the same score band with a slower time band, are
+    beaten; the others sharing the cell count as half beaten. The cost
+    depends on the number of cells, not players. A player alone on the
+    board beats everyone there is to beat: 100%.
+    """
+    players = sum(cells.values())
+    score_band, time_band = cell
+    beaten = 0
+    for (other_score, other_time), count in cells.items():
+        if other_score < score_band or (other_score == score_band and other_time > time_band):
+            beaten += count
+    beaten += max(cells.get(cell, 0) - 1, 0) / 2
+    others = max(players - 1, 0)
+    return {
+        "players": players,
+        "beaten": int(beaten),
+        "percentile": round(min(beaten / others, 1.0) * 100, 1) if others else 100.0
+    }
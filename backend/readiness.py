@@ -0,0 +1,55 @@
+"""Readiness probe: database reachability from a cached, time-bounded ping"""
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+import asyncio
+import time
+
+
+class ReadinessProbe:
+    """Ping the database at most once per `ttl` seconds and remember the outcome
+
+    Probes arriving while the result is fresh get it without touching the
+    database; probes arriving while a ping is running share that ping. A
+    ping that takes longer than `timeout` counts as a failure, so an
+    unreachable server cannot hold probe requests for the driver's full
+    server selection timeout.
+    """
+
+    def __init__(self, ping: Callable[[], Awaitable[None]], ttl: float = 2.0, timeout: float = 1.0):
+        self.ping = ping
+        self.ttl = ttl
+        self.timeout = timeout
+        self._result: Optional[dict] = None
+        self._checked = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+
+    async def check(self) -> dict:
+        if self._result is not None and time.monotonic() - self._checked < self.ttl:
+            return self._result
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._ping())
+            self._inflight.add_done_callback(self._forget)
+        return await asyncio.shield(self._inflight)
+
+    def _forget(self, task: asyncio.Task) -> None:
+        if self._inflight is task:
+            self._inflight = None
+
+    async def _ping(self) -> dict:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.ping(), self.timeout)
+            result = {"ok": True}
+        except asyncio.TimeoutError:
+            result = {"ok": False, "error": f"ping timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["checked_at"] = datetime.utcnow().isoformat()
+        self._result = result
+        self._checked = time.monotonic()
+        return result
+
+    def forget(self) -> None:
+        """Drop the cached result so the next check pings again"""
+        self._result = None
@@ -1,25 +1,269 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
 from typing import List, Optional
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
 import os
+import asyncio
+import base64
+import json
 import logging
+import time
 import uuid
 import hashlib
 import hmac
 
+from admission import AdmissionControl, RateLimited, Rejected
+from cache import InMemoryCacheBackend, ResponseCache, TTLCache
+from db_monitor import CommandMonitor, DBMetrics, DBTimingMiddleware, PoolMonitor
+from daily_content import DailyContentService, content_etag, default_sources, etag_matches, fixture_sources
+from ingest import IngestQueue, QueueFullError
+from invalidation import ChangeStreamTransport, Invalidation, InvalidationBus, LocalHub, LocalTransport, UnixSocketTransport
+from live import LiveLeaderboard
+from metrics import CONTENT_TYPE, HTTPMetrics, MetricsMiddleware, MetricsRegistry
+from ranking import LeaderboardIndex, histogram_percentile
+from readiness import ReadinessProbe
+from singleflight import SingleFlight, make_key
+from storage import BUCKET_PERIODS, DuplicateKeyError, MemoryStorage, MongoStorage, ScoreBands, ScoreWrite, period_bucket
+
 # Load environment variables
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 load_dotenv(os.path.join(ROOT_DIR, '.env'))
 
-# MongoDB connection
-mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'daily_bite_db')]
+# Counts and times every MongoDB command per request; slower ones are logged
+command_monitor = CommandMonitor(slow_ms=float(os.environ.get('MONGO_SLOW_QUERY_MS', '100')))
+pool_monitor = PoolMonitor()
+
+# Motor client tuning, one variable per driver option; unset ones keep the
+# driver default (or whatever the URI sets). Size the pool per worker:
+# gunicorn workers x MONGO_MAX_POOL_SIZE must fit the server's connection
+# limit. MONGO_COMPRESSORS=zstd,snappy,zlib negotiates the first one the
+# server supports (zstd needs the zstandard package, snappy python-snappy).
+MONGO_CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': ('maxPoolSize', int),
+    'MONGO_MIN_POOL_SIZE': ('minPoolSize', int),
+    'MONGO_MAX_CONNECTING': ('maxConnecting', int),
+    'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', int),
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', int),
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', int),
+    'MONGO_CONNECT_TIMEOUT_MS': ('connectTimeoutMS', int),
+    'MONGO_SOCKET_TIMEOUT_MS': ('socketTimeoutMS', int),
+    'MONGO_COMPRESSORS': ('compressors', str),
+    'MONGO_ZLIB_COMPRESSION_LEVEL': ('zlibCompressionLevel', int)
+}
+
+def mongo_client_options() -> dict:
+    """AsyncIOMotorClient keyword arguments from the MONGO_* variables that are set"""
+    options = {}
+    for name, (option, parse) in MONGO_CLIENT_OPTIONS.items():
+        value = os.environ.get(name)
+        if value:
+            options[option] = parse(value)
+    return options
+
+# Per-day score histograms (percentiles, leaderboard snapshots) count scores in
+# SCORE_HISTOGRAM_WIDTH-point bands, split by SCORE_HISTOGRAM_TIME_WIDTH seconds
+# of time_taken when that is set. After changing either, rebuild the stored
+# histograms with `python manage.py rebuild-histograms`.
+SCORE_HISTOGRAM_WIDTH = int(os.environ.get('SCORE_HISTOGRAM_WIDTH', '10'))
+SCORE_HISTOGRAM_TIME_WIDTH = int(os.environ.get('SCORE_HISTOGRAM_TIME_WIDTH', '0'))
+score_bands = ScoreBands(SCORE_HISTOGRAM_WIDTH, SCORE_HISTOGRAM_TIME_WIDTH)
+
+# Storage: MongoDB through Motor, or STORAGE_BACKEND=memory to run without a database
+if os.environ.get('STORAGE_BACKEND', 'mongo') == 'memory':
+    client = None
+    db = None
+    storage = MemoryStorage(score_bands)
+else:
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url, event_listeners=[command_monitor, pool_monitor], **mongo_client_options())
+    db = client[os.environ.get('DB_NAME', 'daily_bite_db')]
+    # MONGO_READ_PREFERENCE=secondaryPreferred serves leaderboard and aggregate reads
+    # from secondaries; they may then lag writes by the replication delay. A
+    # player's own profile and stats always come from the primary
+    storage = MongoStorage(
+        db,
+        client,
+        read_preference=os.environ.get('MONGO_READ_PREFERENCE', 'primary'),
+        bands=score_bands
+    )
+
+# Index maintenance at startup: foreground (before serving), background or skip
+# (indexes managed out of band, e.g. by a deploy job)
+INDEX_BUILD_MODE = os.environ.get('INDEX_BUILD_MODE', 'background')
+
+# Connections opened at startup so the first requests don't pay for connecting
+MONGO_WARMUP_CONNECTIONS = int(os.environ.get('MONGO_WARMUP_CONNECTIONS', '4'))
+MONGO_WARMUP_TIMEOUT = float(os.environ.get('MONGO_WARMUP_TIMEOUT', '5'))
+
+# /api/ready pings the database at most once per READY_PING_TTL seconds
+readiness = ReadinessProbe(
+    lambda: storage.ping(),
+    ttl=float(os.environ.get('READY_PING_TTL', '2')),
+    timeout=float(os.environ.get('READY_PING_TIMEOUT', '1'))
+)
+
+# Startup progress reported by /api/ready
+startup_state = {"indexes": "pending", "leaderboards": "pending", "seconds": None}
+background_tasks = set()
+
+# uid -> display_name cache shared by leaderboard responses
+display_name_cache = TTLCache(
+    maxsize=int(os.environ.get('DISPLAY_NAME_CACHE_SIZE', '10000')),
+    ttl=float(os.environ.get('DISPLAY_NAME_CACHE_TTL', '300'))
+)
+# Bumped by every eviction; uid -> the generation it was last evicted at, and the
+# generation of the last full clear, so lookups already in flight don't cache old names
+display_name_generation = 0
+display_name_evictions = TTLCache(maxsize=display_name_cache.maxsize, ttl=display_name_cache.ttl)
+display_names_cleared = 0
+
+# Response cache for leaderboard and stats reads, invalidated by the write endpoints
+response_cache = ResponseCache(
+    InMemoryCacheBackend(maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', '1000'))),
+    ttl=float(os.environ.get('RESPONSE_CACHE_TTL', '30'))
+)
+
+# Transaction hashes of recently processed ad rewards; replayed callbacks stop here
+recent_reward_hashes = TTLCache(
+    maxsize=int(os.environ.get('REWARD_HASH_CACHE_SIZE', '50000')),
+    ttl=float(os.environ.get('REWARD_HASH_CACHE_TTL', '3600'))
+)
+
+# Largest leaderboard page served; larger limits are capped to it
+LEADERBOARD_MAX_LIMIT = int(os.environ.get('LEADERBOARD_MAX_LIMIT', '100'))
+
+# Finished days are frozen into leaderboard snapshots: the top
+# LEADERBOARD_SNAPSHOT_SIZE entries plus a histogram of every score in
+# SCORE_HISTOGRAM_WIDTH-point bands. A day is frozen LEADERBOARD_SNAPSHOT_GRACE
+# seconds after it ends, so submissions from clients still on the old day count.
+LEADERBOARD_SNAPSHOT_SIZE = int(os.environ.get('LEADERBOARD_SNAPSHOT_SIZE', '100'))
+LEADERBOARD_SNAPSHOT_GRACE = float(os.environ.get('LEADERBOARD_SNAPSHOT_GRACE', '3600'))
+
+# date -> encoded frozen snapshot; entries never go stale, the TTL only bounds memory
+snapshot_cache = TTLCache(
+    maxsize=int(os.environ.get('SNAPSHOT_CACHE_SIZE', '64')),
+    ttl=86400
+)
+
+# date -> that day's score histogram. Writes seen by this worker (its own, and
+# other workers' through the invalidation bus) evict the day's entry; without a
+# bus, percentiles may lag other workers' submissions by HISTOGRAM_CACHE_TTL seconds
+histogram_cache = TTLCache(maxsize=8, ttl=float(os.environ.get('HISTOGRAM_CACHE_TTL', '2')))
+# date -> bumped by every eviction, so reads already in flight aren't cached or joined
+histogram_generations = {}
+
+# Coalesces identical concurrent reads into one in-flight query
+read_flights = SingleFlight()
+
+# Server-built history/fact/puzzle of the day; DAILY_CONTENT_SOURCES=static serves
+# fixed fixture content without calling the external APIs (tests, offline runs)
+if os.environ.get('DAILY_CONTENT_SOURCES', 'http') == 'static':
+    daily_content_sources = fixture_sources()
+else:
+    daily_content_sources = default_sources()
+daily_content = DailyContentService(storage.daily_content, daily_content_sources, coalesce=read_flights.do)
+
+# In-process ranked boards for the active days and all-time, fed by submit_score
+leaderboard_index = LeaderboardIndex(max_days=int(os.environ.get('RANK_INDEX_DAYS', '2')))
+
+# Admission control for the write routes. Each route runs at most WRITE_CONCURRENCY
+# requests at once (WRITE_CONCURRENCY_LIMITS overrides it per route, e.g.
+# "submit-score=128,process-reward=32"); up to WRITE_QUEUE_SIZE more wait
+# WRITE_QUEUE_TIMEOUT seconds for a slot and the rest get a 503. Each user gets
+# USER_RATE_LIMIT requests per second per route, bursting to USER_RATE_BURST
+# (0 turns the per-user limit off); going over gets a 429.
+admission = AdmissionControl(
+    limits={
+        name.strip(): int(limit)
+        for name, _, limit in (part.partition("=") for part in os.environ.get('WRITE_CONCURRENCY_LIMITS', '').split(","))
+        if limit
+    },
+    default_limit=int(os.environ.get('WRITE_CONCURRENCY', '64')),
+    max_queue=int(os.environ.get('WRITE_QUEUE_SIZE', '256')),
+    queue_timeout=float(os.environ.get('WRITE_QUEUE_TIMEOUT', '0.5')),
+    rate=float(os.environ.get('USER_RATE_LIMIT', '5')),
+    burst=float(os.environ.get('USER_RATE_BURST', '10'))
+)
+
+# Live top-N pushed to /api/leaderboard/stream subscribers, recomputed at most once per tick
+live_leaderboard = LiveLeaderboard(
+    lambda board, size: live_snapshot(board, size),
+    size=int(os.environ.get('LIVE_LEADERBOARD_SIZE', '10')),
+    tick=float(os.environ.get('LIVE_LEADERBOARD_TICK', '0.5')),
+    queue_size=int(os.environ.get('LIVE_LEADERBOARD_QUEUE', '8'))
+)
+LIVE_STREAM_MAX_SECONDS = float(os.environ.get('LIVE_STREAM_MAX_SECONDS', '300'))
+
+# Cross-worker invalidation. Every worker has its own caches and ranked boards;
+# INVALIDATION_BUS makes each worker apply the other workers' writes as well:
+# changestream tails the collections in INVALIDATION_COLLECTIONS (needs a
+# replica set), unix sends datagrams between the workers on one host
+# through sockets in INVALIDATION_SOCKET_DIR, and local is in-process pub/sub
+# (tests, several apps in one process). off, the default, suits one worker.
+INVALIDATION_BUS = os.environ.get('INVALIDATION_BUS', 'off')
+INVALIDATION_COLLECTIONS = ("users", "scores", "rewards", "user_totals", "leaderboard_buckets", "score_histograms")
+invalidation_hub = LocalHub()
+
+def make_invalidation_transport(mode: str):
+    if mode == "off":
+        return None
+    if mode == "local":
+        return LocalTransport(invalidation_hub)
+    if mode == "unix":
+        return UnixSocketTransport(os.environ.get('INVALIDATION_SOCKET_DIR', '/tmp/daily-bite-invalidation'))
+    if mode == "changestream":
+        if db is None:
+            raise ValueError("INVALIDATION_BUS=changestream needs the MongoDB storage backend")
+        return ChangeStreamTransport(db, INVALIDATION_COLLECTIONS, lambda change: invalidation_from_change(change))
+    raise ValueError(f"Unknown INVALIDATION_BUS {mode!r}")
+
+invalidation_bus = InvalidationBus(
+    make_invalidation_transport(INVALIDATION_BUS),
+    lambda event: apply_invalidation(event)
+)
+
+# Per-worker request metrics, exposed at /api/metrics
+metrics = MetricsRegistry()
+http_metrics = HTTPMetrics(metrics)
+db_metrics = DBMetrics(metrics)
+metrics.add_collector(command_monitor.collect)
+metrics.register(pool_monitor)
+metrics.register(invalidation_bus)
+reward_duplicates = metrics.counter(
+    "daily_bite_reward_duplicates_total",
+    "Replayed reward callbacks rejected, by where the duplicate was caught",
+    ("stage",)
+)
+
+# Most database commands each route may run on a cold cache. Going over is
+# logged; QUERY_BUDGET_MODE=enforce turns it into a 500 so tests catch it.
+# submit-score's 7 includes the retry after two first submissions for the
+# same user and date race on the unique index.
+QUERY_BUDGETS = {
+    "/api/users": 2,
+    "/api/users/{user_id}": 3,
+    "/api/submit-score": 7,
+    "/api/leaderboard": 4,
+    "/api/leaderboard/rank/{user_id}": 0,
+    "/api/leaderboard/around/{user_id}": 2,
+    "/api/leaderboard/stream": 1,
+    "/api/leaderboard/percentile": 1,
+    "/api/leaderboard/{date}": 6,
+    "/api/process-reward": 2,
+    "/api/update-streak": 1,
+    "/api/user/{user_id}/stats": 3,
+    "/api/daily-content": 3,
+    "/api/bootstrap/{user_id}": 4,
+    "/api/health": 0,
+    "/api/ready": 1,
+    "/api/metrics": 0
+}
 
 # Create the main app
 app = FastAPI(
@@ -41,7 +285,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
+)
+app.add_middleware(
+    DBTimingMiddleware,
+    metrics=db_metrics,
+    budgets=QUERY_BUDGETS,
+    enforce=os.environ.get('QUERY_BUDGET_MODE', 'warn') == 'enforce'
 )
+app.add_middleware(MetricsMiddleware, metrics=http_metrics)
 
 # Pydantic Models
 class User(BaseModel):
@@ -86,6 +338,236 @@ def generate_transaction_hash(user_id: str, amount: float, timestamp: str) -> st
     data = f"{user_id}:{amount}:{timestamp}:{secret}"
     return hashlib.sha256(data.encode()).hexdigest()
 
+def to_score_write(score_data: ScoreSubmission) -> ScoreWrite:
+    return ScoreWrite(
+        user_id=score_data.userId,
+        date=score_data.date,
+        score=score_data.score,
+        time_taken=score_data.timeTaken,
+        category=score_data.puzzle_category,
+        difficulty=score_data.puzzle_difficulty
+    )
+
+_MISSING = object()
+
+async def resolve_display_names(user_ids: List[str]) -> dict:
+    """Map user ids to display names using the cache and one batched users query"""
+    names = {}
+    missing = []
+    for uid in user_ids:
+        name = display_name_cache.get(uid, _MISSING)
+        if name is _MISSING:
+            missing.append(uid)
+        else:
+            names[uid] = name
+
+    if missing:
+        generation = display_name_generation
+        found = await storage.users.display_names(missing)
+        for uid in missing:
+            names[uid] = found.get(uid, "Anonymous")
+            # Renamed while the query ran: what it read may be the old name
+            if display_names_cleared <= generation and display_name_evictions.get(uid, 0) <= generation:
+                display_name_cache.set(uid, names[uid])
+
+    return names
+
+def forget_display_names(user_ids: Optional[List[str]] = None):
+    """Drop cached display names (all of them without `user_ids`), and any lookup of them already in flight"""
+    global display_name_generation, display_names_cleared
+    display_name_generation += 1
+    if user_ids is None:
+        display_names_cleared = display_name_generation
+        display_name_cache.clear()
+        display_name_evictions.clear()
+        return
+    for uid in user_ids:
+        display_name_evictions.set(uid, display_name_generation)
+        display_name_cache.pop(uid)
+
+async def rebuild_user_totals():
+    """Recompute the user_totals stats rollup from the raw scores collection"""
+    return await storage.totals.rebuild()
+
+async def rebuild_leaderboard_buckets():
+    """Recompute the weekly and monthly leaderboard buckets from the raw scores collection"""
+    return await storage.buckets.rebuild()
+
+def rollups_backfilled() -> bool:
+    """True once every user with scores has a user_totals rollup
+
+    prepare_storage has run the backfill, or (INDEX_BUILD_MODE=skip) it is
+    run out of band with `manage.py rebuild-totals`.
+    """
+    return startup_state["indexes"] in ("ready", "skipped")
+
+def empty_rollup(user_id: str) -> dict:
+    return {
+        "user_id": user_id,
+        "total_score": 0,
+        "best_score": 0,
+        "games_played": 0,
+        "successful_games": 0,
+        "recent_scores": []
+    }
+
+async def load_user_and_rollup(user_id: str):
+    """Fetch the user document and their stats rollup concurrently"""
+    user, rollup = await asyncio.gather(
+        storage.users.get(user_id),
+        storage.totals.get(user_id)
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if rollup is None and rollups_backfilled():
+        # Every player has a rollup: this user hasn't played yet
+        rollup = empty_rollup(user_id)
+    elif rollup is None or "recent_scores" not in rollup:
+        # Not backfilled yet, or written before recent_scores was tracked
+        rollup = await storage.totals.compute(user_id)
+    return user, rollup
+
+async def seed_leaderboard_index():
+    """Load today's scores and the all-time totals into the in-memory ranked boards"""
+    today = get_today_string()
+    day_rows, total_rows = await asyncio.gather(
+        storage.scores.day_entries(today),
+        storage.totals.entries()
+    )
+    leaderboard_index.day(today, create=True).load(day_rows)
+    leaderboard_index.all_time.load(total_rows)
+    return len(day_rows), len(total_rows)
+
+# Periods with an in-memory ranked board; week and month are only paged from buckets
+RANKED_PERIODS = ("today", "alltime")
+
+def get_ranked_board(period: str):
+    if period not in RANKED_PERIODS:
+        raise HTTPException(status_code=400, detail="Ranks are available for period=today|alltime")
+    if period == "today":
+        return leaderboard_index.day(get_today_string(), create=True)
+    return leaderboard_index.all_time
+
+async def live_snapshot(period: str, size: int) -> list:
+    """Top entries of an in-memory ranked board, shaped like /leaderboard/around entries"""
+    rows = get_ranked_board(period).top(size)
+    names = await resolve_display_names([row["user_id"] for row in rows])
+    entries = []
+    for row in rows:
+        entry = {"user_id": row["user_id"], "user_name": names[row["user_id"]], "rank": row["rank"]}
+        if period == "today":
+            entry.update({"score": row["score"], "time_taken": row["time_taken"]})
+        else:
+            entry["total_score"] = row["score"]
+        entries.append(entry)
+    return entries
+
+def score_invalidation(scores: List[tuple]) -> Invalidation:
+    """What accepted (user_id, date, score, time_taken, delta) rows make stale"""
+    tags = {"leaderboard:alltime"}
+    for user_id, date, *_ in scores:
+        tags.update((f"user:{user_id}", f"leaderboard:day:{date}"))
+        tags.update(f"leaderboard:{period_bucket(period, date)}" for period in BUCKET_PERIODS)
+    return Invalidation(tags=tuple(tags), scores=tuple(scores))
+
+def forget_histogram(date: str):
+    """Drop a day's cached histogram, and any read of it already in flight"""
+    histogram_generations[date] = histogram_generations.get(date, 0) + 1
+    histogram_cache.pop(date)
+
+def invalidation_from_change(change: dict) -> Optional[Invalidation]:
+    """Translate a change event from one of INVALIDATION_COLLECTIONS
+
+    A score's effects on the rollups commit after the score itself, so each
+    collection's event invalidates only what is read from that collection:
+    invalidating the all-time board on the scores event would let a
+    request in between cache the old totals again.
+    """
+    collection = change["ns"]["coll"]
+    doc = change.get("fullDocument")
+    if not doc:
+        # Deleted again before the lookup; a later event covers it
+        return None
+    if collection == "users":
+        return Invalidation(tags=(f"user:{doc['uid']}",), users=(doc["uid"],))
+    if collection == "scores":
+        # The new best is known but not the change in the user's total,
+        # which the user_totals event carries
+        return Invalidation(
+            tags=(f"leaderboard:day:{doc['date']}",),
+            scores=((doc["user_id"], doc["date"], doc["score"], doc.get("time_taken", 0), None),)
+        )
+    if collection == "user_totals":
+        return Invalidation(
+            tags=("leaderboard:alltime", f"user:{doc['user_id']}"),
+            totals=((doc["user_id"], doc.get("total_score", 0)),)
+        )
+    if collection == "leaderboard_buckets":
+        return Invalidation(tags=(f"leaderboard:{doc['bucket']}",))
+    if collection == "score_histograms":
+        return Invalidation(histograms=(doc["date"],))
+    return Invalidation(tags=(f"user:{doc['user_id']}",))
+
+async def apply_invalidation(event: Invalidation):
+    """Bring this worker's caches, ranked boards and live streams up to date with a write"""
+    if event.everything:
+        forget_display_names()
+        for date in list(histogram_generations):
+            forget_histogram(date)
+        histogram_cache.clear()
+        await response_cache.clear()
+        await seed_leaderboard_index()
+        live_leaderboard.touch("today")
+        live_leaderboard.touch("alltime")
+        return
+
+    if event.users:
+        forget_display_names(event.users)
+    today = get_today_string()
+    for user_id, date, score, time_taken, delta in event.scores:
+        if delta is None:
+            leaderboard_index.submit_best(user_id, date, score, time_taken)
+        else:
+            leaderboard_index.record_score(user_id, date, score, time_taken, delta)
+        forget_histogram(date)
+        if date == today:
+            live_leaderboard.touch("today")
+    for date in event.histograms:
+        forget_histogram(date)
+    for user_id, total_score in event.totals:
+        leaderboard_index.all_time.upsert(user_id, total_score)
+    if event.scores or event.totals:
+        live_leaderboard.touch("alltime")
+    if event.tags:
+        await response_cache.invalidate(*event.tags)
+
+async def invalidate(event: Invalidation):
+    """Apply a write's invalidation in this worker, then send it to the other workers"""
+    await apply_invalidation(event)
+    await invalidation_bus.publish(event)
+
+@asynccontextmanager
+async def admitted(route: str, user_id: Optional[str] = None):
+    """Run a write under admission control; rejected requests fail fast with 429 or 503"""
+    try:
+        await admission.enter(route, user_id)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests, please slow down",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Rejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    try:
+        yield
+    finally:
+        admission.leave(route)
+
 # Authentication dependency (simplified for demo)
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     if not credentials:
@@ -102,61 +584,67 @@ async def root():
 async def create_or_update_user(user_data: User):
     """Create or update a user in the database"""
     try:
-        existing_user = await db.users.find_one({"uid": user_data.uid})
-
-        # Fields we’re willing to update if provided
-        update_fields = {"last_active": datetime.utcnow()}
-        if user_data.display_name:
-            update_fields["display_name"] = user_data.display_name
-        if user_data.email is not None:
-            update_fields["email"] = user_data.email
-        if user_data.is_anonymous is not None:
-            update_fields["is_anonymous"] = user_data.is_anonymous
-
-        if existing_user:
-            await db.users.update_one(
-                {"uid": user_data.uid},
-                {"$set": update_fields}
-            )
-            # Re-read user (and stringify _id)
-            updated = await db.users.find_one({"uid": user_data.uid})
-            updated["_id"] = str(updated["_id"])
-            return {"success": True, "message": "User updated", "user": updated}
-        else:
-            user_dict = user_data.dict()
-            # ensure created_at/last_active present
-            user_dict.setdefault("created_at", datetime.utcnow())
-            user_dict.setdefault("last_active", datetime.utcnow())
-            result = await db.users.insert_one(user_dict)
-            return {"success": True, "message": "User created", "user_id": str(result.inserted_id)}
+        async with admitted("users", user_data.uid):
+            existing_user = await storage.users.get(user_data.uid)
+
+            # Fields we’re willing to update if provided
+            update_fields = {"last_active": datetime.utcnow()}
+            if user_data.display_name:
+                update_fields["display_name"] = user_data.display_name
+            if user_data.email is not None:
+                update_fields["email"] = user_data.email
+            if user_data.is_anonymous is not None:
+                update_fields["is_anonymous"] = user_data.is_anonymous
+
+            if existing_user:
+                updated = await storage.users.update(user_data.uid, update_fields)
+                await invalidate(Invalidation(tags=(f"user:{user_data.uid}",), users=(user_data.uid,)))
+                # Stringify _id for the response
+                updated["_id"] = str(updated["_id"])
+                return {"success": True, "message": "User updated", "user": updated}
+            else:
+                user_dict = user_data.dict()
+                # ensure created_at/last_active present
+                user_dict.setdefault("created_at", datetime.utcnow())
+                user_dict.setdefault("last_active", datetime.utcnow())
+                user_id = await storage.users.insert(user_dict)
+                await invalidate(Invalidation(tags=(f"user:{user_data.uid}",), users=(user_data.uid,)))
+                return {"success": True, "message": "User created", "user_id": user_id}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error creating/updating user: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+def user_profile(user: dict, rollup: dict) -> dict:
+    """A user profile with today's score and puzzle count"""
+    # Remove MongoDB ObjectId for JSON serialization
+    user['_id'] = str(user['_id'])
+
+    # Today's score is among the recent scores if the user played today
+    today = get_today_string()
+    today_score = next((entry for entry in rollup["recent_scores"] if entry["date"] == today), None)
+
+    return {
+        "user": user,
+        "today_score": today_score.get("score", 0) if today_score else 0,
+        "puzzles_solved": rollup.get("games_played", 0),
+        "best_score": rollup.get("best_score", 0)
+    }
+
+async def load_user(user_id: str) -> dict:
+    """Fetch a user profile with today's score and puzzle count"""
+    user, rollup = await load_user_and_rollup(user_id)
+    return user_profile(user, rollup)
+
 @api_router.get("/users/{user_id}")
 async def get_user(user_id: str):
     """Get user profile and stats"""
     try:
-        user = await db.users.find_one({"uid": user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Remove MongoDB ObjectId for JSON serialization
-        user['_id'] = str(user['_id'])
-        
-        # Get additional stats
-        today = get_today_string()
-        today_score = await db.scores.find_one({"user_id": user_id, "date": today})
-        
-        user_stats = {
-            "user": user,
-            "today_score": today_score.get("score", 0) if today_score else 0,
-            "puzzles_solved": await db.scores.count_documents({"user_id": user_id}),
-            "best_score": 0  # Calculate from scores collection
-        }
-        
-        return user_stats
+        # Read-your-writes: the user's own queued scores land before we read
+        await score_queue.sync(user_id)
+        return await read_flights.do(make_key("get_user", user_id=user_id), lambda: load_user(user_id))
     
     except HTTPException:
         raise
@@ -164,169 +652,486 @@ async def get_user(user_id: str):
         logging.error(f"Error getting user: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+async def write_best_score(score_data: ScoreSubmission) -> Optional[dict]:
+    """Atomically store the score if it beats the user's score for that date
+
+    Returns None when the stored score is at least as good, otherwise a dict
+    with the previous score and time_taken (None for a first submission).
+    """
+    return await storage.scores.write_best(to_score_write(score_data), datetime.utcnow())
+
+async def record_accepted_scores(accepted: List[tuple]):
+    """Feed accepted (score, previous_score, previous_time) rows to the ranked boards and evict stale caches in every worker"""
+    await invalidate(score_invalidation([
+        (write.user_id, write.date, write.score, write.time_taken, write.score - (previous_score or 0))
+        for write, previous_score, _ in accepted
+    ]))
+
+async def apply_score_effects(score_data: ScoreSubmission, previous: dict):
+    """Propagate an accepted score to points, totals, buckets, histograms, ranked boards and caches"""
+    accepted = [(to_score_write(score_data), previous["score"], previous["time_taken"])]
+    await storage.apply_score_effects(accepted, datetime.utcnow())
+    await record_accepted_scores(accepted)
+
+async def flush_score_batch(batch: List[ScoreSubmission]):
+    """Persist a batch of queued submissions with one bulk write per collection"""
+    # Only each user's best submission per date can matter
+    best = {}
+    for score_data in batch:
+        key = (score_data.userId, score_data.date)
+        if key not in best or score_data.score > best[key].score:
+            best[key] = score_data
+
+    now = datetime.utcnow()
+    accepted = await storage.scores.write_best_many([to_score_write(s) for s in best.values()], now)
+    if not accepted:
+        return
+    await storage.apply_score_effects(accepted, now)
+    await record_accepted_scores(accepted)
+
+# Write-behind ingestion for submit_score, enabled with SCORE_INGEST_MODE=queue
+score_queue = IngestQueue(
+    flush_score_batch,
+    user_key=lambda score_data: score_data.userId,
+    max_batch=int(os.environ.get('SCORE_INGEST_BATCH', '500')),
+    flush_interval=float(os.environ.get('SCORE_INGEST_INTERVAL', '0.05')),
+    maxsize=int(os.environ.get('SCORE_INGEST_QUEUE_SIZE', '10000')),
+    put_timeout=float(os.environ.get('SCORE_INGEST_PUT_TIMEOUT', '0.5'))
+)
+
+async def load_histogram(date: str) -> dict:
+    """The day's (score band, time band) -> players counts, cached until the next write to that day"""
+    cells = histogram_cache.get(date)
+    if cells is None:
+        generation = histogram_generations.get(date, 0)
+        cells = await read_flights.do(
+            make_key("histogram", date=date, generation=generation),
+            lambda: storage.histograms.get(date)
+        )
+        # A write landed while reading: the next read must fetch again
+        if histogram_generations.get(date, 0) == generation:
+            histogram_cache.set(date, cells)
+    return cells
+
+async def score_percentile(date: str, score: int, time_taken: int = 0) -> dict:
+    """Players on `date` and how many of them a score beats, from the histogram alone"""
+    return histogram_percentile(await load_histogram(date), score_bands.cell(score, time_taken))
+
 @api_router.post("/submit-score")
 async def submit_score(score_data: ScoreSubmission):
     """Submit a puzzle score"""
     try:
-        # Check if user already has a score for today
-        existing_score = await db.scores.find_one({
-            "user_id": score_data.userId,
-            "date": score_data.date
-        })
-        
-        if existing_score:
-            # Update if new score is higher
-            if score_data.score > existing_score["score"]:
-                await db.scores.update_one(
-                    {"user_id": score_data.userId, "date": score_data.date},
-                    {"$set": {
-                        "score": score_data.score,
-                        "time_taken": score_data.timeTaken,
-                        "updated_at": datetime.utcnow()
-                    }}
-                )
-                
-                # Update user's total points
-                await db.users.update_one(
-                    {"uid": score_data.userId},
-                    {"$inc": {"total_points": score_data.score - existing_score["score"]}}
-                )
-                
-                return {"success": True, "message": "Score updated!", "new_record": True}
+        async with admitted("submit-score", score_data.userId):
+            if score_queue.running:
+                try:
+                    await score_queue.submit(score_data)
+                except QueueFullError:
+                    raise HTTPException(
+                        status_code=503,
+                        detail="Score queue is full, please retry",
+                        headers={"Retry-After": "1"}
+                    )
+                result = {"success": True, "message": "Score queued", "queued": True}
             else:
-                return {"success": True, "message": "Score recorded (not a new record)", "new_record": False}
-        else:
-            # Create new score entry
-            score_entry = {
-                "user_id": score_data.userId,
-                "score": score_data.score,
-                "time_taken": score_data.timeTaken,
-                "date": score_data.date,
-                "category": score_data.puzzle_category,
-                "difficulty": score_data.puzzle_difficulty,
-                "created_at": datetime.utcnow()
-            }
-            
-            await db.scores.insert_one(score_entry)
-            
-            # Update user's total points
-            await db.users.update_one(
-                {"uid": score_data.userId},
-                {"$inc": {"total_points": score_data.score}}
-            )
-            
-            return {"success": True, "message": "Score submitted!", "new_record": True}
-    
+                written = await write_best_score(score_data)
+                if written is None:
+                    result = {"success": True, "message": "Score recorded (not a new record)", "new_record": False}
+                else:
+                    await apply_score_effects(score_data, written)
+                    if written["score"] is None:
+                        result = {"success": True, "message": "Score submitted!", "new_record": True}
+                    else:
+                        result = {"success": True, "message": "Score updated!", "new_record": True}
+                    # Share of the day's other players the new best beats. Queued
+                    # scores aren't counted yet, and a score that isn't a record
+                    # isn't the player's standing
+                    standing = await score_percentile(score_data.date, score_data.score, score_data.timeTaken)
+                    result["percentile"] = standing["percentile"]
+            return result
+
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error submitting score: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
-@api_router.get("/leaderboard")
-async def get_leaderboard(period: str = "today", limit: int = 50):
-    """Get leaderboard data"""
+def encode_cursor(board: str, entry: dict) -> str:
+    """Opaque keyset cursor pointing just past `entry` on `board`"""
+    if "score" in entry:
+        key = [entry["score"], entry["time_taken"], entry["user_id"]]
+    else:
+        key = [entry["total_score"], entry["user_id"]]
+    payload = json.dumps({"b": board, "k": key, "r": entry["rank"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, board: str):
+    """Return the (sort key, rank) a cursor from encode_cursor points past"""
     try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key, rank = payload["k"], payload["r"]
+        valid = (
+            payload["b"] == board
+            and isinstance(rank, int)
+            and len(key) == (3 if board.startswith("leaderboard:day:") else 2)
+            and all(isinstance(part, int) for part in key[:-1])
+            and isinstance(key[-1], str)
+        )
+    except (ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key), rank
+
+async def load_leaderboard(period: str, limit: int, today: str, after: Optional[tuple] = None, rank: int = 0) -> list:
+    """Build a leaderboard page from storage, starting after the `after` sort key at `rank`"""
+    if period == "today":
+        scores = await storage.scores.day_top(today, limit, after)
+    elif period in BUCKET_PERIODS:  # this ISO week or calendar month, from leaderboard_buckets
+        scores = await storage.buckets.top(period_bucket(period, today), limit, after)
+    else:  # all time, served from the materialized user_totals rollup
+        scores = await storage.totals.top(limit, after)
+
+    names = await resolve_display_names([score["user_id"] for score in scores])
+
+    # Add user names and ranks
+    leaderboard = []
+    for i, score in enumerate(scores):
         if period == "today":
-            today = get_today_string()
-            pipeline = [
-                {"$match": {"date": today}},
-                {"$sort": {"score": -1, "time_taken": 1}},
-                {"$limit": limit}
-            ]
-        else:  # all time
-            pipeline = [
-                {"$group": {
-                    "_id": "$user_id",
-                    "total_score": {"$sum": "$score"},
-                    "best_score": {"$max": "$score"},
-                    "games_played": {"$sum": 1}
-                }},
-                {"$sort": {"total_score": -1}},
-                {"$limit": limit}
-            ]
-        
-        scores = await db.scores.aggregate(pipeline).to_list(length=limit)
-        
-        # Add user names and ranks
-        leaderboard = []
-        for i, score in enumerate(scores):
-            if period == "today":
-                user = await db.users.find_one({"uid": score["user_id"]})
-                entry = {
-                    "user_id": score["user_id"],
-                    "user_name": user.get("display_name", "Anonymous") if user else "Anonymous",
-                    "score": score["score"],
-                    "time_taken": score["time_taken"],
-                    "rank": i + 1,
-                    "date": score["date"]
-                }
-            else:
-                user = await db.users.find_one({"uid": score["_id"]})
-                entry = {
-                    "user_id": score["_id"],
-                    "user_name": user.get("display_name", "Anonymous") if user else "Anonymous",
-                    "total_score": score["total_score"],
-                    "best_score": score["best_score"],
-                    "games_played": score["games_played"],
-                    "rank": i + 1
-                }
-            
-            leaderboard.append(entry)
-        
-        return leaderboard
+            entry = {
+                "user_id": score["user_id"],
+                "user_name": names[score["user_id"]],
+                "score": score["score"],
+                "time_taken": score["time_taken"],
+                "rank": rank + i + 1,
+                "date": score["date"]
+            }
+        else:
+            entry = {
+                "user_id": score["user_id"],
+                "user_name": names[score["user_id"]],
+                "total_score": score["total_score"],
+                "best_score": score["best_score"],
+                "games_played": score["games_played"],
+                "rank": rank + i + 1
+            }
+
+        leaderboard.append(entry)
+
+    return leaderboard
+
+async def read_leaderboard(period: str, limit: int, after: Optional[str] = None):
+    """Return a cached leaderboard page and the cursor for the next one (None on the last page)"""
+    limit = min(limit, LEADERBOARD_MAX_LIMIT)
+    today = get_today_string()
+    if period == "today":
+        tag = f"leaderboard:day:{today}"
+        key = make_key("get_leaderboard", period=period, date=today, limit=limit, after=after)
+    elif period in BUCKET_PERIODS:
+        tag = f"leaderboard:{period_bucket(period, today)}"
+        key = make_key("get_leaderboard", period=period, date=today, limit=limit, after=after)
+    else:
+        tag = "leaderboard:alltime"
+        key = make_key("get_leaderboard", period="alltime", limit=limit, after=after)
+    sort_key, rank = decode_cursor(after, tag) if after else (None, 0)
+    board = await read_flights.do(key, lambda: response_cache.get_or_compute(
+        f"{tag}:{limit}:{after or ''}",
+        lambda: load_leaderboard(period, limit, today, sort_key, rank),
+        tags=lambda board: [tag] + [f"user:{entry['user_id']}" for entry in board]
+    ))
+    return board, encode_cursor(tag, board[-1]) if len(board) == limit else None
+
+@api_router.get("/leaderboard")
+async def get_leaderboard(
+    response: Response,
+    period: str = "today",
+    limit: int = Query(50, ge=1),
+    after: Optional[str] = None
+):
+    """Get leaderboard data for period=today|week|month|alltime, one keyset page at a time
+
+    When the page is full, the X-Next-Cursor header holds the `after` value
+    for the next page. Deep pages cost the same as the first one.
+    """
+    try:
+        board, next_cursor = await read_leaderboard(period, limit, after)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return board
     
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error getting leaderboard: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@api_router.get("/leaderboard/stream")
+async def stream_leaderboard(period: str = "today"):
+    """Server-Sent Events: a snapshot of the top entries, then a diff whenever the ranking changes
+
+    `snapshot` events carry the full top N; `diff` events carry the entries
+    whose position changed (`changed`) and the new board length (`size`).
+    """
+    if period not in RANKED_PERIODS:
+        raise HTTPException(status_code=400, detail="Live updates are available for period=today|alltime")
+    return StreamingResponse(
+        live_leaderboard.stream(period, max_seconds=LIVE_STREAM_MAX_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/leaderboard/rank/{user_id}")
+async def get_leaderboard_rank(user_id: str, period: str = "today"):
+    """Get a user's position from the in-memory ranked board"""
+    board = get_ranked_board(period)
+    rank = board.rank(user_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    score, time_taken = board.score(user_id)
+    entry = {
+        "user_id": user_id,
+        "period": period,
+        "rank": rank,
+        "total_players": len(board)
+    }
+    if period == "today":
+        entry.update({"score": score, "time_taken": time_taken})
+    else:
+        entry["total_score"] = score
+    return entry
+
+@api_router.get("/leaderboard/around/{user_id}")
+async def get_leaderboard_around(user_id: str, period: str = "today", radius: int = Query(5, ge=0, le=50)):
+    """Get the players ranked just above and below a user"""
+    board = get_ranked_board(period)
+    rank = board.rank(user_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="User not ranked")
+    rows = board.around(user_id, radius)
+    names = await resolve_display_names([row["user_id"] for row in rows])
+
+    entries = []
+    for row in rows:
+        entry = {"user_id": row["user_id"], "user_name": names[row["user_id"]], "rank": row["rank"]}
+        if period == "today":
+            entry.update({"score": row["score"], "time_taken": row["time_taken"]})
+        else:
+            entry["total_score"] = row["score"]
+        entries.append(entry)
+
+    return {
+        "user_id": user_id,
+        "period": period,
+        "rank": rank,
+        "total_players": len(board),
+        "entries": entries
+    }
+
+async def build_leaderboard_snapshot(date: str) -> dict:
+    """A day's top entries and score histogram, in the shape stored in leaderboard_snapshots"""
+    top, histogram = await asyncio.gather(
+        storage.scores.day_top(date, LEADERBOARD_SNAPSHOT_SIZE),
+        storage.scores.day_histogram(date, SCORE_HISTOGRAM_WIDTH)
+    )
+    names = await resolve_display_names([score["user_id"] for score in top])
+    return {
+        "date": date,
+        "players": sum(count for _, count in histogram),
+        "entries": [
+            {
+                "user_id": score["user_id"],
+                "user_name": names[score["user_id"]],
+                "score": score["score"],
+                "time_taken": score["time_taken"],
+                "rank": i + 1
+            }
+            for i, score in enumerate(top)
+        ],
+        "histogram": {
+            "width": SCORE_HISTOGRAM_WIDTH,
+            "bands": [[lower, count] for lower, count in histogram]
+        },
+        "frozen_at": datetime.utcnow().isoformat()
+    }
+
+def snapshot_due(date: str, now: Optional[datetime] = None) -> bool:
+    """True once the grace period after the end of `date` (UTC) has passed"""
+    day_end = datetime.strptime(date, '%Y-%m-%d') + timedelta(days=1)
+    return (now or datetime.utcnow()) >= day_end + timedelta(seconds=LEADERBOARD_SNAPSHOT_GRACE)
+
+def encode_snapshot(snapshot: dict, final: bool) -> dict:
+    return {
+        "body": json.dumps(snapshot, separators=(",", ":"), default=str).encode(),
+        "etag": content_etag(snapshot),
+        "final": final
+    }
+
+async def load_leaderboard_snapshot(date: str) -> Optional[dict]:
+    """Return {"body", "etag", "final"} for a finished day, or None if nobody played
+
+    Frozen snapshots come from memory or leaderboard_snapshots. A due day
+    that was never frozen (the rollover job did not run) is frozen here. A
+    day still in its grace period is built but not stored, so it may change.
+    """
+    entry = snapshot_cache.get(date)
+    if entry is not None:
+        return entry
+    stored = await storage.snapshots.get(date)
+    if stored is None:
+        snapshot = await build_leaderboard_snapshot(date)
+        if not snapshot["players"]:
+            return None
+        if not snapshot_due(date):
+            return encode_snapshot(snapshot, final=False)
+        # First worker to finish wins; everyone serves the same document
+        stored = await storage.snapshots.put_if_absent(date, snapshot)
+    entry = encode_snapshot(stored, final=True)
+    snapshot_cache.set(date, entry)
+    return entry
+
+async def freeze_leaderboards(days: int = 7, now: Optional[datetime] = None) -> dict:
+    """Rollover job: freeze every due day among the last `days` that has no snapshot yet"""
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    dates = [(now.date() - timedelta(days=offset)).isoformat() for offset in range(days, 0, -1)]
+    dates = [date for date in dates if snapshot_due(date, now)]
+    frozen_already = set(await storage.snapshots.dates(dates[0], dates[-1])) if dates else set()
+    frozen, empty = [], []
+    for date in dates:
+        if date in frozen_already:
+            continue
+        snapshot = await build_leaderboard_snapshot(date)
+        if not snapshot["players"]:
+            empty.append(date)
+            continue
+        await storage.snapshots.put_if_absent(date, snapshot)
+        frozen.append(date)
+    return {
+        "frozen": frozen,
+        "empty": empty,
+        "already_frozen": sorted(frozen_already),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+@api_router.get("/leaderboard/percentile")
+async def get_score_percentile(score: int, time_taken: int = Query(0, ge=0), date: Optional[str] = None):
+    """Percentage of the day's other players a score beats ("you beat X% of players")
+
+    Answered from the day's score histogram, so the cost doesn't grow with
+    the number of players. Exact to within one histogram band. A day nobody
+    has played is a 404.
+    """
+    date = date or get_today_string()
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+
+    try:
+        cells = await load_histogram(date)
+        if not cells:
+            raise HTTPException(status_code=404, detail="No scores for this date")
+        standing = histogram_percentile(cells, score_bands.cell(score, time_taken))
+        return {"date": date, "score": score, "time_taken": time_taken, **standing}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting score percentile: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/leaderboard/{date}")
+async def get_leaderboard_snapshot(request: Request, date: str):
+    """A finished day's frozen top entries and score histogram
+
+    Frozen snapshots never change, so they carry a strong ETag and may be
+    cached for a year; a day still in its grace period is cached briefly.
+    """
+    try:
+        datetime.strptime(date, '%Y-%m-%d')
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+    if date >= get_today_string():
+        raise HTTPException(status_code=404, detail="Day not finished yet; use /api/leaderboard?period=today")
+
+    try:
+        entry = await read_flights.do(
+            make_key("get_leaderboard_snapshot", date=date),
+            lambda: load_leaderboard_snapshot(date)
+        )
+        if entry is None:
+            raise HTTPException(status_code=404, detail="No scores for this date")
+
+        headers = {
+            "ETag": entry["etag"],
+            "Cache-Control": "public, max-age=31536000, immutable" if entry["final"] else "public, max-age=300"
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            return Response(status_code=304, headers=headers)
+        return Response(entry["body"], media_type="application/json", headers=headers)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting leaderboard snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @api_router.post("/process-reward")
 async def process_reward(reward_data: RewardRequest):
     """Process ad reward for user"""
     try:
-        # Generate transaction hash for deduplication
-        transaction_hash = generate_transaction_hash(
-            reward_data.userId,
-            reward_data.rewardAmount,
-            reward_data.timestamp
-        )
-        
-        # Check for duplicate transaction
-        existing_reward = await db.rewards.find_one({"transaction_hash": transaction_hash})
-        if existing_reward:
-            return {"success": False, "message": "Reward already processed"}
-        
-        # Validate reward amount (business logic)
-        if reward_data.rewardAmount <= 0 or reward_data.rewardAmount > 100:
-            raise HTTPException(status_code=400, detail="Invalid reward amount")
-        
-        # Create reward transaction
-        reward_entry = {
-            "user_id": reward_data.userId,
-            "reward_type": reward_data.rewardType,
-            "reward_amount": reward_data.rewardAmount,
-            "ad_unit_id": reward_data.adUnitId,
-            "transaction_hash": transaction_hash,
-            "processed_at": datetime.utcnow(),
-            "is_verified": True
-        }
-        
-        await db.rewards.insert_one(reward_entry)
-        
-        # Update user's total points (rewards as points)
-        await db.users.update_one(
-            {"uid": reward_data.userId},
-            {"$inc": {"total_points": int(reward_data.rewardAmount)}}
-        )
-        
-        # Get updated user data
-        user = await db.users.find_one({"uid": reward_data.userId})
-        
-        return {
-            "success": True,
-            "message": "Reward processed successfully",
-            "reward_amount": reward_data.rewardAmount,
-            "new_total_points": user.get("total_points", 0) if user else 0
-        }
-    
+        async with admitted("process-reward", reward_data.userId):
+            # Generate transaction hash for deduplication
+            transaction_hash = generate_transaction_hash(
+                reward_data.userId,
+                reward_data.rewardAmount,
+                reward_data.timestamp
+            )
+
+            # Validate reward amount (business logic)
+            if reward_data.rewardAmount <= 0 or reward_data.rewardAmount > 100:
+                raise HTTPException(status_code=400, detail="Invalid reward amount")
+
+            # Replays seen recently by this worker (including ones still in flight)
+            # are rejected without a database round trip
+            if transaction_hash in recent_reward_hashes:
+                reward_duplicates.inc(("cache",))
+                return {"success": False, "message": "Reward already processed"}
+            recent_reward_hashes.set(transaction_hash, True)
+
+            # Create reward transaction
+            reward_entry = {
+                "user_id": reward_data.userId,
+                "reward_type": reward_data.rewardType,
+                "reward_amount": reward_data.rewardAmount,
+                "ad_unit_id": reward_data.adUnitId,
+                "transaction_hash": transaction_hash,
+                "processed_at": datetime.utcnow(),
+                "is_verified": True
+            }
+
+            # Insert first: the unique transaction_hash index settles duplicates
+            # from other workers or from before this worker's cache
+            try:
+                await storage.rewards.insert(reward_entry)
+            except DuplicateKeyError:
+                reward_duplicates.inc(("database",))
+                return {"success": False, "message": "Reward already processed"}
+            except Exception:
+                # Nothing was recorded, so a retry of this callback must get through
+                recent_reward_hashes.pop(transaction_hash)
+                raise
+
+            # Update user's total points (rewards as points) and read back the new total
+            new_total_points = await storage.users.add_points(reward_data.userId, int(reward_data.rewardAmount))
+            await invalidate(Invalidation(tags=(f"user:{reward_data.userId}",)))
+
+            return {
+                "success": True,
+                "message": "Reward processed successfully",
+                "reward_amount": reward_data.rewardAmount,
+                "new_total_points": new_total_points or 0
+            }
+
     except HTTPException:
         raise
     except Exception as e:
@@ -337,41 +1142,17 @@ async def process_reward(reward_data: RewardRequest):
 async def update_streak(user_id: str):
     """Update user's daily streak"""
     try:
-        user = await db.users.find_one({"uid": user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        today = get_today_string()
-        last_streak_date = user.get("last_streak_date")
-        current_streak = user.get("streak", 0)
-        
-        if last_streak_date:
-            last_date = datetime.strptime(last_streak_date, '%Y-%m-%d')
-            today_date = datetime.strptime(today, '%Y-%m-%d')
-            diff_days = (today_date - last_date).days
-            
-            if diff_days == 1:
-                # Consecutive day - increment streak
-                new_streak = current_streak + 1
-            elif diff_days > 1:
-                # Streak broken - reset to 1
-                new_streak = 1
-            else:
-                # Same day - no change
-                new_streak = current_streak
-        else:
-            # First time - start streak
-            new_streak = 1
-        
-        # Update user streak
-        await db.users.update_one(
-            {"uid": user_id},
-            {"$set": {
-                "streak": new_streak,
-                "last_streak_date": today,
-                "last_active": datetime.utcnow()
-            }}
+        today = datetime.utcnow().date()
+        # Consecutive day increments, same day keeps, anything else restarts at 1
+        new_streak = await storage.users.update_streak(
+            user_id,
+            today.isoformat(),
+            (today - timedelta(days=1)).isoformat(),
+            datetime.utcnow()
         )
+        if new_streak is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        await invalidate(Invalidation(tags=(f"user:{user_id}",)))
         
         return {
             "success": True,
@@ -385,60 +1166,134 @@ async def update_streak(user_id: str):
         logging.error(f"Error updating streak: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+async def expire_streaks(today: Optional[str] = None, dry_run: bool = False) -> dict:
+    """Nightly maintenance: zero the streaks of everyone who missed a day
+
+    A streak is broken once its last streak day is older than yesterday.
+    One update_many over the last_streak_date index covers all users.
+    """
+    today_date = datetime.strptime(today or get_today_string(), '%Y-%m-%d').date()
+    cutoff = (today_date - timedelta(days=1)).isoformat()
+    started = time.perf_counter()
+    matched, modified = await storage.users.expire_streaks(cutoff, dry_run=dry_run)
+    return {
+        "cutoff": cutoff,
+        "dry_run": dry_run,
+        "matched": matched,
+        "modified": modified,
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+def user_stats(user_id: str, user: dict, rollup: dict) -> dict:
+    """A user's statistics from their user document and stats rollup"""
+    total_games = rollup.get("games_played", 0)
+    successful_games = rollup.get("successful_games", 0)
+    success_rate = (successful_games / total_games * 100) if total_games > 0 else 0
+
+    return {
+        "user_id": user_id,
+        "display_name": user.get("display_name", "Anonymous"),
+        "streak": user.get("streak", 0),
+        "total_points": user.get("total_points", 0),
+        "total_games": total_games,
+        "best_score": rollup.get("best_score", 0),
+        "success_rate": round(success_rate, 1),
+        "recent_scores": [
+            {
+                "score": score["score"],
+                "date": score["date"],
+                "time_taken": score["time_taken"]
+            }
+            for score in rollup["recent_scores"]
+        ]
+    }
+
+async def load_user_stats(user_id: str) -> dict:
+    """Compute a user's statistics from their user document and stats rollup"""
+    user, rollup = await load_user_and_rollup(user_id)
+    return user_stats(user_id, user, rollup)
+
 @api_router.get("/user/{user_id}/stats")
 async def get_user_stats(user_id: str):
     """Get comprehensive user statistics"""
     try:
-        user = await db.users.find_one({"uid": user_id})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Calculate stats
-        total_games = await db.scores.count_documents({"user_id": user_id})
-        
-        # Get best score
-        best_score_doc = await db.scores.find_one(
-            {"user_id": user_id},
-            sort=[("score", -1)]
+        await score_queue.sync(user_id)
+        key = make_key("get_user_stats", user_id=user_id)
+        return await read_flights.do(key, lambda: response_cache.get_or_compute(
+            f"stats:{user_id}",
+            lambda: load_user_stats(user_id),
+            tags=[f"user:{user_id}"]
+        ))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting user stats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/bootstrap/{user_id}")
+async def get_bootstrap(user_id: str, period: str = "today", limit: int = Query(10, ge=1)):
+    """Everything the home screen needs in one round trip
+
+    The profile and stats are built from a single read of the user document
+    and stats rollup, fetched concurrently with the leaderboard page. Each
+    part has the same shape as its standalone endpoint.
+    """
+    try:
+        await score_queue.sync(user_id)
+        (user, rollup), (board, next_cursor) = await asyncio.gather(
+            load_user_and_rollup(user_id),
+            read_leaderboard(period, limit)
         )
-        best_score = best_score_doc["score"] if best_score_doc else 0
-        
-        # Calculate success rate (scores > 0)
-        successful_games = await db.scores.count_documents({
-            "user_id": user_id,
-            "score": {"$gt": 0}
-        })
-        success_rate = (successful_games / total_games * 100) if total_games > 0 else 0
-        
-        # Get recent scores
-        recent_scores = await db.scores.find(
-            {"user_id": user_id},
-            sort=[("created_at", -1)],
-            limit=10
-        ).to_list(length=10)
-        
+        stats = user_stats(user_id, user, rollup)
+        ranked = get_ranked_board(period) if period in RANKED_PERIODS else None
         return {
-            "user_id": user_id,
-            "display_name": user.get("display_name", "Anonymous"),
-            "streak": user.get("streak", 0),
-            "total_points": user.get("total_points", 0),
-            "total_games": total_games,
-            "best_score": best_score,
-            "success_rate": round(success_rate, 1),
-            "recent_scores": [
-                {
-                    "score": score["score"],
-                    "date": score["date"],
-                    "time_taken": score["time_taken"]
-                }
-                for score in recent_scores
-            ]
+            "profile": user_profile(user, rollup),
+            "stats": stats,
+            "leaderboard": {
+                "period": period,
+                "entries": board,
+                "next_cursor": next_cursor,
+                "rank": ranked.rank(user_id) if ranked is not None else None
+            }
         }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error getting bootstrap data: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/daily-content")
+async def get_daily_content(request: Request, date: Optional[str] = None):
+    """Get the day's history events, fun fact and puzzle, built once on the server"""
+    today = get_today_string()
+    date = date or today
+    try:
+        day = datetime.strptime(date, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date, expected YYYY-MM-DD")
+    if date > today:
+        raise HTTPException(status_code=404, detail="Content not available yet")
+    
+    try:
+        entry = await daily_content.get(day, build=date == today)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="No content for this date")
+        
+        # A day's content never changes once stored; degraded content is retried soon
+        headers = {
+            "ETag": entry["etag"],
+            "Cache-Control": "public, max-age=86400" if entry["complete"] else "public, max-age=300"
+        }
+        if etag_matches(request.headers.get("if-none-match"), entry["etag"]):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(entry["content"], headers=headers)
     
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error getting user stats: {str(e)}")
+        logging.error(f"Error getting daily content: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @api_router.get("/health")
@@ -447,9 +1302,111 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "cache": response_cache.stats(),
+        "coalescing": read_flights.stats(),
+        "ingest": score_queue.stats() if score_queue.running else None
     }
 
+@api_router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the ranked boards are seeded and while the database answers pings"""
+    database = await readiness.check()
+    if not database["ok"]:
+        status = "unavailable"
+    elif startup_state["leaderboards"] == "pending":
+        status = "starting"
+    else:
+        status = "ready"
+    return JSONResponse(
+        {
+            "status": status,
+            "database": database,
+            "indexes": startup_state["indexes"],
+            "leaderboards": startup_state["leaderboards"],
+            "startup_seconds": startup_state["seconds"]
+        },
+        status_code=200 if status == "ready" else 503
+    )
+
+def component_metrics():
+    """Cache, coalescing and ingestion stats reported at scrape time"""
+    cache = response_cache.stats()
+    yield ("daily_bite_response_cache_requests_total", "counter", "Response cache lookups by result", [
+        ({"result": "hit"}, cache["hits"]),
+        ({"result": "miss"}, cache["misses"])
+    ])
+    yield ("daily_bite_response_cache_invalidations_total", "counter", "Response cache invalidation calls", [
+        ({}, cache["invalidations"])
+    ])
+    yield ("daily_bite_response_cache_entries", "gauge", "Entries in the response cache", [
+        ({}, cache.get("size", 0))
+    ])
+    yield ("daily_bite_display_name_cache_entries", "gauge", "Entries in the display name cache", [
+        ({}, len(display_name_cache))
+    ])
+
+    flights = read_flights.stats()
+    yield ("daily_bite_coalesced_calls_total", "counter", "Reads through the single-flight layer", [
+        ({"route": route}, row["calls"]) for route, row in flights["routes"].items()
+    ])
+    yield ("daily_bite_coalesced_collapsed_total", "counter", "Reads that joined an in-flight identical read", [
+        ({"route": route}, row["collapsed"]) for route, row in flights["routes"].items()
+    ])
+
+    ingest = score_queue.stats()
+    yield ("daily_bite_ingest_queue_depth", "gauge", "Score submissions waiting to be flushed", [
+        ({}, ingest["depth"])
+    ])
+    yield ("daily_bite_ingest_items_total", "counter", "Queued score submissions by outcome", [
+        ({"outcome": outcome}, ingest[outcome]) for outcome in ("enqueued", "rejected", "flushed", "failed")
+    ])
+    yield ("daily_bite_ingest_flush_seconds_total", "counter", "Time spent flushing score batches", [
+        ({}, ingest["flush_seconds"])
+    ])
+    yield ("daily_bite_ingest_batches_total", "counter", "Score batches flushed", [
+        ({}, ingest["batches"])
+    ])
+
+    admission_stats = admission.stats()
+    yield ("daily_bite_admission_admitted_total", "counter", "Write requests admitted, including ones that queued", [
+        ({"route": route}, row["admitted"]) for route, row in admission_stats.items()
+    ])
+    yield ("daily_bite_admission_queued_total", "counter", "Write requests that waited for a slot before being admitted", [
+        ({"route": route}, row["queued"]) for route, row in admission_stats.items()
+    ])
+    yield ("daily_bite_admission_shed_total", "counter", "Write requests turned away, by reason", [
+        ({"route": route, "reason": reason}, count)
+        for route, row in admission_stats.items() for reason, count in row["shed"].items()
+    ])
+    yield ("daily_bite_admission_in_flight", "gauge", "Write requests currently running", [
+        ({"route": route}, row["in_flight"]) for route, row in admission_stats.items()
+    ])
+    yield ("daily_bite_admission_waiting", "gauge", "Write requests waiting for a slot", [
+        ({"route": route}, row["waiting"]) for route, row in admission_stats.items()
+    ])
+
+    live = live_leaderboard.stats()
+    yield ("daily_bite_live_subscribers", "gauge", "Open live leaderboard streams", [
+        ({"board": board}, count) for board, count in live["subscribers"].items()
+    ])
+    yield ("daily_bite_live_diffs_total", "counter", "Live leaderboard diffs computed (one per board per tick at most)", [
+        ({}, live["diffs"])
+    ])
+    yield ("daily_bite_live_deliveries_total", "counter", "Live leaderboard events queued to subscribers", [
+        ({}, live["deliveries"])
+    ])
+    yield ("daily_bite_live_resyncs_total", "counter", "Slow subscribers whose backlog was replaced by a snapshot", [
+        ({}, live["resyncs"])
+    ])
+
+metrics.add_collector(component_metrics)
+
+@api_router.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics for this worker"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
 # Include the API router
 app.include_router(api_router)
 
@@ -460,24 +1417,114 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def prepare_storage():
+    """Create indexes and run the one-time rollup backfills"""
+    startup_state["indexes"] = "building"
+    try:
+        started = time.perf_counter()
+        await storage.ensure_indexes()
+        logger.info(f"Database indexes created successfully in {time.perf_counter() - started:.3f}s")
+
+        # Backfill the stats rollup the first time this version runs
+        if await storage.totals.needs_backfill():
+            count = await rebuild_user_totals()
+            logger.info(f"Rebuilt user_totals for {count} users")
+        if await storage.buckets.needs_backfill():
+            count = await rebuild_leaderboard_buckets()
+            logger.info(f"Rebuilt {count} weekly and monthly leaderboard rows")
+        if await storage.histograms.needs_backfill(get_today_string()):
+            count = await storage.histograms.rebuild(get_today_string())
+            logger.info(f"Rebuilt today's score histogram from {count} scores")
+        startup_state["indexes"] = "ready"
+    except Exception as e:
+        startup_state["indexes"] = "failed"
+        logger.error(f"Error creating indexes: {str(e)}")
+
+async def seed_leaderboards():
+    """Seed the in-memory ranked boards; /api/ready holds traffic back until this has run"""
+    try:
+        day_count, total_count = await seed_leaderboard_index()
+        startup_state["leaderboards"] = "seeded"
+        logger.info(f"Leaderboard index seeded with {day_count} scores today and {total_count} all-time players")
+    except Exception as e:
+        startup_state["leaderboards"] = "failed"
+        logger.error(f"Error seeding leaderboard index: {str(e)}")
+
+async def prepare_and_seed():
+    # The all-time board is loaded from user_totals, so only once it is backfilled
+    await prepare_storage()
+    await seed_leaderboards()
+
+def reset_state(new_storage):
+    """Point the app at `new_storage` and drop everything derived from the old one
+
+    For running the app in process against fresh storage (tests, benchmarks);
+    call it before startup_event.
+    """
+    global storage
+    storage = new_storage
+    daily_content.repository = storage.daily_content
+    daily_content.forget()
+    leaderboard_index.__init__(leaderboard_index.max_days)
+    forget_display_names()
+    recent_reward_hashes.clear()
+    snapshot_cache.clear()
+    histogram_cache.clear()
+    histogram_generations.clear()
+    response_cache.backend.__init__()
+    readiness.forget()
+    admission.reset()
+    startup_state.update({"indexes": "pending", "leaderboards": "pending", "seconds": None})
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Daily Bite API starting up...")
-    
-    # Create indexes for better performance
+    started = time.perf_counter()
+
     try:
-        await db.users.create_index("uid", unique=True)
-        await db.scores.create_index([("user_id", 1), ("date", 1)], unique=True)
-        await db.scores.create_index([("date", 1), ("score", -1)])
-        await db.rewards.create_index("transaction_hash", unique=True)
-        logger.info("Database indexes created successfully")
+        await asyncio.wait_for(storage.warm_up(MONGO_WARMUP_CONNECTIONS), MONGO_WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.error(f"Database connection warm-up timed out after {MONGO_WARMUP_TIMEOUT}s")
     except Exception as e:
-        logger.error(f"Error creating indexes: {str(e)}")
+        logger.error(f"Error warming up database connections: {str(e)}")
+
+    # Listen before seeding so writes made meanwhile by other workers aren't missed
+    try:
+        await invalidation_bus.start()
+        if invalidation_bus.running:
+            logger.info(f"Invalidation bus started ({INVALIDATION_BUS})")
+    except Exception as e:
+        logger.error(f"Error starting invalidation bus: {str(e)}")
+
+    # Index builds and backfills on large collections can take a while; by
+    # default they run alongside traffic instead of delaying the first request,
+    # and the ranked boards are seeded once they finish
+    if INDEX_BUILD_MODE == "foreground":
+        await prepare_and_seed()
+    elif INDEX_BUILD_MODE == "skip":
+        startup_state["indexes"] = "skipped"
+        logger.info("Index creation skipped (INDEX_BUILD_MODE=skip)")
+        await seed_leaderboards()
+    else:
+        task = asyncio.ensure_future(prepare_and_seed())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    if os.environ.get('SCORE_INGEST_MODE', 'direct') == 'queue':
+        score_queue.start()
+        logger.info("Score ingestion queue started")
+
+    startup_state["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Startup finished in {startup_state['seconds']}s")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Daily Bite API shutting down...")
-    client.close()
+    for task in list(background_tasks):
+        task.cancel()
+    await score_queue.drain()
+    await invalidation_bus.stop()
+    storage.close()
 
 if __name__ == "__main__":
     import uvicorn
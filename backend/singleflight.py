@@ -0,0 +1,51 @@
+"""Request coalescing: identical concurrent reads share one in-flight coroutine"""
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+
+
+def make_key(route: str, **params) -> tuple:
+    """Build a coalescing key from a route name and its normalized parameters"""
+    return (route,) + tuple(sorted(params.items()))
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into a single execution
+
+    The first caller starts the work as a task; callers arriving while it is
+    still running await the same task and receive its result or exception.
+    The task is shielded so one client disconnecting does not cancel the
+    work for everyone else.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls: Dict[str, int] = {}
+        self.collapsed: Dict[str, int] = {}
+
+    async def do(self, key: tuple, fn: Callable[[], Awaitable[Any]]) -> Any:
+        route = key[0]
+        self.calls[route] = self.calls.get(route, 0) + 1
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.collapsed[route] = self.collapsed.get(route, 0) + 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: tuple, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "inflight": len(self._inflight),
+            "calls": sum(self.calls.values()),
+            "collapsed": sum(self.collapsed.values()),
+            "routes": {
+                route: {"calls": calls, "collapsed": self.collapsed.get(route, 0)}
+                for route, calls in self.calls.items()
+            }
+        }
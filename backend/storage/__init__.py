@@ -0,0 +1,47 @@
+"""Pluggable storage for the Daily Bite API
+
+`MongoStorage` runs on Motor; `MemoryStorage` keeps everything in process
+for tests, local benchmarks and profiling. The server picks one with
+STORAGE_BACKEND=mongo|memory.
+"""
+from .base import (
+    BUCKET_PERIODS,
+    RECENT_SCORES_LIMIT,
+    AcceptedScore,
+    BucketRepository,
+    DailyContentRepository,
+    DuplicateKeyError,
+    HistogramRepository,
+    RewardRepository,
+    ScoreBands,
+    ScoreRepository,
+    ScoreWrite,
+    SnapshotRepository,
+    Storage,
+    TotalsRepository,
+    UserRepository,
+    period_bucket,
+)
+from .memory import MemoryStorage
+from .mongo import MongoStorage
+
+__all__ = [
+    "BUCKET_PERIODS",
+    "RECENT_SCORES_LIMIT",
+    "AcceptedScore",
+    "BucketRepository",
+    "DailyContentRepository",
+    "DuplicateKeyError",
+    "HistogramRepository",
+    "MemoryStorage",
+    "MongoStorage",
+    "RewardRepository",
+    "ScoreBands",
+    "ScoreRepository",
+    "ScoreWrite",
+    "SnapshotRepository",
+    "Storage",
+    "TotalsRepository",
+    "UserRepository",
+    "period_bucket",
+]
@@ -0,0 +1,264 @@
+"""Repository interfaces shared by the Motor and in-memory storage engines
+
+Every operation is abstract, so an engine that misses one fails when it is
+constructed rather than on its first call.
+"""
+from abc import ABC, abstractmethod
+from datetime import date as Date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Number of recent scores kept in each user's stats rollup
+RECENT_SCORES_LIMIT = 10
+
+
+class DuplicateKeyError(Exception):
+    """A write violated one of the unique constraints (uid, (user_id, date), transaction_hash, ...)"""
+
+
+class ScoreWrite(NamedTuple):
+    """One score submission as the storage layer sees it"""
+    user_id: str
+    date: str
+    score: int
+    time_taken: int
+    category: Optional[str] = None
+    difficulty: Optional[str] = None
+
+
+# (score, previous score and time_taken for that date, both None for a first
+# score) for every score that was stored
+AcceptedScore = Tuple[ScoreWrite, Optional[int], Optional[int]]
+
+# Leaderboard periods kept as pre-aggregated buckets
+BUCKET_PERIODS = ("week", "month")
+
+
+def period_bucket(period: str, date: str) -> str:
+    """Bucket id for a YYYY-MM-DD date, e.g. week:2026-W42 (ISO week) or month:2026-10"""
+    if period == "week":
+        year, week, _ = Date.fromisoformat(date).isocalendar()
+        return f"week:{year}-W{week:02d}"
+    return f"month:{date[:7]}"
+
+
+class ScoreBands(NamedTuple):
+    """How the per-day score histograms bucket scores
+
+    Scores fall into `score_width`-point bands; with a `time_width` each band
+    is split further into `time_width`-second bands of time_taken.
+    """
+    score_width: int = 10
+    time_width: int = 0
+
+    def cell(self, score: int, time_taken: int) -> Tuple[int, int]:
+        """(score band, time band) lower bounds; the time band is 0 without a time_width"""
+        time_band = time_taken - time_taken % self.time_width if self.time_width else 0
+        return score - score % self.score_width, time_band
+
+
+class UserRepository(ABC):
+    """The `users` collection, keyed by uid"""
+
+    @abstractmethod
+    async def get(self, uid: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, doc: dict) -> str:
+        """Insert a new user and return its id; raises DuplicateKeyError for a known uid"""
+
+    @abstractmethod
+    async def update(self, uid: str, fields: dict) -> Optional[dict]:
+        """Set `fields` on the user and return the updated document (None if there is no such user)"""
+
+    @abstractmethod
+    async def add_points(self, uid: str, amount: int) -> Optional[int]:
+        """Atomically add to total_points and return the new total (None if there is no such user)"""
+
+    @abstractmethod
+    async def display_names(self, uids: Iterable[str]) -> Dict[str, str]:
+        """Display names for the uids that exist, in one lookup"""
+
+    @abstractmethod
+    async def update_streak(self, uid: str, today: str, yesterday: str, now: datetime) -> Optional[int]:
+        """Record play on `today` in one atomic update and return the new streak (None if there is no such user)
+
+        The streak grows by one if the last streak day was `yesterday`, stays
+        as is if it was today (or later), and restarts at 1 otherwise.
+        """
+
+    @abstractmethod
+    async def expire_streaks(self, before: str, dry_run: bool = False) -> Tuple[int, int]:
+        """Zero every streak whose last streak day is before `before`; returns (matched, modified)"""
+
+
+class ScoreRepository(ABC):
+    """The `scores` collection: one best score per (user_id, date)"""
+
+    @abstractmethod
+    async def write_best(self, write: ScoreWrite, now: datetime) -> Optional[dict]:
+        """Atomically store the score if it beats the user's score for that date
+
+        Returns None when the stored score is at least as good, otherwise a
+        dict with the previous score and time_taken (None for a first submission).
+        """
+
+    @abstractmethod
+    async def write_best_many(self, writes: List[ScoreWrite], now: datetime) -> List[AcceptedScore]:
+        """Store a batch of scores (at most one per user and date), returning the ones that won"""
+
+    @abstractmethod
+    async def day_top(self, date: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        """The day's best scores ordered by score desc, time_taken asc, user_id asc
+
+        `after` is the (score, time_taken, user_id) of the last entry of the
+        previous page; the page starts right after it.
+        """
+
+    @abstractmethod
+    async def day_entries(self, date: str) -> List[tuple]:
+        """(user_id, score, time_taken) for every score on `date`"""
+
+    @abstractmethod
+    async def day_histogram(self, date: str, width: int) -> List[Tuple[int, int]]:
+        """(lower bound, count) for every `width`-point band of the day's scores that has any, ascending"""
+
+    @abstractmethod
+    async def exists(self) -> bool:
+        ...
+
+
+class TotalsRepository(ABC):
+    """The `user_totals` per-user stats rollup (all-time totals and recent scores)"""
+
+    @abstractmethod
+    async def get(self, user_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def compute(self, user_id: str) -> dict:
+        """Compute a user's rollup straight from scores"""
+
+    @abstractmethod
+    async def top(self, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        """Rollups ordered by total_score desc, user_id asc, starting after (total_score, user_id)"""
+
+    @abstractmethod
+    async def entries(self) -> List[tuple]:
+        """(user_id, total_score, 0) for every user with a rollup"""
+
+    @abstractmethod
+    async def rebuild(self) -> int:
+        """Recompute every rollup from scores and return the number of users"""
+
+    @abstractmethod
+    async def needs_backfill(self) -> bool:
+        """True when scores exist but no rollup tracks recent scores yet"""
+
+
+class BucketRepository(ABC):
+    """Per-user totals for each ISO week and calendar month (`leaderboard_buckets`)"""
+
+    @abstractmethod
+    async def top(self, bucket: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        """The bucket's totals ordered by total_score desc, user_id asc, starting after (total_score, user_id)"""
+
+    @abstractmethod
+    async def rebuild(self) -> int:
+        """Recompute every bucket from scores and return the number of (bucket, user) rows"""
+
+    @abstractmethod
+    async def needs_backfill(self) -> bool:
+        """True when scores exist but no bucket has been written yet"""
+
+
+class HistogramRepository(ABC):
+    """The `score_histograms` collection: per-day counts of best scores by ScoreBands cell
+
+    Kept current by Storage.apply_score_effects, which moves a user's entry
+    from their old cell to the new one when they improve.
+    """
+
+    @abstractmethod
+    async def get(self, date: str) -> Dict[Tuple[int, int], int]:
+        """(score band, time band) -> number of players whose best score that day falls in it"""
+
+    @abstractmethod
+    async def rebuild(self, date: str) -> int:
+        """Recompute the day's histogram from its scores and return the number of players"""
+
+    @abstractmethod
+    async def needs_backfill(self, date: str) -> bool:
+        """True when the day has scores but no histogram"""
+
+
+class RewardRepository(ABC):
+    """The `rewards` ledger, unique on transaction_hash"""
+
+    @abstractmethod
+    async def find(self, transaction_hash: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def insert(self, doc: dict) -> None:
+        """Record a reward; raises DuplicateKeyError if the transaction hash is known"""
+
+
+class DailyContentRepository(ABC):
+    """The `daily_content` collection, one document per date"""
+
+    @abstractmethod
+    async def get(self, date: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def put_if_absent(self, date: str, content: dict) -> dict:
+        """Store `content` unless the date already has content; return whichever is stored"""
+
+
+class SnapshotRepository(ABC):
+    """The `leaderboard_snapshots` collection: each finished day's frozen leaderboard"""
+
+    @abstractmethod
+    async def get(self, date: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def put_if_absent(self, date: str, snapshot: dict) -> dict:
+        """Store `snapshot` unless the date is already frozen; return whichever is stored"""
+
+    @abstractmethod
+    async def dates(self, first: str, last: str) -> List[str]:
+        """The frozen dates between `first` and `last`, inclusive"""
+
+
+class Storage(ABC):
+    """One storage engine: a repository per collection plus the cross-collection writes"""
+
+    users: UserRepository
+    scores: ScoreRepository
+    totals: TotalsRepository
+    buckets: BucketRepository
+    histograms: HistogramRepository
+    rewards: RewardRepository
+    daily_content: DailyContentRepository
+    snapshots: SnapshotRepository
+
+    @abstractmethod
+    async def ensure_indexes(self) -> None:
+        ...
+
+    @abstractmethod
+    async def ping(self) -> None:
+        """Round trip to the database; raises if it cannot be reached"""
+
+    @abstractmethod
+    async def warm_up(self, connections: int) -> None:
+        """Open up to `connections` database connections ahead of the first requests"""
+
+    @abstractmethod
+    async def apply_score_effects(self, accepted: List[AcceptedScore], now: datetime) -> None:
+        """Add accepted scores to the users' total_points, stats rollups, period buckets and score histograms"""
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,475 @@
+"""In-process storage engine: indexed dicts and sorted lists, no database needed
+
+Mirrors the Mongo engine's behaviour, including the unique constraints that
+`MongoStorage.ensure_indexes` creates, so the API can run, be benchmarked
+and be tested without a MongoDB server. Every operation completes without
+awaiting, which makes each one atomic with respect to other requests on the
+event loop. Documents are copied on the way in and out, so callers can
+mutate what they get back the way they can with Motor.
+"""
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from sortedcontainers import SortedList
+
+from .base import (
+    BUCKET_PERIODS,
+    RECENT_SCORES_LIMIT,
+    AcceptedScore,
+    BucketRepository,
+    DailyContentRepository,
+    DuplicateKeyError,
+    HistogramRepository,
+    RewardRepository,
+    ScoreBands,
+    ScoreRepository,
+    ScoreWrite,
+    SnapshotRepository,
+    Storage,
+    TotalsRepository,
+    UserRepository,
+    period_bucket,
+)
+
+
+def _copy_rollup(doc: dict) -> dict:
+    copied = dict(doc)
+    if "recent_scores" in copied:
+        copied["recent_scores"] = [dict(entry) for entry in copied["recent_scores"]]
+    return copied
+
+
+class MemoryUserRepository(UserRepository):
+    """Users by uid plus a (last_streak_date, uid) sorted index for streak expiry"""
+
+    def __init__(self):
+        self._docs: Dict[str, dict] = {}
+        self._by_streak_date = SortedList()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    async def get(self, uid: str) -> Optional[dict]:
+        doc = self._docs.get(uid)
+        return dict(doc) if doc is not None else None
+
+    async def insert(self, doc: dict) -> str:
+        uid = doc["uid"]
+        if uid in self._docs:
+            raise DuplicateKeyError(f"duplicate uid: {uid}")
+        stored = {"_id": ObjectId(), **doc}
+        self._docs[uid] = stored
+        if stored.get("last_streak_date"):
+            self._by_streak_date.add((stored["last_streak_date"], uid))
+        return str(stored["_id"])
+
+    def _set(self, doc: dict, fields: dict) -> None:
+        if "last_streak_date" in fields and fields["last_streak_date"] != doc.get("last_streak_date"):
+            if doc.get("last_streak_date"):
+                self._by_streak_date.remove((doc["last_streak_date"], doc["uid"]))
+            if fields["last_streak_date"]:
+                self._by_streak_date.add((fields["last_streak_date"], doc["uid"]))
+        doc.update(fields)
+
+    async def update(self, uid: str, fields: dict) -> Optional[dict]:
+        doc = self._docs.get(uid)
+        if doc is None:
+            return None
+        self._set(doc, fields)
+        return dict(doc)
+
+    async def add_points(self, uid: str, amount: int) -> Optional[int]:
+        doc = self._docs.get(uid)
+        if doc is None:
+            return None
+        doc["total_points"] = doc.get("total_points", 0) + amount
+        return doc["total_points"]
+
+    async def display_names(self, uids: Iterable[str]) -> Dict[str, str]:
+        names = {}
+        for uid in uids:
+            doc = self._docs.get(uid)
+            if doc is not None:
+                names[uid] = doc.get("display_name", "Anonymous")
+        return names
+
+    async def update_streak(self, uid: str, today: str, yesterday: str, now: datetime) -> Optional[int]:
+        doc = self._docs.get(uid)
+        if doc is None:
+            return None
+        last = doc.get("last_streak_date")
+        streak = doc.get("streak") or 0
+        if last == yesterday:
+            streak += 1
+        elif not last or last < today:
+            streak = 1
+        self._set(doc, {"streak": streak, "last_streak_date": today, "last_active": now})
+        return streak
+
+    async def expire_streaks(self, before: str, dry_run: bool = False) -> Tuple[int, int]:
+        expired = [
+            self._docs[uid]
+            for _, uid in self._by_streak_date.irange(maximum=(before,), inclusive=(True, False))
+            if (self._docs[uid].get("streak") or 0) > 0
+        ]
+        if not dry_run:
+            for doc in expired:
+                doc["streak"] = 0
+        return len(expired), 0 if dry_run else len(expired)
+
+
+class MemoryScoreRepository(ScoreRepository):
+    """Scores by (user_id, date), plus a per-day ranked index and a per-user index"""
+
+    def __init__(self):
+        self._docs: Dict[Tuple[str, str], dict] = {}
+        self._by_day: Dict[str, SortedList] = {}
+        self._by_user: Dict[str, Dict[str, dict]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def user_scores(self, user_id: str) -> List[dict]:
+        return list(self._by_user.get(user_id, {}).values())
+
+    def all_users(self) -> List[str]:
+        return list(self._by_user)
+
+    def day_count(self, date: str) -> int:
+        return len(self._by_day.get(date, ()))
+
+    def _store(self, write: ScoreWrite, now: datetime) -> Optional[dict]:
+        key = (write.user_id, write.date)
+        doc = self._docs.get(key)
+        day = self._by_day.setdefault(write.date, SortedList())
+        if doc is None:
+            doc = {
+                "user_id": write.user_id,
+                "date": write.date,
+                "score": write.score,
+                "time_taken": write.time_taken,
+                "updated_at": now,
+                "category": write.category,
+                "difficulty": write.difficulty,
+                "created_at": now
+            }
+            self._docs[key] = doc
+            self._by_user.setdefault(write.user_id, {})[write.date] = doc
+            day.add((-write.score, write.time_taken, write.user_id))
+            return {"score": None, "time_taken": None}
+        if doc["score"] >= write.score:
+            return None
+        previous = {"score": doc["score"], "time_taken": doc["time_taken"]}
+        day.remove((-previous["score"], previous["time_taken"], write.user_id))
+        doc.update(score=write.score, time_taken=write.time_taken, updated_at=now)
+        day.add((-write.score, write.time_taken, write.user_id))
+        return previous
+
+    async def write_best(self, write: ScoreWrite, now: datetime) -> Optional[dict]:
+        return self._store(write, now)
+
+    async def write_best_many(self, writes: List[ScoreWrite], now: datetime) -> List[AcceptedScore]:
+        accepted = []
+        for write in writes:
+            written = self._store(write, now)
+            if written is not None:
+                accepted.append((write, written["score"], written["time_taken"]))
+        return accepted
+
+    async def day_top(self, date: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        day = self._by_day.get(date)
+        if day is None:
+            return []
+        if after is None:
+            keys = islice(day, limit)
+        else:
+            score, time_taken, user_id = after
+            keys = islice(day.irange(minimum=(-score, time_taken, user_id), inclusive=(False, True)), limit)
+        return [dict(self._docs[(user_id, date)]) for _, _, user_id in keys]
+
+    async def day_entries(self, date: str) -> List[tuple]:
+        return [(user_id, -neg_score, time_taken) for neg_score, time_taken, user_id in self._by_day.get(date, ())]
+
+    async def day_histogram(self, date: str, width: int) -> List[Tuple[int, int]]:
+        counts: Dict[int, int] = {}
+        for neg_score, _, _ in self._by_day.get(date, ()):
+            lower = -neg_score - (-neg_score) % width
+            counts[lower] = counts.get(lower, 0) + 1
+        return sorted(counts.items())
+
+    async def exists(self) -> bool:
+        return bool(self._docs)
+
+
+class MemoryTotalsRepository(TotalsRepository):
+    """Rollups by user_id plus a (total_score desc, user_id) sorted index"""
+
+    def __init__(self, scores: MemoryScoreRepository):
+        self.scores = scores
+        self._docs: Dict[str, dict] = {}
+        self._ranked = SortedList()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        doc = self._docs.get(user_id)
+        return _copy_rollup(doc) if doc is not None else None
+
+    def _rollup_from_scores(self, user_id: str) -> dict:
+        rows = self.scores.user_scores(user_id)
+        recent = sorted(rows, key=lambda row: row["created_at"], reverse=True)[:RECENT_SCORES_LIMIT]
+        return {
+            "user_id": user_id,
+            "total_score": sum(row["score"] for row in rows),
+            "best_score": max((row["score"] for row in rows), default=0),
+            "games_played": len(rows),
+            "successful_games": sum(1 for row in rows if row["score"] > 0),
+            "recent_scores": [
+                {
+                    "score": row["score"],
+                    "date": row["date"],
+                    "time_taken": row["time_taken"],
+                    "created_at": row["created_at"]
+                }
+                for row in recent
+            ]
+        }
+
+    async def compute(self, user_id: str) -> dict:
+        return self._rollup_from_scores(user_id)
+
+    async def top(self, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        if after is None:
+            keys = islice(self._ranked, limit)
+        else:
+            total_score, user_id = after
+            keys = islice(self._ranked.irange(minimum=(-total_score, user_id), inclusive=(False, True)), limit)
+        return [_copy_rollup(self._docs[user_id]) for _, user_id in keys]
+
+    async def entries(self) -> List[tuple]:
+        return [(user_id, doc["total_score"], 0) for user_id, doc in self._docs.items()]
+
+    def _put(self, doc: dict) -> None:
+        old = self._docs.get(doc["user_id"])
+        if old is not None:
+            self._ranked.remove((-old["total_score"], old["user_id"]))
+        self._docs[doc["user_id"]] = doc
+        self._ranked.add((-doc["total_score"], doc["user_id"]))
+
+    def apply(self, write: ScoreWrite, previous_score: Optional[int], now: datetime) -> None:
+        """The in-memory equivalent of the Mongo engine's user_rollup_writes"""
+        doc = self._docs.get(write.user_id)
+        doc = _copy_rollup(doc) if doc is not None else {"user_id": write.user_id}
+        doc["total_score"] = doc.get("total_score", 0) + write.score - (previous_score or 0)
+        doc["best_score"] = max(doc.get("best_score", write.score), write.score)
+        recent = doc.setdefault("recent_scores", [])
+        if previous_score is None:
+            doc["games_played"] = doc.get("games_played", 0) + 1
+            if write.score > 0:
+                doc["successful_games"] = doc.get("successful_games", 0) + 1
+            recent.append({
+                "score": write.score,
+                "date": write.date,
+                "time_taken": write.time_taken,
+                "created_at": now
+            })
+            recent.sort(key=lambda entry: entry["created_at"], reverse=True)
+            del recent[RECENT_SCORES_LIMIT:]
+        else:
+            if previous_score <= 0 < write.score:
+                doc["successful_games"] = doc.get("successful_games", 0) + 1
+            for entry in recent:
+                if entry["date"] == write.date:
+                    entry.update(score=write.score, time_taken=write.time_taken)
+                    break
+        self._put(doc)
+
+    async def rebuild(self) -> int:
+        users = self.scores.all_users()
+        for user_id in users:
+            self._put(self._rollup_from_scores(user_id))
+        return len(users)
+
+    async def needs_backfill(self) -> bool:
+        if any("recent_scores" in doc for doc in self._docs.values()):
+            return False
+        return await self.scores.exists()
+
+
+class MemoryBucketRepository(BucketRepository):
+    """Bucket rows by (bucket, user_id) plus a (total_score desc, user_id) sorted index per bucket"""
+
+    def __init__(self, scores: MemoryScoreRepository):
+        self.scores = scores
+        self._docs: Dict[Tuple[str, str], dict] = {}
+        self._ranked: Dict[str, SortedList] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    async def top(self, bucket: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        ranked = self._ranked.get(bucket)
+        if ranked is None:
+            return []
+        if after is None:
+            keys = islice(ranked, limit)
+        else:
+            total_score, user_id = after
+            keys = islice(ranked.irange(minimum=(-total_score, user_id), inclusive=(False, True)), limit)
+        return [dict(self._docs[(bucket, user_id)]) for _, user_id in keys]
+
+    def _put(self, doc: dict) -> None:
+        ranked = self._ranked.setdefault(doc["bucket"], SortedList())
+        old = self._docs.get((doc["bucket"], doc["user_id"]))
+        if old is not None:
+            ranked.remove((-old["total_score"], old["user_id"]))
+        self._docs[(doc["bucket"], doc["user_id"])] = doc
+        ranked.add((-doc["total_score"], doc["user_id"]))
+
+    def apply(self, write: ScoreWrite, previous_score: Optional[int]) -> None:
+        """The in-memory equivalent of the Mongo engine's bucket_writes"""
+        for period in BUCKET_PERIODS:
+            bucket = period_bucket(period, write.date)
+            doc = dict(self._docs.get((bucket, write.user_id)) or {"bucket": bucket, "user_id": write.user_id})
+            doc["total_score"] = doc.get("total_score", 0) + write.score - (previous_score or 0)
+            doc["best_score"] = max(doc.get("best_score", write.score), write.score)
+            if previous_score is None:
+                doc["games_played"] = doc.get("games_played", 0) + 1
+            self._put(doc)
+
+    async def rebuild(self) -> int:
+        rows: Dict[Tuple[str, str], dict] = {}
+        for user_id in self.scores.all_users():
+            for score in self.scores.user_scores(user_id):
+                for period in BUCKET_PERIODS:
+                    bucket = period_bucket(period, score["date"])
+                    row = rows.setdefault((bucket, user_id), {
+                        "bucket": bucket,
+                        "user_id": user_id,
+                        "total_score": 0,
+                        "best_score": score["score"],
+                        "games_played": 0
+                    })
+                    row["total_score"] += score["score"]
+                    row["best_score"] = max(row["best_score"], score["score"])
+                    row["games_played"] += 1
+        for row in rows.values():
+            self._put(row)
+        return len(rows)
+
+    async def needs_backfill(self) -> bool:
+        return not self._docs and await self.scores.exists()
+
+
+class MemoryHistogramRepository(HistogramRepository):
+    """Cell counts by date"""
+
+    def __init__(self, scores: MemoryScoreRepository, bands: ScoreBands):
+        self.scores = scores
+        self.bands = bands
+        self._days: Dict[str, Dict[Tuple[int, int], int]] = {}
+
+    async def get(self, date: str) -> Dict[Tuple[int, int], int]:
+        return {cell: count for cell, count in self._days.get(date, {}).items() if count > 0}
+
+    def apply(self, write: ScoreWrite, previous_score: Optional[int], previous_time: Optional[int]) -> None:
+        """The in-memory equivalent of the Mongo engine's histogram_writes"""
+        cells = self._days.setdefault(write.date, {})
+        if previous_score is not None:
+            old = self.bands.cell(previous_score, previous_time or 0)
+            cells[old] = cells.get(old, 0) - 1
+        new = self.bands.cell(write.score, write.time_taken)
+        cells[new] = cells.get(new, 0) + 1
+
+    async def rebuild(self, date: str) -> int:
+        cells: Dict[Tuple[int, int], int] = {}
+        for _, score, time_taken in await self.scores.day_entries(date):
+            cell = self.bands.cell(score, time_taken)
+            cells[cell] = cells.get(cell, 0) + 1
+        self._days[date] = cells
+        return sum(cells.values())
+
+    async def needs_backfill(self, date: str) -> bool:
+        return date not in self._days and self.scores.day_count(date) > 0
+
+
+class MemoryRewardRepository(RewardRepository):
+    def __init__(self):
+        self._docs: Dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    async def find(self, transaction_hash: str) -> Optional[dict]:
+        doc = self._docs.get(transaction_hash)
+        return dict(doc) if doc is not None else None
+
+    async def insert(self, doc: dict) -> None:
+        transaction_hash = doc["transaction_hash"]
+        if transaction_hash in self._docs:
+            raise DuplicateKeyError(f"duplicate transaction_hash: {transaction_hash}")
+        self._docs[transaction_hash] = {"_id": ObjectId(), **doc}
+
+
+class MemoryDailyContentRepository(DailyContentRepository):
+    def __init__(self):
+        self._docs: Dict[str, dict] = {}
+
+    async def get(self, date: str) -> Optional[dict]:
+        doc = self._docs.get(date)
+        return dict(doc) if doc is not None else None
+
+    async def put_if_absent(self, date: str, content: dict) -> dict:
+        stored = self._docs.setdefault(date, dict(content))
+        return dict(stored)
+
+
+class MemorySnapshotRepository(SnapshotRepository):
+    def __init__(self):
+        self._docs: Dict[str, dict] = {}
+
+    async def get(self, date: str) -> Optional[dict]:
+        doc = self._docs.get(date)
+        return dict(doc) if doc is not None else None
+
+    async def put_if_absent(self, date: str, snapshot: dict) -> dict:
+        stored = self._docs.setdefault(date, dict(snapshot))
+        return dict(stored)
+
+    async def dates(self, first: str, last: str) -> List[str]:
+        return sorted(date for date in self._docs if first <= date <= last)
+
+
+class MemoryStorage(Storage):
+    """Everything in process memory; state lives as long as the object"""
+
+    def __init__(self, bands: ScoreBands = ScoreBands()):
+        self.bands = bands
+        self.users = MemoryUserRepository()
+        self.scores = MemoryScoreRepository()
+        self.totals = MemoryTotalsRepository(self.scores)
+        self.buckets = MemoryBucketRepository(self.scores)
+        self.histograms = MemoryHistogramRepository(self.scores, bands)
+        self.rewards = MemoryRewardRepository()
+        self.daily_content = MemoryDailyContentRepository()
+        self.snapshots = MemorySnapshotRepository()
+
+    async def ensure_indexes(self) -> None:
+        # The dict keys and sorted lists are the indexes
+        pass
+
+    async def ping(self) -> None:
+        pass
+
+    async def warm_up(self, connections: int) -> None:
+        pass
+
+    async def apply_score_effects(self, accepted: List[AcceptedScore], now: datetime) -> None:
+        for write, previous_score, previous_time in accepted:
+            await self.users.add_points(write.user_id, write.score - (previous_score or 0))
+            self.totals.apply(write, previous_score, now)
+            self.buckets.apply(write, previous_score)
+            self.histograms.apply(write, previous_score, previous_time)
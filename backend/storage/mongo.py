@@ -0,0 +1,672 @@
+"""MongoDB storage engine on Motor"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import zlib
+
+from pymongo import ReadPreference, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo import errors
+
+from .base import (
+    BUCKET_PERIODS,
+    RECENT_SCORES_LIMIT,
+    AcceptedScore,
+    BucketRepository,
+    DailyContentRepository,
+    DuplicateKeyError,
+    HistogramRepository,
+    RewardRepository,
+    ScoreBands,
+    ScoreRepository,
+    ScoreWrite,
+    SnapshotRepository,
+    Storage,
+    TotalsRepository,
+    UserRepository,
+    period_bucket,
+)
+
+
+# MONGO_READ_PREFERENCE values accepted for the leaderboard and aggregate reads
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST
+}
+
+# Each day's histogram is spread over this many documents so concurrent
+# submissions don't all queue on one document; reads sum them
+HISTOGRAM_SHARDS = 16
+
+
+def best_score_update(write: ScoreWrite, now: datetime):
+    """Filter and update that store a score only if it beats the stored one for that date"""
+    query = {
+        "user_id": write.user_id,
+        "date": write.date,
+        "score": {"$lt": write.score}
+    }
+    improved = {
+        "score": write.score,
+        "time_taken": write.time_taken,
+        "updated_at": now
+    }
+    on_insert = {
+        "category": write.category,
+        "difficulty": write.difficulty,
+        "created_at": now
+    }
+    return query, improved, on_insert
+
+
+def best_score_pipeline(write: ScoreWrite, now: datetime):
+    """Filter and update pipeline that upsert the (user_id, date) score, replacing it only if beaten
+
+    The filter is the unique key alone, so it matches the stored score
+    whatever its value. The pipeline keeps the stored fields unless the new
+    score is higher, and sets the insert-only fields on a new document.
+    Values are wrapped in $literal so a "$"-prefixed category is stored as is.
+    """
+    _, improved, on_insert = best_score_update(write, now)
+    beaten = {"$lt": [{"$ifNull": ["$score", None]}, write.score]}
+    inserted = {"$eq": [{"$ifNull": ["$created_at", None]}, None]}
+    fields = {}
+    for condition, values in ((beaten, improved), (inserted, on_insert)):
+        for field, value in values.items():
+            fields[field] = {"$cond": [condition, {"$literal": value}, f"${field}"]}
+    return {"user_id": write.user_id, "date": write.date}, [{"$set": fields}]
+
+
+def user_rollup_writes(write: ScoreWrite, previous_score: Optional[int], now: datetime) -> List[UpdateOne]:
+    """Updates applying one accepted score to the user's stats rollup in user_totals"""
+    score_delta = write.score - (previous_score or 0)
+    inc = {"total_score": score_delta}
+    if previous_score is None:
+        inc["games_played"] = 1
+        if write.score > 0:
+            inc["successful_games"] = 1
+        return [UpdateOne(
+            {"user_id": write.user_id},
+            {
+                "$inc": inc,
+                "$max": {"best_score": write.score},
+                "$push": {"recent_scores": {
+                    "$each": [{
+                        "score": write.score,
+                        "date": write.date,
+                        "time_taken": write.time_taken,
+                        "created_at": now
+                    }],
+                    "$sort": {"created_at": -1},
+                    "$slice": RECENT_SCORES_LIMIT
+                }}
+            },
+            upsert=True
+        )]
+
+    if previous_score <= 0 < write.score:
+        inc["successful_games"] = 1
+    return [
+        UpdateOne(
+            {"user_id": write.user_id},
+            {"$inc": inc, "$max": {"best_score": write.score}},
+            upsert=True
+        ),
+        # Rewrite the day's entry in place if it is still among the recent scores
+        UpdateOne(
+            {"user_id": write.user_id, "recent_scores.date": write.date},
+            {"$set": {
+                "recent_scores.$.score": write.score,
+                "recent_scores.$.time_taken": write.time_taken
+            }}
+        )
+    ]
+
+
+def bucket_writes(write: ScoreWrite, previous_score: Optional[int]) -> List[UpdateOne]:
+    """Upserts applying one accepted score to its week and month buckets"""
+    inc = {"total_score": write.score - (previous_score or 0)}
+    if previous_score is None:
+        inc["games_played"] = 1
+    return [
+        UpdateOne(
+            {"bucket": period_bucket(period, write.date), "user_id": write.user_id},
+            {"$inc": inc, "$max": {"best_score": write.score}},
+            upsert=True
+        )
+        for period in BUCKET_PERIODS
+    ]
+
+
+def histogram_shard(user_id: str) -> int:
+    # crc32 rather than hash(), which differs between processes
+    return zlib.crc32(user_id.encode()) % HISTOGRAM_SHARDS
+
+
+def histogram_writes(accepted: List[AcceptedScore], bands: ScoreBands) -> List[UpdateOne]:
+    """One $inc upsert per (date, shard) moving each accepted score from its old cell to its new one"""
+    incs: Dict[Tuple[str, int], Dict[str, int]] = {}
+    for write, previous_score, previous_time in accepted:
+        new = bands.cell(write.score, write.time_taken)
+        old = bands.cell(previous_score, previous_time or 0) if previous_score is not None else None
+        if new == old:
+            continue
+        inc = incs.setdefault((write.date, histogram_shard(write.user_id)), {})
+        field = f"cells.{new[0]}:{new[1]}"
+        inc[field] = inc.get(field, 0) + 1
+        if old is not None:
+            field = f"cells.{old[0]}:{old[1]}"
+            inc[field] = inc.get(field, 0) - 1
+    return [
+        UpdateOne({"date": date, "shard": shard}, {"$inc": inc}, upsert=True)
+        for (date, shard), inc in incs.items()
+    ]
+
+
+class MongoUserRepository(UserRepository):
+    def __init__(self, collection, reads=None):
+        self.collection = collection
+        self.reads = reads if reads is not None else collection
+
+    async def get(self, uid: str) -> Optional[dict]:
+        return await self.collection.find_one({"uid": uid})
+
+    async def insert(self, doc: dict) -> str:
+        try:
+            result = await self.collection.insert_one(doc)
+        except errors.DuplicateKeyError as e:
+            raise DuplicateKeyError(str(e))
+        return str(result.inserted_id)
+
+    async def update(self, uid: str, fields: dict) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            {"uid": uid},
+            {"$set": fields},
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def add_points(self, uid: str, amount: int) -> Optional[int]:
+        doc = await self.collection.find_one_and_update(
+            {"uid": uid},
+            {"$inc": {"total_points": amount}},
+            projection={"_id": 0, "total_points": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["total_points"] if doc else None
+
+    async def display_names(self, uids: Iterable[str]) -> Dict[str, str]:
+        names = {}
+        cursor = self.reads.find({"uid": {"$in": list(uids)}}, {"_id": 0, "uid": 1, "display_name": 1})
+        async for user in cursor:
+            names[user["uid"]] = user.get("display_name", "Anonymous")
+        return names
+
+    async def update_streak(self, uid: str, today: str, yesterday: str, now: datetime) -> Optional[int]:
+        # Pipeline update: the new streak is computed from the stored one server-side.
+        # Dates are YYYY-MM-DD strings, so string order is date order.
+        doc = await self.collection.find_one_and_update(
+            {"uid": uid},
+            [{"$set": {
+                "streak": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$last_streak_date", yesterday]}, "then": {"$add": [{"$ifNull": ["$streak", 0]}, 1]}},
+                        {"case": {"$gte": ["$last_streak_date", today]}, "then": {"$ifNull": ["$streak", 0]}}
+                    ],
+                    "default": 1
+                }},
+                "last_streak_date": today,
+                "last_active": now
+            }}],
+            projection={"_id": 0, "streak": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["streak"] if doc else None
+
+    async def expire_streaks(self, before: str, dry_run: bool = False) -> Tuple[int, int]:
+        query = {"last_streak_date": {"$lt": before}, "streak": {"$gt": 0}}
+        if dry_run:
+            return await self.collection.count_documents(query), 0
+        result = await self.collection.update_many(query, {"$set": {"streak": 0}})
+        return result.matched_count, result.modified_count
+
+
+class MongoScoreRepository(ScoreRepository):
+    def __init__(self, collection, reads=None):
+        self.collection = collection
+        self.reads = reads if reads is not None else collection
+
+    async def write_best(self, write: ScoreWrite, now: datetime) -> Optional[dict]:
+        """One find_one_and_update with an update pipeline, whether or not the score is a new best
+
+        Only two first submissions for the same (user_id, date) racing each
+        other can still hit the unique index (servers before 4.2 don't retry
+        such upserts themselves); the loser runs the same update once more,
+        which then matches the winner's document.
+        """
+        query, pipeline = best_score_pipeline(write, now)
+        update = dict(
+            projection={"_id": 0, "score": 1, "time_taken": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        try:
+            previous = await self.collection.find_one_and_update(query, pipeline, **update)
+        except errors.DuplicateKeyError:
+            previous = await self.collection.find_one_and_update(query, pipeline, **update)
+        if previous is None:
+            return {"score": None, "time_taken": None}
+        if previous["score"] >= write.score:
+            return None
+        return {"score": previous["score"], "time_taken": previous.get("time_taken")}
+
+    async def write_best_many(self, writes: List[ScoreWrite], now: datetime) -> List[AcceptedScore]:
+        if not writes:
+            return []
+        existing = {}
+        cursor = self.collection.find(
+            {"$or": [{"user_id": write.user_id, "date": write.date} for write in writes]},
+            {"_id": 0, "user_id": 1, "date": 1, "score": 1, "time_taken": 1}
+        )
+        async for row in cursor:
+            existing[(row["user_id"], row["date"])] = (row["score"], row.get("time_taken"))
+
+        candidates = []
+        for write in writes:
+            previous_score, previous_time = existing.get((write.user_id, write.date), (None, None))
+            if previous_score is None or write.score > previous_score:
+                candidates.append((write, previous_score, previous_time))
+        if not candidates:
+            return []
+
+        ops = []
+        for write, _, _ in candidates:
+            query, improved, on_insert = best_score_update(write, now)
+            ops.append(UpdateOne(query, {"$set": improved, "$setOnInsert": on_insert}, upsert=True))
+
+        lost = set()
+        try:
+            await self.collection.bulk_write(ops, ordered=False)
+        except errors.BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            # Duplicate keys mean another writer stored an equal or better score first
+            if any(error.get("code") != 11000 for error in write_errors):
+                raise
+            lost = {error["index"] for error in write_errors}
+
+        return [candidate for i, candidate in enumerate(candidates) if i not in lost]
+
+    async def day_top(self, date: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        # Keyset page over the (date, score, time_taken, user_id) index: a deep
+        # page seeks straight to its position instead of skipping entries
+        query = {"date": date}
+        if after is not None:
+            score, time_taken, user_id = after
+            query["$or"] = [
+                {"score": {"$lt": score}},
+                {"score": score, "time_taken": {"$gt": time_taken}},
+                {"score": score, "time_taken": time_taken, "user_id": {"$gt": user_id}}
+            ]
+        return await self.reads.find(
+            query,
+            {"_id": 0},
+            sort=[("score", -1), ("time_taken", 1), ("user_id", 1)],
+            limit=limit
+        ).to_list(length=limit)
+
+    async def day_entries(self, date: str) -> List[tuple]:
+        rows = []
+        async for row in self.collection.find({"date": date}, {"_id": 0, "user_id": 1, "score": 1, "time_taken": 1}):
+            rows.append((row["user_id"], row["score"], row.get("time_taken", 0)))
+        return rows
+
+    async def day_histogram(self, date: str, width: int) -> List[Tuple[int, int]]:
+        # Covered by the (date, score, ...) index; one pass over the day
+        pipeline = [
+            {"$match": {"date": date}},
+            {"$project": {"_id": 0, "score": 1}},
+            {"$group": {"_id": {"$subtract": ["$score", {"$mod": ["$score", width]}]}, "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]
+        return [(int(row["_id"]), row["count"]) async for row in self.collection.aggregate(pipeline)]
+
+    async def exists(self) -> bool:
+        return await self.collection.find_one({}) is not None
+
+
+class MongoTotalsRepository(TotalsRepository):
+    def __init__(self, collection, scores, reads=None):
+        self.collection = collection
+        self.scores = scores
+        self.reads = reads if reads is not None else collection
+
+    async def get(self, user_id: str) -> Optional[dict]:
+        # A player's own stats read the primary: they must show the score just submitted
+        return await self.collection.find_one({"user_id": user_id}, {"_id": 0})
+
+    async def compute(self, user_id: str) -> dict:
+        """Single $facet query over the user's scores"""
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "totals": [{"$group": {
+                    "_id": None,
+                    "total_score": {"$sum": "$score"},
+                    "best_score": {"$max": "$score"},
+                    "games_played": {"$sum": 1},
+                    "successful_games": {"$sum": {"$cond": [{"$gt": ["$score", 0]}, 1, 0]}}
+                }}],
+                "recent_scores": [
+                    {"$sort": {"created_at": -1}},
+                    {"$limit": RECENT_SCORES_LIMIT},
+                    {"$project": {"_id": 0, "score": 1, "date": 1, "time_taken": 1, "created_at": 1}}
+                ]
+            }}
+        ]
+        result = (await self.scores.aggregate(pipeline).to_list(length=1))[0]
+        totals = result["totals"][0] if result["totals"] else {}
+        return {
+            "user_id": user_id,
+            "total_score": totals.get("total_score") or 0,
+            "best_score": totals.get("best_score") or 0,
+            "games_played": totals.get("games_played") or 0,
+            "successful_games": totals.get("successful_games") or 0,
+            "recent_scores": result["recent_scores"]
+        }
+
+    async def top(self, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        query = {}
+        if after is not None:
+            total_score, user_id = after
+            query["$or"] = [
+                {"total_score": {"$lt": total_score}},
+                {"total_score": total_score, "user_id": {"$gt": user_id}}
+            ]
+        return await self.reads.find(
+            query,
+            {"_id": 0},
+            sort=[("total_score", -1), ("user_id", 1)],
+            limit=limit
+        ).to_list(length=limit)
+
+    async def entries(self) -> List[tuple]:
+        rows = []
+        async for row in self.collection.find({}, {"_id": 0, "user_id": 1, "total_score": 1}):
+            rows.append((row["user_id"], row["total_score"], 0))
+        return rows
+
+    async def rebuild(self) -> int:
+        pipeline = [
+            {"$sort": {"created_at": -1}},
+            {"$group": {
+                "_id": "$user_id",
+                "total_score": {"$sum": "$score"},
+                "best_score": {"$max": "$score"},
+                "games_played": {"$sum": 1},
+                "successful_games": {"$sum": {"$cond": [{"$gt": ["$score", 0]}, 1, 0]}},
+                "recent_scores": {"$push": {
+                    "score": "$score",
+                    "date": "$date",
+                    "time_taken": "$time_taken",
+                    "created_at": "$created_at"
+                }}
+            }},
+            {"$project": {
+                "total_score": 1,
+                "best_score": 1,
+                "games_played": 1,
+                "successful_games": 1,
+                "recent_scores": {"$slice": ["$recent_scores", RECENT_SCORES_LIMIT]}
+            }}
+        ]
+        count = 0
+        batch = []
+        async for row in self.scores.aggregate(pipeline, allowDiskUse=True):
+            user_id = row.pop("_id")
+            batch.append(ReplaceOne({"user_id": user_id}, {"user_id": user_id, **row}, upsert=True))
+            if len(batch) >= 1000:
+                await self.collection.bulk_write(batch, ordered=False)
+                count += len(batch)
+                batch = []
+        if batch:
+            await self.collection.bulk_write(batch, ordered=False)
+            count += len(batch)
+        return count
+
+    async def needs_backfill(self) -> bool:
+        if await self.collection.find_one({"recent_scores": {"$exists": True}}):
+            return False
+        return await self.scores.find_one({}) is not None
+
+
+class MongoBucketRepository(BucketRepository):
+    def __init__(self, collection, scores, reads=None):
+        self.collection = collection
+        self.scores = scores
+        self.reads = reads if reads is not None else collection
+
+    async def top(self, bucket: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+        # Keyset page over the (bucket, total_score, user_id) index
+        query = {"bucket": bucket}
+        if after is not None:
+            total_score, user_id = after
+            query["$or"] = [
+                {"total_score": {"$lt": total_score}},
+                {"total_score": total_score, "user_id": {"$gt": user_id}}
+            ]
+        return await self.reads.find(
+            query,
+            {"_id": 0},
+            sort=[("total_score", -1), ("user_id", 1)],
+            limit=limit
+        ).to_list(length=limit)
+
+    async def rebuild(self) -> int:
+        """One indexed $group per bucket over the dates it covers
+
+        Dates are mapped to buckets here rather than in the pipeline, so the
+        $match on date can use the scores (date, ...) index.
+        """
+        dates_by_bucket: Dict[str, List[str]] = {}
+        for date in await self.scores.distinct("date"):
+            for period in BUCKET_PERIODS:
+                dates_by_bucket.setdefault(period_bucket(period, date), []).append(date)
+
+        count = 0
+        for bucket, dates in dates_by_bucket.items():
+            pipeline = [
+                {"$match": {"date": {"$in": dates}}},
+                {"$group": {
+                    "_id": "$user_id",
+                    "total_score": {"$sum": "$score"},
+                    "best_score": {"$max": "$score"},
+                    "games_played": {"$sum": 1}
+                }}
+            ]
+            batch = []
+            async for row in self.scores.aggregate(pipeline, allowDiskUse=True):
+                user_id = row.pop("_id")
+                batch.append(ReplaceOne(
+                    {"bucket": bucket, "user_id": user_id},
+                    {"bucket": bucket, "user_id": user_id, **row},
+                    upsert=True
+                ))
+                if len(batch) >= 1000:
+                    await self.collection.bulk_write(batch, ordered=False)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                await self.collection.bulk_write(batch, ordered=False)
+                count += len(batch)
+        return count
+
+    async def needs_backfill(self) -> bool:
+        if await self.collection.find_one({}):
+            return False
+        return await self.scores.find_one({}) is not None
+
+
+class MongoHistogramRepository(HistogramRepository):
+    def __init__(self, collection, scores, bands: ScoreBands, reads=None):
+        self.collection = collection
+        self.scores = scores
+        self.bands = bands
+        self.reads = reads if reads is not None else collection
+
+    async def get(self, date: str) -> Dict[Tuple[int, int], int]:
+        cells: Dict[Tuple[int, int], int] = {}
+        async for shard in self.reads.find({"date": date}, {"_id": 0, "cells": 1}):
+            for key, count in shard.get("cells", {}).items():
+                score_band, time_band = key.split(":")
+                cell = (int(score_band), int(time_band))
+                cells[cell] = cells.get(cell, 0) + count
+        return {cell: count for cell, count in cells.items() if count > 0}
+
+    async def rebuild(self, date: str) -> int:
+        """One $group over the day's scores, stored as a single shard"""
+        score_width, time_width = self.bands
+        time_band = {"$subtract": ["$time_taken", {"$mod": ["$time_taken", time_width]}]} if time_width else {"$literal": 0}
+        pipeline = [
+            {"$match": {"date": date}},
+            {"$group": {
+                "_id": {"s": {"$subtract": ["$score", {"$mod": ["$score", score_width]}]}, "t": time_band},
+                "count": {"$sum": 1}
+            }}
+        ]
+        cells = {}
+        async for row in self.scores.aggregate(pipeline):
+            cells[f"{int(row['_id']['s'])}:{int(row['_id']['t'])}"] = row["count"]
+        # Not atomic with submissions landing meanwhile; run it when the day is quiet
+        await self.collection.delete_many({"date": date})
+        await self.collection.insert_one({"date": date, "shard": 0, "cells": cells})
+        return sum(cells.values())
+
+    async def needs_backfill(self, date: str) -> bool:
+        if await self.collection.find_one({"date": date}):
+            return False
+        return await self.scores.find_one({"date": date}) is not None
+
+
+class MongoRewardRepository(RewardRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find(self, transaction_hash: str) -> Optional[dict]:
+        return await self.collection.find_one({"transaction_hash": transaction_hash})
+
+    async def insert(self, doc: dict) -> None:
+        try:
+            await self.collection.insert_one(doc)
+        except errors.DuplicateKeyError as e:
+            raise DuplicateKeyError(str(e))
+
+
+class MongoDailyContentRepository(DailyContentRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, date: str) -> Optional[dict]:
+        return await self.collection.find_one({"date": date}, {"_id": 0})
+
+    async def put_if_absent(self, date: str, content: dict) -> dict:
+        # First writer wins; everyone reads back the same document
+        await self.collection.update_one({"date": date}, {"$setOnInsert": content}, upsert=True)
+        return await self.collection.find_one({"date": date}, {"_id": 0})
+
+
+class MongoSnapshotRepository(SnapshotRepository):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, date: str) -> Optional[dict]:
+        return await self.collection.find_one({"date": date}, {"_id": 0})
+
+    async def put_if_absent(self, date: str, snapshot: dict) -> dict:
+        # First writer wins; everyone reads back the same document
+        await self.collection.update_one({"date": date}, {"$setOnInsert": snapshot}, upsert=True)
+        return await self.collection.find_one({"date": date}, {"_id": 0})
+
+    async def dates(self, first: str, last: str) -> List[str]:
+        cursor = self.collection.find({"date": {"$gte": first, "$lte": last}}, {"_id": 0, "date": 1})
+        return sorted([row["date"] async for row in cursor])
+
+
+class MongoStorage(Storage):
+    """Storage on a Motor database (or anything with the same collection API)
+
+    `read_preference` (a READ_PREFERENCES name) routes the leaderboard and
+    aggregate reads, e.g. to secondaries with "secondaryPreferred". Writes,
+    the reads that decide them and a player's own profile and stats always
+    go to the primary, so players read their own writes.
+    """
+
+    def __init__(self, database, client=None, read_preference: str = "primary", bands: ScoreBands = ScoreBands()):
+        if read_preference not in READ_PREFERENCES:
+            raise ValueError(f"Unknown read preference: {read_preference}")
+        self.db = database
+        self.client = client
+        self.read_preference = read_preference
+        self.bands = bands
+        self.users = MongoUserRepository(database.users, self._reads("users"))
+        self.scores = MongoScoreRepository(database.scores, self._reads("scores"))
+        self.totals = MongoTotalsRepository(database.user_totals, database.scores, self._reads("user_totals"))
+        self.buckets = MongoBucketRepository(
+            database.leaderboard_buckets,
+            database.scores,
+            self._reads("leaderboard_buckets")
+        )
+        self.histograms = MongoHistogramRepository(
+            database.score_histograms,
+            database.scores,
+            bands,
+            self._reads("score_histograms")
+        )
+        self.rewards = MongoRewardRepository(database.rewards)
+        self.daily_content = MongoDailyContentRepository(database.daily_content)
+        self.snapshots = MongoSnapshotRepository(database.leaderboard_snapshots)
+
+    def _reads(self, name: str):
+        if self.read_preference == "primary":
+            return self.db[name]
+        return self.db.get_collection(name, read_preference=READ_PREFERENCES[self.read_preference])
+
+    async def ensure_indexes(self) -> None:
+        await self.db.users.create_index("uid", unique=True)
+        await self.db.users.create_index("last_streak_date")
+        await self.db.scores.create_index([("user_id", 1), ("date", 1)], unique=True)
+        await self.db.scores.create_index([("date", 1), ("score", -1), ("time_taken", 1), ("user_id", 1)])
+        await self.db.rewards.create_index("transaction_hash", unique=True)
+        await self.db.user_totals.create_index("user_id", unique=True)
+        await self.db.user_totals.create_index([("total_score", -1), ("user_id", 1)])
+        await self.db.leaderboard_buckets.create_index([("bucket", 1), ("user_id", 1)], unique=True)
+        await self.db.leaderboard_buckets.create_index([("bucket", 1), ("total_score", -1), ("user_id", 1)])
+        await self.db.score_histograms.create_index([("date", 1), ("shard", 1)], unique=True)
+        await self.db.daily_content.create_index("date", unique=True)
+        await self.db.leaderboard_snapshots.create_index("date", unique=True)
+
+    async def ping(self) -> None:
+        await self.db.command("ping")
+
+    async def warm_up(self, connections: int) -> None:
+        # Concurrent pings each check out a connection, so the pool opens
+        # (and authenticates) that many before traffic arrives
+        await asyncio.gather(*(self.ping() for _ in range(connections)))
+
+    async def apply_score_effects(self, accepted: List[AcceptedScore], now: datetime) -> None:
+        """One unordered bulk_write per collection for the whole batch"""
+        writes = {"users": [], "user_totals": [], "leaderboard_buckets": []}
+        for write, previous_score, _ in accepted:
+            score_delta = write.score - (previous_score or 0)
+            writes["users"].append(UpdateOne({"uid": write.user_id}, {"$inc": {"total_points": score_delta}}))
+            writes["user_totals"].extend(user_rollup_writes(write, previous_score, now))
+            writes["leaderboard_buckets"].extend(bucket_writes(write, previous_score))
+        writes["score_histograms"] = histogram_writes(accepted, self.bands)
+        await asyncio.gather(*(
+            self.db[collection].bulk_write(ops, ordered=False)
+            for collection, ops in writes.items() if ops
+        ))
+
+    def close(self) -> None:
+        if self.client is not None:
+            self.client.close()
@@ -0,0 +1,72 @@
+"""
+Offline test suite: the app in process on the in-memory storage engine
+
+Every test gets a fresh MemoryStorage and drives server.app through httpx's
+ASGI transport, so no MongoDB, network or running server is needed.
+
+    cd backend && python -m pytest tests
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["DAILY_CONTENT_SOURCES"] = "static"
+
+import asyncio  # noqa: E402
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import server  # noqa: E402
+from storage import MemoryStorage  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+async def start_app(app_module, storage=None):
+    """Point a server module at `storage` (fresh memory storage by default) and start it
+
+    The app starts with its own configuration, admission control included;
+    like a load balancer waiting on /api/ready, requests only go out once the
+    background index build and board seeding have finished.
+    """
+    app_module.reset_state(storage if storage is not None else MemoryStorage(app_module.score_bands))
+    await app_module.startup_event()
+    await asyncio.gather(*app_module.background_tasks)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://test/api")
+
+
+@pytest.fixture
+async def api(anyio_backend):
+    client = await start_app(server)
+    async with client:
+        yield client
+    await server.shutdown_event()
+
+
+@pytest.fixture
+def play(api):
+    """Create a user (once) and submit a score for them; returns the submit-score body"""
+    created = set()
+
+    async def play(user_id, score, time_taken=30, date=None):
+        if user_id not in created:
+            response = await api.post("/users", json={"uid": user_id, "display_name": user_id.title()})
+            assert response.status_code == 200
+            created.add(user_id)
+        response = await api.post("/submit-score", json={
+            "userId": user_id,
+            "score": score,
+            "timeTaken": time_taken,
+            "date": date or server.get_today_string()
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return play
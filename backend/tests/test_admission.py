@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+import server
+from admission import AdmissionControl
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_user_over_the_rate_limit_gets_429(api, monkeypatch):
+    monkeypatch.setattr(server, "admission", AdmissionControl({}, rate=1, burst=2))
+    statuses = [(await api.post("/users", json={"uid": "alice"})).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+
+    limited = await api.post("/users", json={"uid": "alice"})
+    assert int(limited.headers["Retry-After"]) >= 1
+    # Other users have their own bucket
+    assert (await api.post("/users", json={"uid": "bob"})).status_code == 200
+
+
+async def test_writes_over_the_concurrency_limit_get_503(api, monkeypatch):
+    monkeypatch.setattr(server, "admission", AdmissionControl({"users": 1}, max_queue=1, queue_timeout=0.05))
+    release = asyncio.Event()
+    original = server.storage.users.get
+
+    async def slow_get(uid):
+        await release.wait()
+        return await original(uid)
+
+    monkeypatch.setattr(server.storage.users, "get", slow_get)
+    running = asyncio.ensure_future(api.post("/users", json={"uid": "alice"}))
+    await asyncio.sleep(0.01)
+
+    queued, shed = await asyncio.gather(
+        api.post("/users", json={"uid": "bob"}),
+        api.post("/users", json={"uid": "carol"})
+    )
+    release.set()
+    assert (await running).status_code == 200
+    # One waits for the slot and times out, the other finds the queue full
+    assert sorted([queued.status_code, shed.status_code]) == [503, 503]
+    assert server.admission.stats()["users"]["shed"] == {"queue_full": 1, "queue_timeout": 1}
+
+
+async def test_the_configured_limits_apply_by_default(api):
+    statuses = [(await api.post("/users", json={"uid": "alice"})).status_code for _ in range(int(server.admission.buckets.burst) + 1)]
+    assert statuses[-1] == 429 and set(statuses[:-1]) == {200}
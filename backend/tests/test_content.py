@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+from daily_content import etag_matches
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_daily_content_is_built_once_and_revalidated(api):
+    response = await api.get("/daily-content")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["fact"]["text"] == "Honey never spoils."
+    assert len(body["history"]) == 3
+
+    etag = response.headers["ETag"]
+    again = await api.get("/daily-content", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+
+@pytest.mark.parametrize("header", ['"a", "b"', "*", 'W/"b"', '"x",W/"b" , "y"'])
+async def test_if_none_match_lists_wildcards_and_weak_tags_revalidate(api, header):
+    etag = (await api.get("/daily-content")).headers["ETag"]
+    response = await api.get("/daily-content", headers={"If-None-Match": header.replace('"b"', etag)})
+    assert response.status_code == 304
+
+
+def test_etag_matching_follows_rfc_9110():
+    assert etag_matches('W/"a"', '"a"') and etag_matches('"a"', 'W/"a"')
+    assert not etag_matches('"a,b"', '"a"')
+    assert not etag_matches('"ab"', '"a"')
+    assert not etag_matches(None, '"a"') and not etag_matches("", '"a"')
+
+
+async def test_daily_content_for_other_days(api):
+    tomorrow = (datetime.utcnow() + timedelta(days=1)).strftime("%Y-%m-%d")
+    assert (await api.get("/daily-content", params={"date": tomorrow})).status_code == 404
+    # Past days are only served once built, never built after the fact
+    assert (await api.get("/daily-content", params={"date": "2020-01-01"})).status_code == 404
+    assert (await api.get("/daily-content", params={"date": "01/01/2020"})).status_code == 400
+
+
+async def test_snapshot_is_frozen_with_a_strong_etag(api, play, monkeypatch):
+    monkeypatch.setattr(server, "LEADERBOARD_SNAPSHOT_GRACE", 0)
+    day = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%d")
+    await play("alice", 42, date=day)
+    await play("bob", 87, date=day)
+
+    response = await api.get(f"/leaderboard/{day}")
+    assert response.status_code == 200
+    assert "immutable" in response.headers["Cache-Control"]
+    body = response.json()
+    assert [entry["user_id"] for entry in body["entries"]] == ["bob", "alice"]
+    assert body["players"] == 2
+
+    # A late score does not change a frozen day
+    await play("carol", 99, date=day)
+    cached = await api.get(f"/leaderboard/{day}", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+    server.snapshot_cache.clear()
+    stored = await api.get(f"/leaderboard/{day}")
+    assert stored.headers["ETag"] == response.headers["ETag"]
+    assert stored.json()["players"] == 2
+
+
+async def test_snapshot_of_today_or_an_empty_day_is_404(api):
+    assert (await api.get(f"/leaderboard/{server.get_today_string()}")).status_code == 404
+    assert (await api.get("/leaderboard/2020-01-01")).status_code == 404
+    assert (await api.get("/leaderboard/not-a-date")).status_code == 400
@@ -0,0 +1,147 @@
+import asyncio
+import importlib.util
+import sys
+from datetime import datetime
+
+import pytest
+
+import server
+from conftest import start_app
+from invalidation import Invalidation, InvalidationBus, LocalHub, LocalTransport
+from storage import MemoryStorage, ScoreWrite, period_bucket
+
+pytestmark = pytest.mark.anyio
+
+
+def load_worker(name):
+    """A second, independent copy of the server module: another worker's caches and boards"""
+    spec = importlib.util.spec_from_file_location(name, server.__file__)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def other_server():
+    module = load_worker("server_other_worker")
+    yield module
+    del sys.modules["server_other_worker"]
+
+
+@pytest.fixture
+async def workers(anyio_backend, other_server, monkeypatch):
+    """Two app instances on one storage, connected by the local invalidation bus"""
+    hub = LocalHub()
+    storage = MemoryStorage(server.score_bands)
+    clients = []
+    for module in (server, other_server):
+        monkeypatch.setattr(module, "invalidation_bus", InvalidationBus(LocalTransport(hub), module.apply_invalidation))
+        clients.append(await start_app(module, storage))
+    yield clients
+    for client, module in zip(clients, (server, other_server)):
+        await client.aclose()
+        await module.shutdown_event()
+
+
+async def submit(client, user_id, score):
+    await client.post("/users", json={"uid": user_id})
+    response = await client.post("/submit-score", json={
+        "userId": user_id, "score": score, "timeTaken": 30, "date": server.get_today_string()
+    })
+    assert response.status_code == 200
+
+
+async def settle():
+    """Let the bus deliver what has been published"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def boards(client):
+    return {
+        period: [(entry["user_id"], entry["total_score"]) for entry in (await client.get("/leaderboard", params={"period": period})).json()]
+        for period in ("alltime", "week", "month")
+    }
+
+
+async def test_writes_on_one_worker_refresh_the_other(workers):
+    first, second = workers
+    await submit(first, "alice", 50)
+    await settle()
+    assert (await boards(second))["alltime"] == [("alice", 50)]
+    assert (await second.get("/user/alice/stats")).json()["best_score"] == 50
+
+    await submit(first, "bob", 70)
+    await submit(first, "alice", 90)
+    await settle()
+    expected = [("alice", 90), ("bob", 70)]
+    assert await boards(second) == {"alltime": expected, "week": expected, "month": expected}
+    assert (await second.get("/user/alice/stats")).json()["best_score"] == 90
+    assert (await second.get("/leaderboard/rank/alice", params={"period": "alltime"})).json()["rank"] == 1
+    assert (await second.get("/leaderboard/percentile", params={"score": 80})).json()["players"] == 2
+
+
+def change(collection, doc):
+    return {"ns": {"coll": collection}, "fullDocument": doc}
+
+
+async def test_change_events_invalidate_what_their_collection_feeds(api, play):
+    await play("alice", 50)
+    today = server.get_today_string()
+    write = ScoreWrite("alice", today, 80, 30)
+    now = datetime.utcnow()
+
+    # The score commits first; the rollups a moment later
+    previous = await server.storage.scores.write_best(write, now)
+    await server.apply_invalidation(server.invalidation_from_change(
+        change("scores", {"user_id": "alice", "date": today, "score": 80, "time_taken": 30})
+    ))
+    # A request in between caches what the rollups still say
+    assert (await boards(api))["alltime"] == [("alice", 50)]
+    assert (await api.get("/user/alice/stats")).json()["best_score"] == 50
+    assert (await api.get("/leaderboard/percentile", params={"score": 70})).json()["beaten"] == 1
+
+    await server.storage.apply_score_effects([(write, previous["score"], previous["time_taken"])], now)
+    for period in ("week", "month"):
+        await server.apply_invalidation(server.invalidation_from_change(
+            change("leaderboard_buckets", {"bucket": period_bucket(period, today), "user_id": "alice", "total_score": 80})
+        ))
+    await server.apply_invalidation(server.invalidation_from_change(
+        change("user_totals", {"user_id": "alice", "total_score": 80})
+    ))
+    await server.apply_invalidation(server.invalidation_from_change(
+        change("score_histograms", {"date": today, "shard": 3})
+    ))
+
+    assert await boards(api) == {"alltime": [("alice", 80)], "week": [("alice", 80)], "month": [("alice", 80)]}
+    assert (await api.get("/user/alice/stats")).json()["best_score"] == 80
+    assert (await api.get("/leaderboard/percentile", params={"score": 70})).json()["beaten"] == 0
+
+
+async def test_first_score_of_a_new_day_from_another_worker_starts_its_board(api):
+    await api.post("/users", json={"uid": "alice"})
+    today = server.get_today_string()
+    # The day rolled over: this worker only has yesterday's board so far
+    server.leaderboard_index.days.clear()
+    server.leaderboard_index.day("2000-01-01", create=True)
+
+    await server.storage.scores.write_best(ScoreWrite("alice", today, 60, 30), datetime.utcnow())
+    await server.apply_invalidation(server.invalidation_from_change(
+        change("scores", {"user_id": "alice", "date": today, "score": 60, "time_taken": 30})
+    ))
+    rank = (await api.get("/leaderboard/rank/alice")).json()
+    assert (rank["rank"], rank["score"]) == (1, 60)
+
+    # Days older than the resident ones don't come back
+    await server.apply_invalidation(server.invalidation_from_change(
+        change("scores", {"user_id": "alice", "date": "1999-12-31", "score": 10, "time_taken": 30})
+    ))
+    assert server.leaderboard_index.day("1999-12-31") is None
+
+
+def test_events_survive_the_wire():
+    event = Invalidation(tags=("a",), scores=(("alice", "2024-01-01", 5, 3, None),), histograms=("2024-01-01",))
+    assert Invalidation.decode(event.encode()) == event
+    first, second = event.halves()
+    assert first.histograms + second.histograms == event.histograms
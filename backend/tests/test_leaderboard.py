@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_entries_carry_display_names(api, play):
+    await play("alice", 50)
+    await api.post("/submit-score", json={"userId": "ghost", "score": 10, "timeTaken": 5, "date": server.get_today_string()})
+
+    board = (await api.get("/leaderboard")).json()
+    assert [(entry["user_name"], entry["rank"]) for entry in board] == [("Alice", 1), ("Anonymous", 2)]
+
+
+async def test_rename_during_a_name_lookup_is_not_undone_by_it(api, play, monkeypatch):
+    await play("alice", 50)
+    renamed = asyncio.Event()
+    display_names = server.storage.users.display_names
+
+    async def slow_display_names(user_ids):
+        found = await display_names(user_ids)
+        await renamed.wait()
+        return found
+
+    monkeypatch.setattr(server.storage.users, "display_names", slow_display_names)
+    lookup = asyncio.ensure_future(server.resolve_display_names(["alice"]))
+    await asyncio.sleep(0)
+    await api.post("/users", json={"uid": "alice", "display_name": "Alicia"})
+    renamed.set()
+    assert await lookup == {"alice": "Alice"}
+
+    monkeypatch.setattr(server.storage.users, "display_names", display_names)
+    assert await server.resolve_display_names(["alice"]) == {"alice": "Alicia"}
+
+
+async def test_cursor_pages_through_the_whole_board(api, play):
+    for n in range(7):
+        await play(f"user{n}", 100 - n, time_taken=n)
+
+    seen, after = [], None
+    while True:
+        params = {"limit": 3, **({"after": after} if after else {})}
+        response = await api.get("/leaderboard", params=params)
+        assert response.status_code == 200
+        seen += response.json()
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+
+    assert [entry["user_id"] for entry in seen] == [f"user{n}" for n in range(7)]
+    assert [entry["rank"] for entry in seen] == list(range(1, 8))
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "eyJiIjoieCJ9"])
+async def test_bad_cursor_is_400(api, cursor):
+    assert (await api.get("/leaderboard", params={"after": cursor})).status_code == 400
+
+
+async def test_cursor_from_another_board_is_400(api, play):
+    for n in range(3):
+        await play(f"user{n}", n)
+    cursor = (await api.get("/leaderboard", params={"limit": 1})).headers["X-Next-Cursor"]
+    response = await api.get("/leaderboard", params={"period": "alltime", "after": cursor})
+    assert response.status_code == 400
+
+
+async def test_all_time_week_and_month_sum_best_scores(api, play):
+    await play("alice", 30, date="2020-01-01")
+    await play("alice", 50)
+    await play("bob", 60)
+
+    alltime = (await api.get("/leaderboard", params={"period": "alltime"})).json()
+    assert [(entry["user_id"], entry["total_score"]) for entry in alltime] == [("alice", 80), ("bob", 60)]
+    assert alltime[0]["games_played"] == 2
+
+    for period in ("week", "month"):
+        board = (await api.get("/leaderboard", params={"period": period})).json()
+        assert [(entry["user_id"], entry["total_score"]) for entry in board] == [("bob", 60), ("alice", 50)], period
+
+
+async def test_cached_board_sees_new_scores(api, play):
+    await play("alice", 50)
+    assert len((await api.get("/leaderboard")).json()) == 1
+    await play("bob", 60)
+    assert [entry["user_id"] for entry in (await api.get("/leaderboard")).json()] == ["bob", "alice"]
+
+
+async def test_rank_and_around(api, play):
+    for n in range(5):
+        await play(f"user{n}", 100 - 10 * n)
+
+    rank = (await api.get("/leaderboard/rank/user3")).json()
+    assert (rank["rank"], rank["total_players"], rank["score"]) == (4, 5, 70)
+
+    around = (await api.get("/leaderboard/around/user2", params={"radius": 1})).json()
+    assert [entry["user_id"] for entry in around["entries"]] == ["user1", "user2", "user3"]
+    assert (await api.get("/leaderboard/rank/nobody")).status_code == 404
+
+
+async def test_bootstrap_bundles_profile_stats_and_board(api, play):
+    await play("alice", 50)
+    await play("bob", 60)
+
+    body = (await api.get("/bootstrap/alice", params={"limit": 5})).json()
+    assert body["profile"]["today_score"] == 50
+    assert body["stats"]["best_score"] == 50
+    assert [entry["user_id"] for entry in body["leaderboard"]["entries"]] == ["bob", "alice"]
+    assert body["leaderboard"]["rank"] == 2
+    assert (await api.get("/bootstrap/nobody")).status_code == 404
+
+
+async def test_bootstrap_for_a_new_player_does_not_scan_scores(api, play, monkeypatch):
+    await play("bob", 60)
+    await api.post("/users", json={"uid": "newbie"})
+
+    async def compute(user_id):
+        raise AssertionError("user_totals is backfilled: a missing rollup means no scores")
+
+    monkeypatch.setattr(server.storage.totals, "compute", compute)
+    body = (await api.get("/bootstrap/newbie")).json()
+    assert body["stats"]["total_games"] == 0 and body["stats"]["recent_scores"] == []
+    assert body["profile"]["today_score"] == 0
+    assert body["leaderboard"]["rank"] is None
+
+
+@pytest.mark.parametrize("period", ["week", "month", "yesterday"])
+async def test_rank_for_a_period_without_a_ranked_board_is_400(api, play, period):
+    await play("alice", 50)
+    assert (await api.get("/leaderboard/rank/alice", params={"period": period})).status_code == 400
+    assert (await api.get("/leaderboard/around/alice", params={"period": period})).status_code == 400
@@ -0,0 +1,71 @@
+import asyncio
+import json
+
+import pytest
+
+from live import LiveLeaderboard
+from singleflight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+def decode(event: bytes):
+    lines = dict(line.split(": ", 1) for line in event.decode().strip().split("\n"))
+    return lines["event"], json.loads(lines["data"])
+
+
+async def test_changes_are_coalesced_into_one_diff_per_tick():
+    board = [{"user_id": "alice", "score": 10}]
+    snapshots = []
+
+    async def snapshot(name, size):
+        snapshots.append(name)
+        return [dict(entry) for entry in board[:size]]
+
+    live = LiveLeaderboard(snapshot, size=2, tick=0.01)
+    subscriber = await live.subscribe("today")
+    assert decode(subscriber.queue.get_nowait())[0] == "snapshot"
+
+    board.insert(0, {"user_id": "bob", "score": 20})
+    for _ in range(5):
+        live.touch("today")
+    event, data = decode(await asyncio.wait_for(subscriber.queue.get(), 1))
+    assert event == "diff"
+    assert data["changed"] == board and data["size"] == 2
+    assert snapshots == ["today", "today"]
+
+    live.unsubscribe("today", subscriber)
+    assert live.stats()["subscribers"] == {}
+
+
+async def test_slow_subscriber_is_resynced_with_a_snapshot():
+    scores = iter(range(100))
+
+    async def snapshot(name, size):
+        return [{"user_id": "alice", "score": next(scores)}]
+
+    live = LiveLeaderboard(snapshot, tick=0.001, queue_size=2)
+    subscriber = await live.subscribe("today")
+    for _ in range(4):
+        live.touch("today")
+        await asyncio.sleep(0.01)
+
+    events = [decode(subscriber.queue.get_nowait())[0] for _ in range(subscriber.queue.qsize())]
+    assert "snapshot" in events and len(events) <= 2
+    assert live.resyncs >= 1
+    live.unsubscribe("today", subscriber)
+
+
+async def test_concurrent_identical_reads_share_one_call():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    flights = SingleFlight()
+    results = await asyncio.gather(*(flights.do(("board", 1), load) for _ in range(10)))
+    assert results == [1] * 10 and calls == 1
+    assert await flights.do(("board", 1), load) == 2
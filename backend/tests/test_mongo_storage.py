@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+
+from storage import MongoStorage, ScoreWrite
+
+pytestmark = pytest.mark.anyio
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+class CountingCollection:
+    """Counts the calls made on a collection"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return attr(*args, **kwargs)
+        return call
+
+
+@pytest.fixture
+async def mongo(anyio_backend):
+    storage = MongoStorage(mongomock_motor.AsyncMongoMockClient()["test"])
+    await storage.ensure_indexes()
+    return storage
+
+
+async def test_write_best_is_one_round_trip_whatever_the_outcome(mongo):
+    scores = CountingCollection(mongo.scores.collection)
+    mongo.scores.collection = scores
+    now = datetime.utcnow()
+
+    outcomes = []
+    for score, time_taken in ((50, 20), (40, 5), (50, 1), (70, 30)):
+        outcomes.append(await mongo.scores.write_best(ScoreWrite("alice", "2024-01-01", score, time_taken, "$science"), now))
+    assert outcomes == [
+        {"score": None, "time_taken": None},
+        None,
+        None,
+        {"score": 50, "time_taken": 20}
+    ]
+    assert scores.calls == ["find_one_and_update"] * 4
+
+    stored = await mongo.scores.collection.find_one({}, {"_id": 0, "score": 1, "time_taken": 1, "category": 1})
+    assert stored == {"score": 70, "time_taken": 30, "category": "$science"}
+
+
+async def test_own_stats_read_the_primary_when_reads_go_to_secondaries(anyio_backend):
+    storage = MongoStorage(mongomock_motor.AsyncMongoMockClient()["test"], read_preference="secondaryPreferred")
+    reads = storage.totals.reads = CountingCollection(storage.totals.reads)
+    await storage.totals.get("alice")
+    await storage.totals.top(10)
+    assert reads.calls == ["find"]
@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime
+
+import httpx
+import pytest
+
+import server
+from storage import DuplicateKeyError, MemoryStorage, ScoreWrite, UserRepository
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_health_ready_and_metrics(api, play):
+    await play("alice", 10)
+    assert (await api.get("/health")).json()["status"] == "healthy"
+
+    ready = (await api.get("/ready")).json()
+    assert ready["status"] == "ready" and ready["indexes"] == "ready"
+
+    metrics = (await api.get("/metrics")).text
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/submit-score",status="200"}' in metrics
+    assert "daily_bite_admission_admitted_total" in metrics
+
+
+async def test_memory_engine_enforces_the_unique_constraints():
+    storage = MemoryStorage()
+    await storage.users.insert({"uid": "alice"})
+    with pytest.raises(DuplicateKeyError):
+        await storage.users.insert({"uid": "alice"})
+
+    await storage.rewards.insert({"user_id": "alice", "transaction_hash": "h1"})
+    with pytest.raises(DuplicateKeyError):
+        await storage.rewards.insert({"user_id": "alice", "transaction_hash": "h1"})
+
+    write = ScoreWrite("alice", "2024-01-01", 10, 5, None, None)
+    assert (await storage.scores.write_best(write, datetime.utcnow())) == {"score": None, "time_taken": None}
+    assert await storage.scores.write_best(write, datetime.utcnow()) is None
+
+
+def test_an_incomplete_engine_fails_when_constructed():
+    class UsersWithoutStreaks(UserRepository):
+        async def get(self, uid):
+            return None
+
+    with pytest.raises(TypeError):
+        UsersWithoutStreaks()
+
+
+async def test_background_startup_seeds_the_boards_after_the_backfill(anyio_backend, monkeypatch):
+    storage = MemoryStorage()
+    today = server.get_today_string()
+    # Scores from before the rollups existed: user_totals needs a backfill
+    for user_id, score in (("alice", 40), ("bob", 90), ("carol", 60)):
+        await storage.scores.write_best(ScoreWrite(user_id, today, score, 30), datetime.utcnow())
+        await storage.users.insert({"uid": user_id})
+
+    built = asyncio.Event()
+    ensure_indexes = storage.ensure_indexes
+
+    async def slow_index_build():
+        await built.wait()
+        await ensure_indexes()
+
+    monkeypatch.setattr(storage, "ensure_indexes", slow_index_build)
+    server.reset_state(storage)
+    monkeypatch.setattr(server, "INDEX_BUILD_MODE", "background")
+    await server.startup_event()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test/api") as api:
+        starting = await api.get("/ready")
+        assert starting.status_code == 503 and starting.json()["status"] == "starting"
+
+        built.set()
+        await asyncio.gather(*server.background_tasks)
+        ready = await api.get("/ready")
+        assert ready.status_code == 200 and ready.json()["leaderboards"] == "seeded"
+
+        rank = (await api.get("/leaderboard/rank/carol", params={"period": "alltime"})).json()
+        assert (rank["rank"], rank["total_players"], rank["total_score"]) == (2, 3, 60)
+    await server.shutdown_event()
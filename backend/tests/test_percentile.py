@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import server
+from storage import ScoreWrite
+
+pytestmark = pytest.mark.anyio
+
+
+async def percentile(api, score, time_taken=0):
+    return (await api.get("/leaderboard/percentile", params={"score": score, "time_taken": time_taken})).json()
+
+
+async def test_each_submission_sees_the_players_before_it(api, play):
+    results = [await play(f"user{n}", score) for n, score in enumerate((15, 25, 35, 45, 55))]
+    # Each new score is the best so far: it beats everyone already there
+    assert [body["percentile"] for body in results] == [100.0] * 5
+
+    assert (await play("late", 5))["percentile"] == 0.0
+    standing = await percentile(api, 25)
+    assert (standing["players"], standing["beaten"]) == (6, 2)
+    assert standing["percentile"] == 40.0
+
+
+async def test_a_burst_of_submissions_is_counted(api, play):
+    for n in range(5):
+        await api.post("/users", json={"uid": f"user{n}"})
+    await percentile(api, 0)  # warm the cache before the burst
+
+    await asyncio.gather(*(play(f"user{n}", 10 * n + 5) for n in range(5)))
+    standing = await percentile(api, 25)
+    assert (standing["players"], standing["beaten"]) == (5, 2)
+    assert standing["percentile"] == 50.0
+
+
+async def test_an_improved_score_moves_the_player(api, play):
+    await play("alice", 15)
+    await play("bob", 45)
+    assert (await percentile(api, 15))["beaten"] == 0
+
+    assert (await play("alice", 95))["percentile"] == 100.0
+    standing = await percentile(api, 50)
+    assert (standing["players"], standing["beaten"]) == (2, 1)
+
+
+async def test_other_workers_writes_evict_the_cached_histogram(api, play):
+    await play("alice", 15)
+    assert (await percentile(api, 50))["players"] == 1
+
+    # A score another worker wrote, then the event the invalidation bus delivers for it
+    write = ScoreWrite("bob", server.get_today_string(), 45, 30)
+    previous = await server.storage.scores.write_best(write, datetime.utcnow())
+    await server.storage.apply_score_effects([(write, previous["score"], previous["time_taken"])], datetime.utcnow())
+    await server.apply_invalidation(server.score_invalidation([("bob", write.date, 45, 30, 45)]))
+    assert (await percentile(api, 50))["players"] == 2
+
+
+async def test_only_a_new_best_reports_a_percentile(api, play):
+    await play("alice", 90)
+    await play("bob", 45)
+    # Alice leads the day; the 40 she just threw away says nothing about that
+    assert "percentile" not in await play("alice", 40)
+
+
+async def test_percentile_of_a_day_nobody_played_is_404(api):
+    response = await api.get("/leaderboard/percentile", params={"score": 50, "date": "2020-01-01"})
+    assert response.status_code == 404
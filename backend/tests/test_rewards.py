@@ -0,0 +1,57 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+REWARD = {"userId": "alice", "rewardType": "coins", "rewardAmount": 10, "timestamp": "2024-05-01T10:00:00"}
+
+
+async def test_reward_is_credited_once(api):
+    await api.post("/users", json={"uid": "alice"})
+
+    first = (await api.post("/process-reward", json=REWARD)).json()
+    assert first["success"] is True and first["new_total_points"] == 10
+
+    replay = (await api.post("/process-reward", json=REWARD)).json()
+    assert replay == {"success": False, "message": "Reward already processed"}
+    assert server.reward_duplicates.value(("cache",)) >= 1
+
+
+async def test_replay_after_the_hash_cache_is_caught_by_the_unique_index(api):
+    await api.post("/users", json={"uid": "alice"})
+    await api.post("/process-reward", json=REWARD)
+    server.recent_reward_hashes.clear()
+
+    before = server.reward_duplicates.value(("database",))
+    replay = (await api.post("/process-reward", json=REWARD)).json()
+    assert replay["success"] is False
+    assert server.reward_duplicates.value(("database",)) == before + 1
+    assert (await api.get("/users/alice")).json()["user"]["total_points"] == 10
+
+
+async def test_invalid_reward_amount_is_400(api):
+    response = await api.post("/process-reward", json={**REWARD, "rewardAmount": 500})
+    assert response.status_code == 400
+
+
+async def test_streak_counts_consecutive_days(api):
+    await api.post("/users", json={"uid": "alice"})
+    response = await api.post("/update-streak", params={"user_id": "alice"})
+    assert response.json()["streak"] == 1
+    # Same day again keeps the streak
+    assert (await api.post("/update-streak", params={"user_id": "alice"})).json()["streak"] == 1
+    assert (await api.post("/update-streak", params={"user_id": "nobody"})).status_code == 404
+
+
+async def test_expire_streaks_zeroes_broken_streaks(api):
+    await api.post("/users", json={"uid": "alice", "streak": 4, "last_streak_date": "2024-01-01"})
+    await api.post("/users", json={"uid": "bob", "streak": 2, "last_streak_date": "2024-01-09"})
+
+    dry = await server.expire_streaks("2024-01-10", dry_run=True)
+    assert (dry["matched"], dry["modified"]) == (1, 0)
+
+    result = await server.expire_streaks("2024-01-10")
+    assert (result["cutoff"], result["modified"]) == ("2024-01-09", 1)
+    assert (await api.get("/users/alice")).json()["user"]["streak"] == 0
+    assert (await api.get("/users/bob")).json()["user"]["streak"] == 2
@@ -0,0 +1,62 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_only_a_better_score_replaces_the_stored_one(play):
+    first = await play("alice", 50)
+    assert first["new_record"] is True and first["message"] == "Score submitted!"
+
+    worse = await play("alice", 40)
+    assert worse["new_record"] is False
+
+    better = await play("alice", 70)
+    assert better["message"] == "Score updated!"
+
+
+async def test_stats_come_from_the_rollup(api, play):
+    today = server.get_today_string()
+    await play("alice", 50, date="2024-01-01")
+    await play("alice", 90)
+    await play("alice", 80)
+
+    stats = (await api.get("/user/alice/stats")).json()
+    assert stats["total_games"] == 2
+    assert stats["best_score"] == 90
+    assert [entry["date"] for entry in stats["recent_scores"]] == [today, "2024-01-01"]
+
+    profile = (await api.get("/users/alice")).json()
+    assert profile["today_score"] == 90
+    assert profile["puzzles_solved"] == 2
+
+
+async def test_unknown_user_is_404(api):
+    assert (await api.get("/users/nobody")).status_code == 404
+    assert (await api.get("/user/nobody/stats")).status_code == 404
+
+
+async def test_stats_cache_is_invalidated_by_a_new_score(api, play):
+    await play("alice", 50)
+    assert (await api.get("/user/alice/stats")).json()["best_score"] == 50
+    await play("alice", 75)
+    assert (await api.get("/user/alice/stats")).json()["best_score"] == 75
+
+
+async def test_queued_scores_are_flushed_in_bulk(api, play):
+    server.score_queue.start()
+    try:
+        queued = [await play(f"user{n}", 10 * n) for n in range(1, 4)]
+        # Not flushed yet, so not counted in the day's histogram either
+        assert all(body["queued"] and "percentile" not in body for body in queued)
+
+        # Read-your-writes: the user's own queued score lands before the read
+        assert (await api.get("/user/user2/stats")).json()["best_score"] == 20
+        await server.score_queue.drain()
+    finally:
+        await server.score_queue.drain()
+
+    board = (await api.get("/leaderboard", params={"period": "today"})).json()
+    assert [entry["user_id"] for entry in board] == ["user3", "user2", "user1"]
+    assert server.score_queue.stats()["flushed"] >= 3
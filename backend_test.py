@@ -10,9 +10,10 @@ import uuid
 from datetime import datetime, timedelta
 import time
 import sys
+import os
 
-# Configuration
-BASE_URL = "https://fun-facts-daily.preview.emergentagent.com/api"
+# Configuration (set DAILY_BITE_API_URL=http://localhost:8001/api to test a local server)
+BASE_URL = os.environ.get("DAILY_BITE_API_URL", "https://fun-facts-daily.preview.emergentagent.com/api")
 TIMEOUT = 30
 
 class DailyBiteAPITester:
@@ -287,6 +288,64 @@ class DailyBiteAPITester:
         except Exception as e:
             self.log_test("Default Leaderboard", False, f"Exception: {str(e)}")
     
+    def test_leaderboard_rank(self):
+        """Test GET /api/leaderboard/rank and /api/leaderboard/around endpoints"""
+        print("🔍 Testing Leaderboard Rank...")
+        
+        # Test 1: Rank of the test user (scored earlier today)
+        try:
+            response = self.session.get(
+                f"{BASE_URL}/leaderboard/rank/{self.test_user_id}?period=today",
+                timeout=TIMEOUT
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                if data.get("rank", 0) >= 1 and data.get("total_players", 0) >= data.get("rank", 0):
+                    self.log_test("Leaderboard Rank", True, f"Rank {data['rank']} of {data['total_players']}")
+                else:
+                    self.log_test("Leaderboard Rank", False, "Invalid rank data", data)
+            else:
+                self.log_test("Leaderboard Rank", False, f"HTTP {response.status_code}", response.text)
+                
+        except Exception as e:
+            self.log_test("Leaderboard Rank", False, f"Exception: {str(e)}")
+        
+        # Test 2: Players around the test user
+        try:
+            response = self.session.get(
+                f"{BASE_URL}/leaderboard/around/{self.test_user_id}?period=today&radius=2",
+                timeout=TIMEOUT
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                entries = data.get("entries", [])
+                if any(entry["user_id"] == self.test_user_id for entry in entries) and len(entries) <= 5:
+                    self.log_test("Leaderboard Around Me", True, f"Retrieved {len(entries)} entries")
+                else:
+                    self.log_test("Leaderboard Around Me", False, "Test user missing from entries", data)
+            else:
+                self.log_test("Leaderboard Around Me", False, f"HTTP {response.status_code}", response.text)
+                
+        except Exception as e:
+            self.log_test("Leaderboard Around Me", False, f"Exception: {str(e)}")
+        
+        # Test 3: Unranked user
+        try:
+            response = self.session.get(
+                f"{BASE_URL}/leaderboard/rank/{uuid.uuid4()}",
+                timeout=TIMEOUT
+            )
+            
+            if response.status_code == 404:
+                self.log_test("Rank Unranked User", True, "Correctly returned 404 for unranked user")
+            else:
+                self.log_test("Rank Unranked User", False, f"Expected 404, got {response.status_code}")
+                
+        except Exception as e:
+            self.log_test("Rank Unranked User", False, f"Exception: {str(e)}")
+    
     def test_reward_processing(self):
         """Test POST /api/process-reward endpoint"""
         print("🔍 Testing Reward Processing...")
@@ -398,6 +457,57 @@ class DailyBiteAPITester:
         except Exception as e:
             self.log_test("Streak Non-existent User", False, f"Exception: {str(e)}")
     
+    def test_daily_content(self):
+        """Test GET /api/daily-content endpoint"""
+        print("🔍 Testing Daily Content...")
+        
+        # Test 1: Today's content with caching headers
+        etag = None
+        try:
+            response = self.session.get(f"{BASE_URL}/daily-content", timeout=TIMEOUT)
+            
+            if response.status_code == 200:
+                data = response.json()
+                etag = response.headers.get("ETag")
+                if all(field in data for field in ["date", "history", "fact", "puzzle"]) and etag:
+                    self.log_test("Daily Content", True, f"Date: {data['date']}, ETag: {etag}")
+                else:
+                    self.log_test("Daily Content", False, "Missing fields or ETag", data)
+            else:
+                self.log_test("Daily Content", False, f"HTTP {response.status_code}", response.text)
+                
+        except Exception as e:
+            self.log_test("Daily Content", False, f"Exception: {str(e)}")
+        
+        # Test 2: Conditional request returns 304
+        if etag:
+            try:
+                response = self.session.get(
+                    f"{BASE_URL}/daily-content",
+                    headers={"If-None-Match": etag},
+                    timeout=TIMEOUT
+                )
+                
+                if response.status_code == 304:
+                    self.log_test("Daily Content Not Modified", True, "Correctly returned 304 for matching ETag")
+                else:
+                    self.log_test("Daily Content Not Modified", False, f"Expected 304, got {response.status_code}")
+                    
+            except Exception as e:
+                self.log_test("Daily Content Not Modified", False, f"Exception: {str(e)}")
+        
+        # Test 3: Invalid date
+        try:
+            response = self.session.get(f"{BASE_URL}/daily-content?date=not-a-date", timeout=TIMEOUT)
+            
+            if response.status_code == 400:
+                self.log_test("Daily Content Invalid Date", True, "Correctly rejected invalid date")
+            else:
+                self.log_test("Daily Content Invalid Date", False, f"Expected 400, got {response.status_code}")
+                
+        except Exception as e:
+            self.log_test("Daily Content Invalid Date", False, f"Exception: {str(e)}")
+    
     def test_user_stats(self):
         """Test GET /api/user/{user_id}/stats endpoint"""
         print("🔍 Testing User Stats...")
@@ -449,9 +559,11 @@ class DailyBiteAPITester:
         self.test_user_management()
         self.test_score_submission()
         self.test_leaderboard()
+        self.test_leaderboard_rank()
         self.test_reward_processing()
         self.test_streak_updates()
         self.test_user_stats()
+        self.test_daily_content()
         
         # Summary
         print("=" * 60)
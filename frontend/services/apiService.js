@@ -15,8 +15,37 @@ export const submitUser = async (user) => {
   }
 };
 
+// --- DAILY CONTENT (built once per day by the backend) ---
+// Keyed by UTC date (YYYY-MM-DD); failed fetches are dropped so they retry
+const dailyContentPromises = {};
+
+const utcDate = (d) => d.toISOString().slice(0, 10);
+
+export const getDailyContent = async (date = utcDate(new Date())) => {
+  if (!BASE_URL) return null;
+  if (!dailyContentPromises[date]) {
+    dailyContentPromises[date] = fetch(`${BASE_URL}/api/daily-content?date=${date}`)
+      .then(res => (res.ok ? res.json() : null))
+      .catch(e => { console.error('Error fetching daily content:', e); return null; });
+  }
+  const content = await dailyContentPromises[date];
+  if (!content) delete dailyContentPromises[date];  // retry next time
+  return content;
+};
+
+// The month/day in the year nearest to now (so Dec 31 asked on Jan 1 is last year's)
+const nearestDate = (month, day) => {
+  const now = new Date();
+  const candidates = [-1, 0, 1].map(offset => new Date(Date.UTC(now.getUTCFullYear() + offset, month - 1, day)));
+  return utcDate(candidates.reduce((a, b) => (Math.abs(b - now) < Math.abs(a - now) ? b : a)));
+};
+
 // --- HISTORY ---
 export const getHistoryEvents = async (month, day) => {
+  // Backend content is per UTC day: ask for the caller's day, which near
+  // midnight in non-UTC zones isn't the UTC one (a day not built yet falls through)
+  const content = await getDailyContent(nearestDate(month, day));
+  if (content?.history?.length) return content.history;
   try {
     const response = await fetch(`https://history.muffinlabs.com/date/${month}/${day}`);
     const data = await response.json();
@@ -31,6 +60,8 @@ export const getHistoryEvents = async (month, day) => {
 
 // --- FUN FACT ---
 export const getFunFact = async () => {
+  const content = await getDailyContent();
+  if (content?.fact?.text) return content.fact;
   try {
     const response = await fetch('https://uselessfacts.jsph.pl/api/v2/facts/random?language=en');
     const data = await response.json();
@@ -51,6 +82,8 @@ export const getFunFact = async () => {
 
 // --- PUZZLE (OpenTDB) ---
 export const getDailyPuzzle = async () => {
+  const content = await getDailyContent();
+  if (content?.puzzle?.question) return content.puzzle;
   try {
     const res = await fetch(`https://opentdb.com/api.php?amount=1&difficulty=medium&type=multiple&encode=url3986`);
     const data = await res.json();